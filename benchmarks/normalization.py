@@ -0,0 +1,67 @@
+"""
+Measure the throughput of the transcript normalization.
+
+Compares normalize() (one transcript at a time) with the Normalizer, serially
+and in a pool of processes. The transcripts of a Europarl-ST partition are
+repeated until there are --transcripts of them, so the number cache sees the
+same kind of repetition as on the full corpus. Fails if the outputs are not
+identical.
+
+Run it from the repository's root with `python benchmarks/normalization.py`.
+
+Usage:
+    normalization.py [--transcripts=<n>] [--workers=<n>] [--segments=<path>]
+
+Options:
+    --transcripts=<n>  Number of transcripts to normalize [default: 200000].
+    --workers=<n>      Number of processes of the pool [default: 4].
+    --segments=<path>  Transcripts, one per line [default: tests/data/europarlST-v1.1/en/de/dev/segments.en].
+
+"""
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+from docopt import docopt
+
+# Use the working copy, even if the package is not installed (editable).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from dnt.preprocessing import Normalizer, normalize  # noqa: E402
+from dnt.utils import LineIndex  # noqa: E402
+
+
+def main():
+    arguments = docopt(__doc__)
+    number_of_transcripts = int(arguments['--transcripts'])
+    workers = int(arguments['--workers'])
+
+    corpus = list(LineIndex(Path(arguments['--segments'])))
+    transcripts = list(islice(cycle(corpus), number_of_transcripts))
+
+    normalizer = Normalizer()
+    scenarios = {
+        'normalize': lambda: [normalize(transcript) for transcript in transcripts],
+        'Normalizer': lambda: normalizer.normalize_many(transcripts),
+        f'Normalizer ({workers} workers)': lambda: normalizer.normalize_many(transcripts, workers=workers),
+    }
+
+    print(f"{'scenario':<26} {'seconds':>8} {'transcripts/s':>14}  ({len(transcripts)} transcripts)")
+
+    expected = None
+    for name, run in scenarios.items():
+        start = time.perf_counter()
+        normalized = run()
+        seconds = time.perf_counter() - start
+
+        print(f"{name:<26} {seconds:>8.2f} {len(transcripts) / seconds:>14.0f}")
+
+        if expected is None:
+            expected = normalized
+        elif normalized != expected:
+            sys.exit(f"{name} differs from normalize().")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Measure the transcription pipeline stage by stage and end to end.
+
+Every stage runs on synthetic audio (speech-like bursts of tones and noise)
+of each duration, in a fresh process, so that the peak memory (RSS) of one
+measurement does not carry over to the next. The stages are:
+
+    extract_audio   Decode an AAC (m4a) file with ffmpeg (skipped without ffmpeg).
+    segment         IntervalSegmenter.segment on the decoded WAV file.
+    transcribe      DeepSpeechTranscriber.transcribe of every segment. A stub
+                    model stands in, unless a model is given (see below).
+    translate       DeepL.translate_many against a local stub of the DeepL API.
+    compile         VTT.compile of the cues.
+    pipeline        Pipeline.process (segment, transcribe, translate, compile).
+
+For each, the results contain the wall-clock time, the throughput (seconds
+of audio per second), the real-time factor (seconds per second of audio;
+below 1 is faster than real time) and the peak RSS. They are stored as JSON;
+`compare` flags regressions of a run against a baseline.
+
+Run it from the repository's root, e.g.:
+
+    python benchmarks/stages.py run --output=baseline.json
+    (change something)
+    python benchmarks/stages.py run --output=candidate.json
+    python benchmarks/stages.py compare baseline.json candidate.json
+
+Usage:
+    stages.py run [--durations=<seconds>] [--stages=<names>] [--output=<file>] [--model=<model_path> --scorer=<scorer_path>]
+    stages.py compare <baseline> <candidate> [--threshold=<percent>]
+
+Options:
+    --durations=<seconds>  Durations of the audio, separated by commas [default: 60,3600,14400].
+    --stages=<names>       Stages to run, separated by commas [default: extract_audio,segment,transcribe,translate,compile,pipeline].
+    --output=<file>        Store the results in this file [default: stages.json].
+    --model=<model_path>    DeepSpeech model to transcribe with (instead of the stub).
+    --scorer=<scorer_path>  Scorer of the DeepSpeech model.
+    --threshold=<percent>  Flag stages that got slower or use more memory by more than this [default: 10].
+
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import numpy as np
+from docopt import docopt
+
+# Use the working copy, even if the package is not installed (editable).
+SOURCES = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SOURCES))
+
+from dnt.audio import SAMPLE_RATE, Segment, as_pcm  # noqa: E402
+
+# Synthetic audio is generated in chunks of this many seconds.
+CHUNK_SECONDS = 60
+
+# Stages taking less than this (in seconds) are too noisy to flag as slower.
+NOISE_FLOOR = 0.1
+
+
+def synthesize(path: Path, seconds: int, seed: int = 0) -> Path:
+    """
+    Write `seconds` of speech-like 16 kHz mono audio to a WAV file.
+
+    "Utterances" of a few seconds (tones with a varying pitch plus noise)
+    alternate with short pauses of low noise, so that the audio resembles a
+    lecture more than silence does.
+    """
+    rng = np.random.default_rng(seed)
+
+    with wave.open(str(path), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(SAMPLE_RATE)
+
+        for offset in range(0, seconds, CHUNK_SECONDS):
+            length = min(CHUNK_SECONDS, seconds - offset) * SAMPLE_RATE
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = 120 + 60 * np.sin(2 * np.pi * 0.3 * t)
+            voice = np.sin(2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE)
+            # 4 s utterances, 1 s pauses.
+            speaking = (t % 5.0) < 4.0
+            audio = np.where(speaking, 0.5 * voice, 0.0) + rng.normal(0, 0.02, length)
+            fd.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+
+    return path
+
+
+class StubModel:
+    """
+    Stands in for a DeepSpeech model: "Transcribes" audio into a word per
+    half a second of speech, touching every sample like a real model would.
+    """
+
+    def stt(self, pcm: np.ndarray) -> str:
+        energy = np.abs(pcm.astype(np.int32)).mean()
+        words = int(len(pcm) / SAMPLE_RATE * 2) if energy > 100 else 0
+        return " ".join(["lecture"] * words)
+
+
+def make_transcriber(model: Optional[str], scorer: Optional[str]):
+    """
+    Returns a DeepSpeechTranscriber and whether its model is a stub.
+    """
+    if model is not None:
+        from dnt.transcription import DeepSpeechTranscriber
+        return DeepSpeechTranscriber(Path(model), Path(scorer)), False
+
+    try:
+        from dnt.transcription import DeepSpeechTranscriber
+    except ImportError:
+        # Without DeepSpeech, mirror DeepSpeechTranscriber.transcribe.
+        class DeepSpeechTranscriber:  # type: ignore
+            def transcribe(self, segment) -> str:
+                return self.ds.stt(as_pcm(segment))
+
+    transcriber = DeepSpeechTranscriber.__new__(DeepSpeechTranscriber)
+    transcriber.ds = StubModel()
+    return transcriber, True
+
+
+class StubDeepL(BaseHTTPRequestHandler):
+    """
+    Answers like DeepL's translate endpoint, "translating" texts into upper
+    case.
+    """
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        texts = parse_qs(body.decode("utf-8")).get('text', [])
+        response = json.dumps({
+            'translations': [
+                {'detected_source_language': 'EN', 'text': text.upper()}
+                for text in texts
+            ]
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+def stub_deepl():
+    """
+    Start a stub of the DeepL API in a background thread.
+
+    Returns:
+        A DeepL translator sending its requests to the stub.
+
+    """
+    from dnt.translation import DeepL
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubDeepL)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return DeepL("benchmark", url=f"http://127.0.0.1:{server.server_port}/v2/translate")
+
+
+def peak_rss() -> int:
+    """
+    Returns the peak RSS of this process (in bytes).
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(stage: str, seconds: int, workdir: str, model: Optional[str], scorer: Optional[str]) -> Dict:
+    """
+    Run a stage on `seconds` of audio (in a fresh process, see run).
+
+    Preparation (e.g., segmenting the audio for the transcription) is not
+    part of the measured time, but of the peak RSS. Note that the RSS
+    includes the pages of the memory-mapped WAV file that have been read.
+    """
+    from dnt.core import Pipeline
+    from dnt.preprocessing import IntervalSegmenter, extract_audio
+    from dnt.subtitles import SRT, VTT, Cue
+
+    wavfile = Path(workdir) / f"{seconds}.wav"
+    note = None
+    items = None
+
+    def segments() -> List[Segment]:
+        return list(IntervalSegmenter().segment(wavfile))
+
+    def cues(texts: List[str]) -> List[Cue]:
+        return [Cue(i * 10_000, (i + 1) * 10_000, text) for i, text in enumerate(texts)]
+
+    if stage == 'extract_audio':
+        encoded = Path(workdir) / f"{seconds}.m4a"
+        outfile = Path(workdir) / f"{seconds}-extracted.wav"
+        start = time.perf_counter()
+        extract_audio(encoded, outfile)
+        elapsed = time.perf_counter() - start
+        if not outfile.is_file():
+            raise RuntimeError("ffmpeg did not decode the audio.")
+        outfile.unlink()
+
+    elif stage == 'segment':
+        start = time.perf_counter()
+        items = sum(1 for _ in IntervalSegmenter().segment(wavfile))
+        elapsed = time.perf_counter() - start
+
+    elif stage == 'transcribe':
+        transcriber, stub = make_transcriber(model, scorer)
+        note = "stub model" if stub else None
+        inputs = segments()
+        start = time.perf_counter()
+        for segment in inputs:
+            transcriber.transcribe(segment)
+        elapsed = time.perf_counter() - start
+        items = len(inputs)
+
+    elif stage == 'translate':
+        translator = stub_deepl()
+        note = "stub server"
+        transcriber, _ = make_transcriber(None, None)
+        texts = [transcriber.transcribe(segment) for segment in segments()]
+        start = time.perf_counter()
+        translator.translate_many(texts)
+        elapsed = time.perf_counter() - start
+        items = len(texts)
+
+    elif stage == 'compile':
+        transcriber, _ = make_transcriber(None, None)
+        inputs = cues([transcriber.transcribe(segment) for segment in segments()])
+        start = time.perf_counter()
+        VTT().compile(inputs, 'en')
+        elapsed = time.perf_counter() - start
+        items = len(inputs)
+
+    elif stage == 'pipeline':
+        transcriber, stub = make_transcriber(model, scorer)
+        note = ", ".join(filter(None, ["stub model" if stub else None, "stub server"]))
+        pipeline = Pipeline(IntervalSegmenter(), transcriber, stub_deepl(), [VTT(), SRT()])
+        start = time.perf_counter()
+        with pipeline:
+            pipeline.process(wavfile)
+        elapsed = time.perf_counter() - start
+
+    else:
+        raise ValueError(f"Unknown stage '{stage}'.")
+
+    return {
+        'stage': stage,
+        'duration': seconds,
+        'seconds': elapsed,
+        'throughput': seconds / elapsed if elapsed else None,
+        'real_time_factor': elapsed / seconds,
+        'items': items,
+        'peak_rss': peak_rss(),
+        'note': note,
+    }
+
+
+def run(arguments):
+    durations = [int(d) for d in arguments['--durations'].split(',')]
+    stages = arguments['--stages'].split(',')
+    output = Path(arguments['--output'])
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+
+    results = []
+    # Spawn (instead of fork) every process, so the peak RSS is the stage's.
+    context = multiprocessing.get_context('spawn')
+
+    print(f"{'stage':<14} {'audio':>7} {'seconds':>9} {'x real time':>12} {'peak RSS':>9}  note")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for seconds in durations:
+            synthesize(Path(workdir) / f"{seconds}.wav", seconds)
+
+            if has_ffmpeg and 'extract_audio' in stages:
+                subprocess.run(
+                    ['ffmpeg', '-y', '-i', f"{seconds}.wav", '-c:a', 'aac', f"{seconds}.m4a"],
+                    cwd=workdir, check=True,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+
+            for stage in stages:
+                if stage == 'extract_audio' and not has_ffmpeg:
+                    result = {'stage': stage, 'duration': seconds, 'skipped': "ffmpeg not found"}
+                else:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(
+                            measure, stage, seconds, workdir,
+                            arguments['--model'], arguments['--scorer']
+                        ).result()
+
+                results.append(result)
+                report(result)
+
+            for path in Path(workdir).iterdir():
+                path.unlink()
+
+    output.write_text(json.dumps({
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }, indent=2), encoding="utf-8")
+
+    print(f"Stored the results in {output}.")
+
+
+def report(result: Dict):
+    audio = f"{result['duration'] / 60:g}min"
+
+    if 'skipped' in result:
+        print(f"{result['stage']:<14} {audio:>7} {'-':>9} {'-':>12} {'-':>9}  skipped: {result['skipped']}")
+        return
+
+    print(
+        f"{result['stage']:<14} {audio:>7} {result['seconds']:>9.2f} "
+        f"{result['throughput'] or float('inf'):>11.0f}x "
+        f"{result['peak_rss'] / 1024 ** 2:>7.0f}MB  {result['note'] or ''}"
+    )
+
+
+def compare(arguments) -> int:
+    """
+    Compare the results of two runs.
+
+    Returns:
+        The number of regressions, i.e. stages that take longer or use more
+        memory than in the baseline (by more than the threshold). Stages
+        faster than NOISE_FLOOR are not flagged as slower.
+
+    """
+    threshold = float(arguments['--threshold']) / 100
+
+    def load(path: str) -> Dict:
+        results = json.loads(Path(path).read_text(encoding="utf-8"))['results']
+        return {(r['stage'], r['duration']): r for r in results if 'skipped' not in r}
+
+    baseline, candidate = load(arguments['<baseline>']), load(arguments['<candidate>'])
+    regressions = 0
+
+    print(f"{'stage':<14} {'audio':>7} {'time':>9} {'peak RSS':>9}")
+
+    for key in sorted(baseline.keys() & candidate.keys(), key=lambda key: (key[1], key[0])):
+        before, after = baseline[key], candidate[key]
+        time_change = after['seconds'] / before['seconds'] - 1
+        rss_change = after['peak_rss'] / before['peak_rss'] - 1
+
+        flags = []
+        if time_change > threshold and after['seconds'] > NOISE_FLOOR:
+            flags.append('slower')
+        if rss_change > threshold:
+            flags.append('more memory')
+        regressions += bool(flags)
+
+        print(
+            f"{key[0]:<14} {key[1] / 60:>6g}m {time_change:>+9.1%} {rss_change:>+9.1%}"
+            f"  {'REGRESSION: ' + ', '.join(flags) if flags else ''}"
+        )
+
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{key[0]:<14} {key[1] / 60:>6g}m  only in {'baseline' if key in baseline else 'candidate'}")
+
+    print(f"{regressions} regression(s) (threshold: {threshold:.0%}).")
+    return regressions
+
+
+def main():
+    arguments = docopt(__doc__)
+
+    if arguments['compare']:
+        sys.exit(1 if compare(arguments) else 0)
+
+    run(arguments)
+
+
+if __name__ == "__main__":
+    main()
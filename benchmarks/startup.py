@@ -0,0 +1,86 @@
+"""
+Measure the cold-start time of the CLI and the web app.
+
+Every scenario runs in a fresh interpreter, i.e. the numbers include the
+interpreter's startup and all imports, just like a container (re-)start.
+
+Run it from the repository's root with `python benchmarks/startup.py`.
+
+Usage:
+    startup.py [--runs=<n>]
+
+Options:
+    --runs=<n>  Number of runs per scenario [default: 10].
+
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from docopt import docopt
+
+# Use the working copy, even if the package is not installed (editable).
+SOURCES = Path(__file__).resolve().parent.parent / 'src'
+
+# Scenario name -> Python code run in a fresh interpreter.
+SCENARIOS = {
+    'interpreter': "pass",
+    'cli --version': (
+        "import sys; sys.argv = ['deep-neural-transcriber', '--version'];"
+        "from dnt.cli import main; main()"
+    ),
+    'cli --help': (
+        "import sys; sys.argv = ['deep-neural-transcriber', '--help'];"
+        "from dnt.cli import main; main()"
+    ),
+    'web app ready': "from dnt.ui.app import app",
+}
+
+
+def measure(code: str, cwd: Path) -> float:
+    """
+    Return the wall-clock time (in seconds) to run `code` in a new interpreter.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [str(SOURCES), env.get('PYTHONPATH')])
+    )
+
+    start = time.perf_counter()
+    # Note: docopt exits after printing --version or --help.
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd, env=env, check=True,
+        stdout=subprocess.DEVNULL
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    arguments = docopt(__doc__)
+    runs = int(arguments['--runs'])
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        # The web app expects the default scorer in models/ relative to the
+        # working directory; an empty file is enough to start it.
+        workdir = Path(tmpdirname)
+        scorer = workdir / 'models/pretrained-v0.9.3/deepspeech-0.9.3-models.scorer'
+        scorer.parent.mkdir(parents=True)
+        scorer.touch()
+
+        print(f"{'scenario':<16} {'min':>8} {'median':>8}  ({runs} runs)")
+
+        for name, code in SCENARIOS.items():
+            timings = [measure(code, workdir) for _ in range(runs)]
+            print(
+                f"{name:<16} {min(timings) * 1000:>6.0f}ms "
+                f"{statistics.median(timings) * 1000:>6.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -32,7 +32,7 @@ setuptools.setup(
         'Flask',
         'docopt',
         'tqdm',
-        'pydub',
+        'numpy',
         'requests',
         'wave',
         'toolz',
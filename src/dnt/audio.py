@@ -0,0 +1,204 @@
+"""
+Module contains the audio types shared by the pipeline's steps and helpers to
+read audio into them.
+
+All audio in the pipeline is 16-bit, mono PCM (DeepSpeech's input format).
+Segments hold their samples as numpy arrays, which are usually views into a
+larger buffer. That way, handing audio from one step to the next does not
+copy or re-encode it.
+"""
+import struct
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Tuple
+
+import numpy as np
+
+# DeepSpeech's models are trained on 16 kHz audio.
+SAMPLE_RATE = 16_000
+
+# Samples are 16-bit signed integers (little-endian, like in WAV files).
+SAMPLE_DTYPE = np.dtype('<i2')
+
+# WAV format tags of uncompressed PCM audio.
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass
+class Segment:
+    """
+    A snippet of audio.
+
+    Attributes:
+        samples: The segment's PCM samples (int16).
+        sample_rate: Sample rate of the samples (in Hz).
+        start: Offset of the segment from the beginning of the audio (in ms).
+
+    """
+    samples: np.ndarray
+    sample_rate: int = SAMPLE_RATE
+    start: int = 0
+
+    @property
+    def duration(self) -> int:
+        """
+        Returns the segment's length (in ms).
+        """
+        return len(self.samples) * 1000 // self.sample_rate
+
+    @property
+    def end(self) -> int:
+        """
+        Returns the segment's end (in ms) relative to the beginning of the audio.
+        """
+        return self.start + self.duration
+
+
+def as_pcm(audio) -> np.ndarray:
+    """
+    Return `audio` as an array of int16 samples without copying it.
+
+    Args:
+        audio: A Segment, a numpy array of int16 samples or any object
+            supporting the buffer protocol (bytes, bytearray, memoryview, ...)
+            that contains raw 16-bit PCM.
+
+    Raises:
+        TypeError, if a numpy array with another dtype than int16 is passed.
+
+    Returns:
+        The samples as a contiguous int16 array. The array shares its memory
+        with `audio` whenever possible.
+
+    """
+    if isinstance(audio, Segment):
+        audio = audio.samples
+
+    if isinstance(audio, np.ndarray):
+        if audio.dtype != SAMPLE_DTYPE:
+            raise TypeError(f"Expected int16 samples, got {audio.dtype}.")
+
+        # Only copies if the array is not contiguous (e.g., strided views).
+        return np.ascontiguousarray(audio)
+
+    # pydub.AudioSegment exposes its samples as raw bytes.
+    buffer = getattr(audio, 'raw_data', audio)
+
+    return np.frombuffer(buffer, dtype=SAMPLE_DTYPE)
+
+
+def map_wav(audiofile: Path) -> Tuple[np.ndarray, int]:
+    """
+    Memory-map the samples of a 16-bit mono WAV file.
+
+    Instead of reading the whole file into memory, the samples are mapped
+    from disk; the OS pages them in when accessed and can drop them again
+    under memory pressure. Slices of the returned array are views into the
+    map, so segmenting even multi-hour recordings keeps memory use flat.
+
+    Args:
+        audiofile: Path to a WAV file, e.g. produced by extract_audio.
+
+    Raises:
+        ValueError, if the file is not a 16-bit mono PCM WAV file.
+
+    Returns:
+        A (samples, sample_rate) tuple.
+
+    """
+    filesize = audiofile.stat().st_size
+    sample_rate = None
+
+    with open(audiofile, 'rb') as fd:
+        riff, _, wave = struct.unpack('<4sI4s', fd.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f"{audiofile} is not a WAV file.")
+
+        # A WAV file is a sequence of chunks; besides the "fmt " and "data"
+        # chunk, encoders like ffmpeg add others (e.g., a LIST chunk).
+        while True:
+            header = fd.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{audiofile} has no data chunk.")
+
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+            if chunk_id == b'fmt ':
+                fmt = fd.read(chunk_size + chunk_size % 2)
+                tag, channels, sample_rate, _, _, bits = struct.unpack(
+                    '<HHIIHH', fmt[:16]
+                )
+                if tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE) \
+                        or channels != 1 or bits != 16:
+                    raise ValueError(
+                        f"Expected 16-bit mono PCM audio, got {channels} "
+                        f"channel(s) with {bits}-bit samples."
+                    )
+            elif chunk_id == b'data':
+                if sample_rate is None:
+                    raise ValueError(f"{audiofile} has no fmt chunk.")
+
+                offset = fd.tell()
+                # Streamed WAVs (e.g., ffmpeg writing to a pipe) can not
+                # update the chunk size afterwards, so don't trust it blindly.
+                size = min(chunk_size, filesize - offset)
+                break
+            else:
+                # Chunks are padded to an even number of bytes.
+                fd.seek(chunk_size + chunk_size % 2, 1)
+
+    number_of_samples = size // SAMPLE_DTYPE.itemsize
+
+    if number_of_samples == 0:
+        # mmap can not map empty regions.
+        return np.empty(0, dtype=SAMPLE_DTYPE), sample_rate
+
+    samples = np.memmap(audiofile, dtype=SAMPLE_DTYPE, mode='r',
+                        offset=offset, shape=(number_of_samples,))
+
+    return samples, sample_rate
+
+
+def write_wav(outfile: Path, samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> Path:
+    """
+    Write 16-bit mono PCM samples to a WAV file (the counterpart of map_wav).
+
+    Returns:
+        Path of the written file.
+
+    """
+    with wave.open(str(outfile), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(SAMPLE_DTYPE.itemsize)
+        fd.setframerate(sample_rate)
+        fd.writeframes(as_pcm(samples).data)
+
+    return outfile
+
+
+def read_samples(stream: BinaryIO, number_of_samples: int) -> np.ndarray:
+    """
+    Read up to `number_of_samples` samples of raw 16-bit PCM from a stream.
+
+    The samples are read directly into a new array (no intermediate bytes).
+    Unlike a single read() call, this blocks until the requested number of
+    samples is available or the stream ends, which matters for pipes.
+
+    Returns:
+        The samples read. Shorter than requested only at the end of the
+        stream, empty once the stream is exhausted.
+
+    """
+    samples = np.empty(number_of_samples, dtype=SAMPLE_DTYPE)
+    buffer = samples.data.cast('B')
+    received = 0
+
+    while received < len(buffer):
+        n = stream.readinto(buffer[received:])  # type: ignore
+        if not n:
+            break
+        received += n
+
+    return samples[:received // SAMPLE_DTYPE.itemsize]
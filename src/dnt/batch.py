@@ -0,0 +1,115 @@
+"""
+Helpers to transcribe many videos in one run, e.g. all lecture recordings of
+a semester (see the CLI's process-batch subcommand).
+
+The videos are given as directories, glob patterns or manifest files (one
+video per line). Videos whose subtitles are newer than the video and the
+models are skipped, so a nightly run only transcribes new recordings.
+"""
+import glob
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+# Files picked up from a directory. Any other file given explicitly is read
+# as a manifest.
+VIDEO_EXTENSIONS = {'.mp4', '.m4v', '.mkv', '.mov', '.webm', '.avi'}
+
+
+def find_videos(sources: Iterable[str]) -> List[Path]:
+    """
+    Collect the videos to transcribe.
+
+    Args:
+        sources: Any of
+            - a directory: all videos in it (not in subdirectories),
+            - a glob pattern, e.g. `lectures/**/*.mp4`,
+            - a manifest: a text file listing one video per line. Empty
+              lines and lines starting with `#` are ignored; relative paths
+              are relative to the manifest's directory.
+            - a video.
+
+    Returns:
+        The videos, in the given order and each one once. Paths that do not
+        exist are kept, so they show up as failures.
+
+    Example:
+        >>> find_videos(["lectures/", "extra/*.mp4", "nightly.txt"])
+        [PosixPath('lectures/01-intro.mp4'), ...]
+
+    """
+    videos: Dict[Path, None] = {}
+
+    for source in sources:
+        path = Path(source)
+
+        if path.is_dir():
+            found = sorted(
+                video for video in path.iterdir()
+                if video.is_file() and video.suffix.lower() in VIDEO_EXTENSIONS
+            )
+        elif path.is_file() and path.suffix.lower() not in VIDEO_EXTENSIONS:
+            found = read_manifest(path)
+        elif any(character in source for character in '*?['):
+            found = sorted(Path(match) for match in glob.glob(source, recursive=True))
+        else:
+            found = [path]
+
+        for video in found:
+            videos.setdefault(video, None)
+
+    return list(videos)
+
+
+def read_manifest(manifest: Path) -> List[Path]:
+    """
+    Returns the videos listed in a manifest, see find_videos.
+    """
+    videos = []
+
+    for line in manifest.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            videos.append(manifest.parent / line)
+
+    return videos
+
+
+def is_up_to_date(outputs: Iterable[Path], dependencies: Iterable[Path]) -> bool:
+    """
+    Whether all outputs exist and are newer than all (existing) dependencies,
+    like make does.
+
+    Args:
+        outputs: E.g., the subtitle files of a video.
+        dependencies: E.g., the video, the models and the scorer.
+
+    """
+    try:
+        oldest = min(output.stat().st_mtime for output in outputs)
+    except (OSError, ValueError):
+        # An output is missing (or there are none).
+        return False
+
+    return all(
+        dependency.stat().st_mtime <= oldest
+        for dependency in dependencies if dependency.exists()
+    )
+
+
+class SharedTranscriber:
+    """
+    Share one transcriber between pipelines running in several threads.
+
+    DeepSpeech models must not transcribe several segments at the same time,
+    so the segments are transcribed one after another. The other steps of the
+    pipelines (decoding, translation, ...) still run concurrently.
+    """
+
+    def __init__(self, transcriber):
+        self.transcriber = transcriber
+        self.lock = threading.Lock()
+
+    def transcribe(self, segment) -> str:
+        with self.lock:
+            return self.transcriber.transcribe(segment)
@@ -0,0 +1,294 @@
+"""
+Cache results by the content of the media they were generated from.
+
+Lectures are often uploaded more than once, e.g. after fixing a typo in the
+title slide's file name. The cache is keyed by a hash of the video's content
+(not its name) and everything else that determines the subtitles: the model,
+the scorer, the translator and the segmenter's settings. Hence, a cached
+result is only re-used if running the pipeline again would produce the same
+subtitles.
+
+The module also contains a cache of decoded audio (re-used even if the model
+or other settings change), helpers to hash media while it is written to disk
+and to keep directories (e.g., the uploads) within a size and age limit.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Collection, List, Optional
+
+from dnt.subtitles import Subtitles
+from dnt.translation import translator_identity
+
+# Media is copied and hashed in chunks of this size (in bytes).
+CHUNK_SIZE = 1024 * 1024
+
+
+def save_and_hash(stream: IO[bytes], path: Path) -> str:
+    """
+    Write a stream to `path` and hash its content on the way.
+
+    The stream is read only once, so hashing an upload costs no extra pass
+    over the file.
+
+    Returns:
+        The SHA-256 hex digest of the content.
+
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'wb') as fd:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            fd.write(chunk)
+
+    return digest.hexdigest()
+
+
+def hash_file(path: Path) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's content.
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def file_identity(path: Path) -> str:
+    """
+    Identify a (large) file without reading it, e.g. a model.
+
+    The identity changes whenever the file is replaced, e.g. by a fine-tuned
+    version of the model under the same name.
+    """
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def result_key(media_hash: str, model: Path, scorer: Path, translator, segmenter) -> str:
+    """
+    Returns the key of the result of processing some media.
+
+    Args:
+        media_hash: Hash of the media's content (c.f. hash_file).
+        model: Path to the acoustic model.
+        scorer: Path to the scorer (language model).
+        translator: The translator used.
+        segmenter: The segmenter used; its public attributes are its
+            settings.
+
+    """
+    parts = {
+        'media': media_hash,
+        'model': file_identity(model),
+        'scorer': file_identity(scorer),
+        'translator': translator_identity(translator),
+        'segmenter': [
+            type(segmenter).__name__,
+            sorted((name, value) for name, value in vars(segmenter).items()
+                   if not name.startswith('_'))
+        ],
+    }
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResultCache:
+    """
+    Store the subtitles generated for some media on disk.
+
+    Each result is a JSON file named by its key (see result_key). Results
+    that have not been used for `max_age` seconds are discarded; if the
+    results exceed `max_size` bytes, the least recently used are discarded.
+
+    Example:
+        >>> cache = ResultCache(Path("cache/results"), max_age=30 * 86400)
+        >>> key = result_key(hash_file(video), model, scorer, translator, segmenter)
+        >>> cache.get(key) or cache.put(key, pipeline.process(audio))
+
+    """
+
+    def __init__(self, directory: Path, max_age: Optional[float] = None, max_size: Optional[int] = None):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_size = max_size
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[List[Subtitles]]:
+        """
+        Returns the cached subtitles, or None if there are none (anymore).
+        """
+        path = self.directory / f"{key}.json"
+
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        if self.max_age is not None and time.time() - path.stat().st_mtime > self.max_age:
+            return None
+
+        # The modification time tracks the last use (for the eviction).
+        path.touch()
+
+        return [Subtitles(**entry) for entry in entries]
+
+    def put(self, key: str, subtitles: List[Subtitles]) -> List[Subtitles]:
+        """
+        Cache the subtitles and evict old results.
+        """
+        entries = [
+            {'format': s.format, 'language_code': s.language_code, 'content': s.content}
+            for s in subtitles
+        ]
+
+        path = self.directory / f"{key}.json"
+        partial = path.with_name(f".{uuid.uuid4().hex}.part")
+        partial.write_text(json.dumps(entries), encoding="utf-8")
+        partial.replace(path)
+
+        prune(self.directory, self.max_age, self.max_size, keep={path})
+
+        return subtitles
+
+
+class AudioCache:
+    """
+    Store the decoded audio of videos on disk.
+
+    Decoding a video with ffmpeg is a large, fixed cost of every run, e.g.
+    when comparing models on the same lecture. The cache keeps the decoded
+    16 kHz mono audio as 16-bit PCM, keyed by the video's content hash. The
+    PCM is stored in a WAV container (44 bytes of header), so the segmenters
+    memory-map it just like a freshly extracted file.
+
+    If the cached audio exceeds `max_size` bytes, the least recently used
+    files are evicted.
+
+    Example:
+        >>> cache = AudioCache(Path("cache/audio"), max_size=4 * 1024 ** 3)
+        >>> wavfile = cache.get(hash_file(video), video)  # ffmpeg runs once.
+        >>> pipeline.process(wavfile)
+
+    """
+
+    def __init__(self, directory: Path, max_size: Optional[int] = None):
+        self.directory = directory
+        self.max_size = max_size
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, media_hash: str, video: Path) -> Path:
+        """
+        Returns the decoded audio of `video`, decoding it if it's not cached.
+
+        Args:
+            media_hash: Hash of the video's content (c.f. hash_file).
+            video: The video to decode on a cache miss.
+
+        Raises:
+            RuntimeError, if the video can not be decoded.
+
+        """
+        from subprocess import CalledProcessError
+
+        from dnt.preprocessing import extract_audio
+
+        path = self.directory / f"{media_hash}.wav"
+
+        if path.is_file():
+            # The modification time tracks the last use (for the eviction).
+            path.touch()
+            return path
+
+        # ffmpeg picks the output format by the file extension.
+        partial = path.with_name(f".{uuid.uuid4().hex}.part.wav")
+        try:
+            try:
+                extract_audio(video, partial)
+            except CalledProcessError as error:
+                # Never cache the output of a failed (e.g., truncated) decode.
+                raise RuntimeError(f"Unable to decode the audio of {video}.") from error
+
+            if not partial.is_file():
+                raise RuntimeError(f"Unable to decode the audio of {video}.")
+            partial.replace(path)
+        finally:
+            partial.unlink(missing_ok=True)
+
+        prune(self.directory, max_size=self.max_size, keep={path})
+
+        return path
+
+
+def prune(
+    directory: Path,
+    max_age: Optional[float] = None,
+    max_size: Optional[int] = None,
+    keep: Collection[Path] = ()
+) -> int:
+    """
+    Delete files in `directory` that are too old or exceed the size limit.
+
+    First, files not modified within `max_age` seconds are deleted. Then, the
+    least recently modified files are deleted until the remaining ones take
+    up at most `max_size` bytes.
+
+    Args:
+        directory: The directory to prune (not recursive).
+        max_age: Maximum age of the files (in seconds). No limit if None.
+        max_size: Maximum total size of the files (in bytes). No limit if None.
+        keep: Files never to delete, e.g. because they're in use.
+
+    Returns:
+        The number of deleted files.
+
+    """
+    keep = {Path(p).resolve() for p in keep}
+    files = []
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+
+    # Least recently modified first.
+    files.sort(key=lambda file: file[0])
+
+    now = time.time()
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+
+    for modified, size, path in files:
+        too_old = max_age is not None and now - modified > max_age
+        too_big = max_size is not None and total > max_size
+
+        if not (too_old or too_big):
+            continue
+
+        if path.resolve() in keep:
+            continue
+
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            # Deleted by somebody else in the meantime.
+            pass
+        except PermissionError:
+            # In use (on Windows, open files can not be deleted).
+            continue
+
+        total -= size
+        deleted += 1
+
+    return deleted
@@ -2,38 +2,86 @@
 
 Usage:
     deep-neural-transcriber --version
-    deep-neural-transcriber prepare <dataset> <partition> <output_directory>
-    deep-neural-transcriber process <video_file> --model=<model_path> --scorer=<scorer_path> [--output=<output_path>]
+    deep-neural-transcriber prepare <dataset> <partition> <output_directory> [--workers=<n>]
+    deep-neural-transcriber process <video_file> (--model=<model_path>)... --scorer=<scorer_path> [--output=<output_path>] [--workers=<n>] [--stream] [--pipe] [--translation-cache=<path>] [--translation-cache-size=<n>] [--translation-cache-days=<days>] [--translations-in-flight=<n>] [--segmenter=<name>] [--result-cache=<dir>] [--result-cache-days=<days>] [--result-cache-size=<mb>] [--audio-cache=<dir>] [--audio-cache-size=<mb>] [--profile=<file>]
+    deep-neural-transcriber process-batch <videos>... (--model=<model_path>)... --scorer=<scorer_path> [--output=<output_path>] [--workers=<n>] [--jobs=<n>] [--force] [--report=<file>] [--translation-cache=<path>] [--translation-cache-size=<n>] [--translation-cache-days=<days>] [--translations-in-flight=<n>] [--segmenter=<name>] [--result-cache=<dir>] [--result-cache-days=<days>] [--result-cache-size=<mb>] [--audio-cache=<dir>] [--audio-cache-size=<mb>]
+    deep-neural-transcriber evaluate <dataset> <partition> --model=<model_path> --scorer=<scorer_path> [--workers=<n>] [--segments=<n>] [--report=<file>]
     deep-neural-transcriber web [--host=<listen_addr>] [--port=<port>]
 
 
 Options:
     -h --help     Show this screen.
     --version     Show version.
+    --model=<model_path>  Acoustic model to transcribe with. Given multiple times,
+                  all models transcribe the video (e.g., to compare them).
+    --workers=<n> Number of processes transcribing (per model), preparing or
+                  evaluating on the dataset in parallel [default: 1].
+    --stream      Write each subtitle line as soon as it is transcribed.
+    --pipe        Decode the audio on the fly instead of into a temporary file.
+                  Implied when <video_file> is "-" (read the video from stdin).
+    --translation-cache=<path>       Cache translations in this SQLite file.
+    --translation-cache-size=<n>     Maximum number of cached translations [default: 100000].
+    --translation-cache-days=<days>  Discard cached translations after this many days.
+    --translations-in-flight=<n>     Maximum number of concurrent translation requests [default: 4].
+    --segmenter=<name>               How to split the audio: "interval" (every 10 s) or "vad"
+                                     (at pauses, skipping silence) [default: interval].
+    --result-cache=<dir>             Re-use the subtitles of videos with the same content, model,
+                                     scorer, translator and segmenter from this directory.
+    --result-cache-days=<days>       Discard cached results unused for this many days [default: 30].
+    --result-cache-size=<mb>         Maximum size of the result cache (in MiB) [default: 1024].
+    --audio-cache=<dir>              Keep the decoded audio of videos in this directory, so that
+                                     re-runs (e.g., with another model) skip decoding.
+    --audio-cache-size=<mb>          Maximum size of the audio cache (in MiB) [default: 4096].
+    --profile=<file>                 Write the timings of each stage (e.g., the real-time factor of
+                                     the transcription) to this JSON file.
+    --jobs=<n>                       Number of videos processed at the same time [default: 1].
+    --force                          Transcribe videos even if their subtitles are up to date.
+    --report=<file>                  Write the timings and failures of the batch (default:
+                                     batch-report.json) or the scores of the evaluation (default:
+                                     evaluation.json) to this JSON file.
+    --segments=<n>                   Only evaluate on the first n segments of the partition.
+
+<videos> are directories (all videos in them), glob patterns or manifests (text files with one
+video per line).
 
 """
 import os
-import csv
+import json
 import tempfile
 import time
-from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple
-import deepspeech
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 from docopt import docopt
-from tqdm import tqdm
 
-from dnt.core import Pipeline
-from dnt.datasets.europarl import EuroparlST
-from dnt.preprocessing import (IntervalSegmenter, extract_audio, normalize,
-                               segment_audio)
-from dnt.subtitles import SRT, VTT, Subtitles
-from dnt.transcription import DeepSpeechTranscriber
-from dnt.translation import DeepL, NopTranslator
-
-
-def process(arguments) -> List[Tuple[Subtitles, Path]]:
+from dnt.utils import first, listify
+
+# Note: The subcommands import their (heavy) dependencies themselves, e.g.
+# DeepSpeech or the pipeline. That way, starting the CLI only pays for what
+# the chosen subcommand actually uses.
+if TYPE_CHECKING:
+    from dnt.core import Pipeline
+    from dnt.subtitles import Subtitles
+    from dnt.translation import Translator
+
+# Segmenters selectable with --segmenter (class names in dnt.preprocessing).
+SEGMENTERS = {
+    'interval': 'IntervalSegmenter',
+    'vad': 'VadSegmenter',
+}
+
+
+def process(
+    arguments,
+    transcriber=None,
+    progress=None,
+    media_hash=None,
+    transcribers=None,
+    hooks=None,
+    pipelines=None
+) -> List[Tuple['Subtitles', Path]]:
     """
     Generate subtitles for a video.
 
@@ -41,46 +89,126 @@ def process(arguments) -> List[Tuple[Subtitles, Path]]:
     video, process returns a list containing information about the generated
     file paths. This feature is used by the Web UI for offering subtitles
     files for download.
+
+    If multiple models are given, the video is decoded and segmented once and
+    transcribed by all models at the same time (see FanOutPipeline). Each
+    model's subtitles are named after the model, and a timing report is
+    written next to them.
+
+    Args:
+        arguments: The parsed command line arguments (docopt format).
+        transcriber: An already loaded transcriber to use instead of loading
+            the model given in `--model` and `--scorer`, e.g. from a
+            ModelRegistry. Ignored with more than one worker, as every worker
+            process loads its own copy of the model.
+        progress: Called with the number of segments done and the total
+            number of segments (None if unknown), see Pipeline.process.
+            Ignored with --stream.
+        media_hash: Hash of the video's content (c.f. dnt.cache.hash_file),
+            if already known. Used with --result-cache and --audio-cache.
+        transcribers: Like `transcriber`, but for multiple models: Already
+            loaded transcribers by model path.
+        hooks: Receive the timings of the pipelines (see dnt.metrics), e.g.
+            to export them as metrics.
+        pipelines: Already running pipelines by model path, e.g. kept
+            across videos by process_batch. Their segmenter and translator
+            are used, and they are not closed.
+
     """
-    videofile = Path(arguments['<video_file>'])
+    from dnt.cache import AudioCache, ResultCache, hash_file, result_key
+    from dnt.metrics import Profiler, chain
+    from dnt.translation import CachingTranslator
+
+    # "-" reads the video from stdin, e.g. when streaming it from storage.
+    from_stdin = str(arguments['<video_file>']) == '-'
+    videofile = Path('stdin' if from_stdin else arguments['<video_file>'])
 
     if arguments['--output']:
         outputdir = Path(arguments['--output'])
     else:
         outputdir = videofile.parent
 
-    model_path = Path(arguments['--model'])
+    model_paths = [Path(model) for model in listify(arguments['--model'])]
     scorer_path = Path(arguments['--scorer'])
+    streaming = bool(arguments.get('--stream'))
+    piping = from_stdin or bool(arguments.get('--pipe'))
 
-    deepl_api_key = os.environ.get('DEEPL_API_KEY', None)
-    if not deepl_api_key:
-        # Abort if no DeepL API key could be retrieved
-        # Note: If you don't have a DeepL API key, you can also skip translation
-        # by using the NopTranslator.
-        pass
-        # raise RuntimeError("No API key found in DEEPL_API_KEY env variable!")
-
-    pipeline = Pipeline(
-        IntervalSegmenter(),
-        DeepSpeechTranscriber(model_path, scorer_path),
-        NopTranslator(),
-        [VTT(), SRT()]
-    )
-    # DeepL(deepl_api_key),
+    # Subtitles of multiple models are told apart by the model's label.
+    labels = model_labels(model_paths) if len(model_paths) > 1 else {model_paths[0]: None}
+
+    if streaming and len(model_paths) > 1:
+        raise ValueError("Streaming (--stream) supports a single model only.")
+
+    transcribers = dict(transcribers or {})
+    if transcriber is not None:
+        transcribers[model_paths[0]] = transcriber
+
+    if pipelines:
+        shared = first(pipelines.values())
+        segmenter, translator = shared.segmenter, shared.translator
+    else:
+        segmenter = make_segmenter(arguments)
+        translator = make_translator(arguments)
+
+    # A video read from stdin can not be hashed upfront, so it's never cached.
+    use_results = bool(arguments.get('--result-cache')) and not from_stdin
+    # When piping, the audio is decoded on the fly; there's nothing to keep.
+    use_audio = bool(arguments.get('--audio-cache')) and not piping
+
+    if media_hash is None and (use_results or use_audio):
+        media_hash = hash_file(videofile)
+
+    results = None
+    if use_results:
+        max_days = arguments.get('--result-cache-days')
+        max_size = arguments.get('--result-cache-size')
+        results = ResultCache(
+            Path(arguments['--result-cache']),
+            max_age=float(max_days) * 24 * 60 * 60 if max_days else None,
+            max_size=int(max_size) * 1024 * 1024 if max_size else None
+        )
+
+    audio_cache = None
+    if use_audio:
+        max_size = arguments.get('--audio-cache-size')
+        audio_cache = AudioCache(
+            Path(arguments['--audio-cache']),
+            max_size=int(max_size) * 1024 * 1024 if max_size else None
+        )
+
+    def cache_key(model_path: Path) -> str:
+        return result_key(media_hash, model_path, scorer_path, translator, segmenter)
 
     start = time.time()
-    with tempfile.TemporaryDirectory() as tmpdirname:
-        # Use a temporary file to store the wav file content
-        # during transcription.
-
-        # Note: TemporaryFile creates and *opens* a temporary file.
-        # Under windows, when opening a temporary file will cause
-        # a permission denied error, since the file is already open.
-        # Therefore, we have to work around that problem by manually
-        # creating a tempfile.
-        wavfile = Path(tmpdirname) / 'temporary.wav'
-        extract_audio(videofile, wavfile)
-        subtitles = pipeline.process(wavfile)
+
+    # Look up the models' subtitles in the cache first; only the remaining
+    # models have to transcribe the video.
+    subtitles = {}
+    for model_path in model_paths:
+        cached = results.get(cache_key(model_path)) if results is not None else None
+        if cached is not None:
+            print(f"* Found subtitles of {model_path} in the result cache.")
+            subtitles[model_path] = cached
+
+    missing = [model_path for model_path in model_paths if model_path not in subtitles]
+    timings: Dict[str, float] = {}
+
+    profilers = {model_path: Profiler() for model_path in missing} if arguments.get('--profile') else {}
+
+    if missing:
+        transcribed, timings = transcribe(
+            arguments, missing, scorer_path, segmenter, translator,
+            transcribers, progress,
+            audio=decoded_audio(videofile, from_stdin, piping, audio_cache, media_hash),
+            writers=partial(subtitle_path, outputdir, videofile, label=labels[model_paths[0]]) if streaming else None,
+            hooks={model_path: chain(hooks, profilers.get(model_path)) for model_path in missing},
+            pipelines=pipelines
+        )
+
+        for model_path, model_subtitles in transcribed.items():
+            if results is not None:
+                results.put(cache_key(model_path), model_subtitles)
+            subtitles[model_path] = model_subtitles
 
     end = time.time()
 
@@ -88,90 +216,518 @@ def process(arguments) -> List[Tuple[Subtitles, Path]]:
     # programmatically.
     subtitle_files = []
 
-    for subtitle in subtitles:
-        subtitle_file = outputdir / \
-            f"{videofile.name}.{subtitle.language_code}.{subtitle.format}"
+    for model_path in model_paths:
+        for subtitle in subtitles[model_path]:
+            subtitle.model = labels[model_path]
+            subtitle_file = subtitle_path(outputdir, videofile, subtitle.language_code,
+                                          subtitle.format, subtitle.model)
 
-        subtitle_file.write_text(subtitle.content, encoding="utf-8")
+            # When streaming, the pipeline has written the file already.
+            if not streaming or model_path not in missing:
+                subtitle_file.write_text(subtitle.content, encoding="utf-8")
 
-        subtitle_files.append((subtitle, subtitle_file))
+            subtitle_files.append((subtitle, subtitle_file))
 
-        print(
-            "* Created subtitle file:",
-            f"language={subtitle.language_code}, format={subtitle.format}",
-            f"filename={str(subtitle_file)}"
-        )
+            print(
+                "* Created subtitle file:",
+                f"language={subtitle.language_code}, format={subtitle.format}",
+                f"filename={str(subtitle_file)}"
+            )
+
+    if isinstance(translator, CachingTranslator) and not pipelines:
+        print("Translation cache:", f"hits={translator.hits}, misses={translator.misses}")
+        translator.close()
 
     duration = (end - start)
     print("Duration:", duration)
 
+    if len(model_paths) > 1:
+        report = {
+            'total': duration,
+            **{key: value for key, value in timings.items() if key in ('decode', 'segmentation')},
+            'models': {
+                labels[model_path]: timings.get(str(model_path))
+                for model_path in model_paths
+            },
+        }
+        report_file = outputdir / f"{videofile.name}.timings.json"
+        report_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print("* Created timing report:", f"filename={str(report_file)}")
+
+        for model_path in model_paths:
+            seconds = timings.get(str(model_path))
+            print(f"  {labels[model_path]}:",
+                  f"{seconds:.1f}s" if seconds is not None else "cached")
+
+    if arguments.get('--profile'):
+        # Cached models did not run, so there is nothing to report for them.
+        profile = {
+            'video': str(videofile),
+            'total': duration,
+            'decode': timings.get('decode'),
+            'models': {
+                str(model_path): profilers[model_path].report() if model_path in profilers else None
+                for model_path in model_paths
+            },
+        }
+        profile_file = Path(arguments['--profile'])
+        profile_file.write_text(json.dumps(profile, indent=2), encoding="utf-8")
+        print("* Created profile:", f"filename={str(profile_file)}")
+
     return subtitle_files
 
 
+def transcribe(
+    arguments,
+    model_paths: List[Path],
+    scorer_path: Path,
+    segmenter,
+    translator,
+    transcribers,
+    progress,
+    audio,
+    writers=None,
+    hooks=None,
+    pipelines=None
+) -> Tuple[Dict[Path, List['Subtitles']], Dict[str, float]]:
+    """
+    Transcribe the audio with each model.
+
+    Args:
+        audio: Context manager providing the decoded audio, see decoded_audio.
+        writers: If set, the subtitles are written line by line while they are
+            transcribed (single model only). Returns the path of a subtitle
+            file for a language code and subtitle format.
+        hooks: The hooks of each model's pipeline, by model path.
+        pipelines: Already running pipelines by model path, which are used
+            instead of creating new ones (and not closed).
+
+    See process() for the remaining arguments.
+
+    Returns:
+        The subtitles by model and the timings (in seconds) of the steps
+        ('decode', 'segmentation', and the models' transcriptions by path).
+
+    """
+    from dnt.core import FanOutPipeline, ParallelPipeline, Pipeline
+    from dnt.subtitles import SRT, VTT, SubtitleWriter
+
+    workers = int(arguments.get('--workers') or 1)
+    translations_in_flight = int(arguments.get('--translations-in-flight') or 4)
+    hooks = hooks or {}
+    pipelines = pipelines or {}
+
+    def new_pipeline(model_path: Path) -> 'Pipeline':
+        # Only import DeepSpeech when a model has to be loaded, i.e. not for
+        # already running pipelines.
+        from dnt.transcription import DeepSpeechTranscriber
+
+        if workers > 1:
+            # Every worker process loads its own copy of the model.
+            return ParallelPipeline(
+                segmenter,
+                partial(DeepSpeechTranscriber, model_path, scorer_path),
+                translator,
+                [VTT(), SRT()],
+                workers=workers,
+                translations_in_flight=translations_in_flight,
+                hooks=hooks.get(model_path)
+            )
+
+        return Pipeline(
+            segmenter,
+            transcribers.get(model_path) or DeepSpeechTranscriber(model_path, scorer_path),
+            translator,
+            [VTT(), SRT()],
+            translations_in_flight=translations_in_flight,
+            hooks=hooks.get(model_path)
+        )
+
+    start = time.time()
+
+    with audio as decoded, ExitStack() as owned:
+        timings = {'decode': time.time() - start}
+
+        def pipeline_for(model_path: Path) -> 'Pipeline':
+            if model_path in pipelines:
+                return pipelines[model_path]
+
+            # Close the pipelines created here once the audio is transcribed.
+            return owned.enter_context(new_pipeline(model_path))
+
+        if len(model_paths) > 1:
+            fan_out = FanOutPipeline(segmenter, {
+                str(model_path): pipeline_for(model_path) for model_path in model_paths
+            })
+            result = fan_out.process(decoded, progress=progress)
+
+            timings.update(result.timings)
+            return {Path(name): s for name, s in result.subtitles.items()}, timings
+
+        model_path = model_paths[0]
+        started = time.time()
+
+        pipeline = pipeline_for(model_path)
+        if writers is None:
+            subtitles = pipeline.process(decoded, progress=progress)
+        else:
+            # Append each line to the subtitle files as soon as its
+            # segment has been transcribed and translated.
+            subtitle_writers = [
+                SubtitleWriter(subtitle_format, language_code,
+                               writers(language_code, subtitle_format.name))
+                for language_code in ('de', 'en')
+                for subtitle_format in pipeline.subtitle_formats
+            ]
+
+            subtitles = pipeline.write_stream(decoded, subtitle_writers)
+
+        timings[str(model_path)] = time.time() - started
+
+        return {model_path: subtitles}, timings
+
+
+@contextmanager
+def decoded_audio(videofile: Path, from_stdin: bool, piping: bool, audio_cache, media_hash):
+    """
+    Decode the video's audio for the pipeline.
+
+    Yields:
+        A stream of raw PCM when piping, otherwise the path of a WAV file.
+
+    """
+    from dnt.preprocessing import decode_audio, extract_audio
+
+    if piping:
+        # ffmpeg decodes into a pipe, which the pipeline consumes while
+        # ffmpeg is still decoding.
+        with decode_audio(None if from_stdin else videofile) as pcm:
+            yield pcm
+    elif audio_cache is not None:
+        # Decodes the video only if it hasn't been decoded before.
+        yield audio_cache.get(media_hash, videofile)
+    else:
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            # Use a temporary file to store the wav file content
+            # during transcription.
+
+            # Note: TemporaryFile creates and *opens* a temporary file.
+            # Under windows, when opening a temporary file will cause
+            # a permission denied error, since the file is already open.
+            # Therefore, we have to work around that problem by manually
+            # creating a tempfile.
+            wavfile = Path(tmpdirname) / 'temporary.wav'
+            extract_audio(videofile, wavfile)
+            yield wavfile
+
+
+def subtitle_path(outputdir: Path, videofile: Path, language_code: str,
+                  subtitle_format: str, label=None) -> Path:
+    """
+    Returns where to write a video's subtitles, e.g. `lecture.mp4.de.vtt`.
+
+    The subtitles of multiple models are told apart by the model's label,
+    e.g. `lecture.mp4.fine-tuned.de.vtt`.
+    """
+    model = f".{label}" if label else ""
+    return outputdir / f"{videofile.name}{model}.{language_code}.{subtitle_format}"
+
+
+def model_labels(model_paths: List[Path]) -> Dict[Path, str]:
+    """
+    Returns a short, unique label for each model, to name its subtitles.
+
+    Models are usually stored in a directory per model (see list_models),
+    so the directory's name is used. If that's ambiguous, the file name is
+    added.
+    """
+    names = [model_path.parent.name or model_path.stem for model_path in model_paths]
+
+    return {
+        model_path: name if names.count(name) == 1 else f"{name}-{model_path.name}"
+        for model_path, name in zip(model_paths, names)
+    }
+
+
+def make_segmenter(arguments):
+    """
+    Create the segmenter selected with --segmenter.
+    """
+    from dnt import preprocessing
+
+    segmenter_name = arguments.get('--segmenter') or 'interval'
+
+    if segmenter_name not in SEGMENTERS:
+        raise ValueError(
+            f"Unknown segmenter '{segmenter_name}'. Choose one of: {', '.join(SEGMENTERS)}"
+        )
+
+    return getattr(preprocessing, SEGMENTERS[segmenter_name])()
+
+
+def make_translator(arguments) -> 'Translator':
+    """
+    Create the translator: DeepL if an API key is configured, optionally
+    wrapped in a cache (--translation-cache).
+    """
+    from dnt.translation import CachingTranslator, DeepL, NopTranslator
+
+    translator: 'Translator'
+
+    deepl_api_key = os.environ.get('DEEPL_API_KEY', None)
+    if deepl_api_key:
+        translator = DeepL(deepl_api_key)
+    else:
+        # Note: If you don't have a DeepL API key, we skip translation by using
+        # the NopTranslator.
+        translator = NopTranslator()
+
+    if arguments.get('--translation-cache'):
+        max_days = arguments.get('--translation-cache-days')
+        translator = CachingTranslator(
+            translator,
+            Path(arguments['--translation-cache']),
+            max_entries=int(arguments.get('--translation-cache-size') or 100_000),
+            max_age=float(max_days) * 24 * 60 * 60 if max_days else None
+        )
+
+    return translator
+
+
 def prepare(arguments):
     """
     Prepare dataset for training.
+
+    The speeches are cut into segments by --workers processes. An interrupted
+    run picks up where it stopped (see dnt.datasets.preparation).
     """
+    from tqdm import tqdm
+
+    from dnt.datasets.europarl import EuroparlST
+    from dnt.datasets.preparation import prepare_partition
+
     dataset = Path(arguments['<dataset>'])
     partition = arguments['<partition>']
-    destination = Path(arguments['<output_directory>']) / partition
-
     # Create partition directory in the output directory, e.g. "some-directory/train"
-    destination.mkdir(parents=True, exist_ok=True)
-
-    # Set up metadata csv
-    labels = ['wav_filename', 'wav_filesize', 'transcript']
-    indexfile = (destination / partition).with_suffix('.csv')
+    destination = Path(arguments['<output_directory>']) / partition
+    workers = int(arguments.get('--workers') or 1)
 
     # Initialize the dataset partition from disk
     europarl = EuroparlST(dataset, "en", "de", partition)
 
-    # Keep track of some stats
-    stats = defaultdict(int)
+    with tqdm(total=europarl.number_of_segments) as progress:
+        stats = prepare_partition(
+            europarl, destination, workers=workers,
+            progress=lambda done, total: progress.update(done - progress.n)
+        )
+
+    print(stats)
 
-    with open(indexfile, "w", encoding="utf-8") as fd:
-        writer = csv.writer(fd, quoting=csv.QUOTE_NONE, escapechar='')
-        writer.writerow(labels)
 
-        # Loop over all segments and split the audio file on the fly using
-        # ffmpeg.
-        for index, segment in enumerate(tqdm(
-            europarl.get_segments(),
-            total=europarl.number_of_segments
-        )):
-            sample, time_start, time_end, transcript = segment
+def process_batch(arguments, transcriber_factory=None):
+    """
+    Generate subtitles for many videos, loading the models only once.
 
-            # We only want samples between 10s and 20s
-            duration = time_end - time_start
+    Each model's pipeline is created once and shared by all videos, which
+    are processed --jobs at a time. Videos whose subtitles are newer than the
+    video, the models and the scorer are skipped (unless --force is given).
+    A failing video does not stop the batch; the report lists the timings
+    and errors of all videos.
 
-            if duration > 20.0 or duration < 10.0:
-                # Discard segments that are too long or too short, according
-                # to the deepspeech docs.
-                stats['discarded'] += 1
-                continue
+    Args:
+        arguments: The parsed command line arguments (docopt format).
+        transcriber_factory: Creates a transcriber from a model and scorer
+            path. Defaults to DeepSpeechTranscriber. Must be picklable with
+            more than one worker.
 
-            outfile = destination / f"{sample.name}-segment{index}.wav"
-            segment_audio(sample, outfile, time_start, time_end)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
 
-            # Get size of the freshly produced segment file.
-            size = outfile.stat().st_size
+    from dnt.batch import SharedTranscriber, find_videos, is_up_to_date
+    from dnt.core import ParallelPipeline, Pipeline
+    from dnt.subtitles import SRT, VTT
+    from dnt.translation import CachingTranslator
 
-            # Normalize the transcript acc. to DeepSpeech alphabet.
-            transcript = normalize(transcript)
+    videos = find_videos(arguments['<videos>'])
+    model_paths = [Path(model) for model in listify(arguments['--model'])]
+    scorer_path = Path(arguments['--scorer'])
+    workers = int(arguments.get('--workers') or 1)
+    jobs = int(arguments.get('--jobs') or 1)
+    translations_in_flight = int(arguments.get('--translations-in-flight') or 4)
+
+    labels = model_labels(model_paths) if len(model_paths) > 1 else {model_paths[0]: None}
+    formats = [VTT(), SRT()]
+
+    def outputs(videofile: Path) -> List[Path]:
+        outputdir = Path(arguments['--output']) if arguments['--output'] else videofile.parent
+        return [
+            subtitle_path(outputdir, videofile, language_code, subtitle_format.name, labels[model_path])
+            for model_path in model_paths
+            for language_code in ('de', 'en')
+            for subtitle_format in formats
+        ]
+
+    entries = {video: {'video': str(video), 'status': 'skipped'} for video in videos}
+    pending = [
+        video for video in videos
+        if arguments.get('--force') or not is_up_to_date(outputs(video), [video, *model_paths, scorer_path])
+    ]
+
+    print(f"* Found {len(videos)} videos, {len(videos) - len(pending)} of them up to date.")
 
-            writer.writerow([outfile.name, size, transcript])
+    start = time.time()
 
-    print(stats)
+    if pending:
+        if transcriber_factory is None:
+            # Only import DeepSpeech when there's something to transcribe.
+            from dnt.transcription import DeepSpeechTranscriber
+            transcriber_factory = DeepSpeechTranscriber
+
+        segmenter, translator = make_segmenter(arguments), make_translator(arguments)
+
+        with ExitStack() as stack:
+            pipelines = {}
+            for model_path in model_paths:
+                if workers > 1:
+                    # The worker processes load the model once and are shared
+                    # by all videos.
+                    pipeline = ParallelPipeline(
+                        segmenter,
+                        partial(transcriber_factory, model_path, scorer_path),
+                        translator, formats, workers=workers,
+                        translations_in_flight=translations_in_flight
+                    )
+                else:
+                    pipeline = Pipeline(
+                        segmenter,
+                        SharedTranscriber(transcriber_factory(model_path, scorer_path)),
+                        translator, formats,
+                        translations_in_flight=translations_in_flight
+                    )
+                pipelines[model_path] = stack.enter_context(pipeline)
+
+            def run(videofile: Path) -> Dict:
+                started = time.time()
+                try:
+                    subtitle_files = process({**arguments, '<video_file>': str(videofile)},
+                                             pipelines=pipelines)
+                except Exception as error:
+                    return {
+                        'video': str(videofile),
+                        'status': 'failed',
+                        'seconds': time.time() - started,
+                        'error': f"{type(error).__name__}: {error}",
+                    }
+
+                return {
+                    'video': str(videofile),
+                    'status': 'done',
+                    'seconds': time.time() - started,
+                    'subtitles': [str(path) for _, path in subtitle_files],
+                }
+
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = {executor.submit(run, video): video for video in pending}
+
+                for done, future in enumerate(as_completed(futures), start=1):
+                    entry = entries[futures[future]] = future.result()
+                    print(f"* [{done}/{len(pending)}] {entry['video']}: {entry['status']}",
+                          f"({entry['seconds']:.1f}s)", entry.get('error', ''))
+
+        if isinstance(translator, CachingTranslator):
+            print("Translation cache:", f"hits={translator.hits}, misses={translator.misses}")
+            translator.close()
+
+    statuses = [entry['status'] for entry in entries.values()]
+    report = {
+        'seconds': time.time() - start,
+        'videos': len(videos),
+        **{status: statuses.count(status) for status in ('done', 'skipped', 'failed')},
+        'files': list(entries.values()),
+    }
+
+    report_file = Path(arguments.get('--report') or 'batch-report.json')
+    report_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("* Created batch report:", f"filename={str(report_file)}",
+          f"done={report['done']}, skipped={report['skipped']}, failed={report['failed']}")
+
+    if report['failed']:
+        raise SystemExit(f"{report['failed']} of {len(videos)} videos failed, see {report_file}.")
+
+
+def evaluate(arguments):
+    """
+    Evaluate a model on a dataset partition (WER and CER).
+
+    The speeches are transcribed by --workers processes, each loading the
+    model once (see dnt.evaluation).
+    """
+    from tqdm import tqdm
+
+    from dnt.datasets.europarl import EuroparlST
+    from dnt.evaluation import evaluate as evaluate_model
+    from dnt.transcription import DeepSpeechTranscriber
+
+    model_path = Path(first(listify(arguments['--model'])))
+    scorer_path = Path(arguments['--scorer'])
+    workers = int(arguments.get('--workers') or 1)
+    n = int(arguments.get('--segments') or 0)
+
+    europarl = EuroparlST(Path(arguments['<dataset>']), "en", "de", arguments['<partition>'])
+
+    with tqdm(total=min(n, europarl.number_of_segments) if n else europarl.number_of_segments) as progress:
+        evaluation = evaluate_model(
+            europarl, partial(DeepSpeechTranscriber, model_path, scorer_path),
+            workers=workers, n=n,
+            progress=lambda done, total: progress.update(done - progress.n)
+        )
+
+    corpus, throughput = evaluation.corpus, evaluation.throughput
+
+    print("WER:", corpus.wer, f"({corpus.word_errors} errors in {corpus.words} words)")
+    print("CER:", corpus.cer, f"({corpus.character_errors} errors in {corpus.characters} characters)")
+    print(
+        f"Transcribed {corpus.segments} segments ({corpus.audio_seconds:.0f}s of audio)",
+        f"in {evaluation.seconds:.1f}s:",
+        f"speed={throughput['speed']}, real_time_factor={throughput['real_time_factor']}"
+    )
+
+    report = {
+        'model': str(model_path),
+        'scorer': str(scorer_path),
+        'partition': europarl.partition,
+        **evaluation.as_dict(),
+    }
+    report_file = Path(arguments.get('--report') or 'evaluation.json')
+    report_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("* Created evaluation report:", f"filename={str(report_file)}")
+
+
+def web(arguments):
+    """
+    Serve the Web UI.
+    """
+    from dnt.ui.app import app
+
+    app.run(arguments['--host'] or '0.0.0.0', port=int(arguments['--port'] or 8080))
+
+
+# Subcommands by name.
+COMMANDS = {
+    'prepare': prepare,
+    'process': process,
+    'process-batch': process_batch,
+    'evaluate': evaluate,
+    'web': web,
+}
 
 
 def main():
     arguments = docopt(__doc__, version="Deep Neural Transcriber MVP v1.0")
 
-    if arguments['prepare']:
-        prepare(arguments)
-
-    if arguments['process']:
-        process(arguments)
+    for name, command in COMMANDS.items():
+        if arguments[name]:
+            command(arguments)
 
 
 if __name__ == "__main__":
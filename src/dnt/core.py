@@ -1,16 +1,30 @@
 """
 This module contains the core pipeline to transcribe audio files.
 
-Currently, the module only implements a single, sequential pipeline. Feel free
-to create your own pipeline implementations depending on your needs, like a
-pipeline that supports multi-threading/processing.
+The module implements a simple, sequential pipeline, a parallel pipeline
+that transcribes segments in a pool of worker processes and a pipeline that
+transcribes the same audio with several models. Feel free to create
+your own pipeline implementations depending on your needs.
 """
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from dnt.subtitles import Subtitles
-from dnt.translation import Translator
-from dnt.utils import listify
+from dnt.metrics import PipelineHooks, TimedTranslator, timed_segments
+from dnt.subtitles import Cue, Subtitles, SubtitleWriter
+from dnt.translation import Translator, translate_concurrently
+from dnt.utils import broadcast, buffered, listify
+
+# Progress callback: Called with the number of segments done and the total
+# number of segments (or None, if unknown).
+Progress = Callable[[int, Optional[int]], None]
 
 
 class Pipeline:
@@ -22,7 +36,16 @@ class Pipeline:
     extracted into a central config type that holds all this information. 
     """
 
-    def __init__(self, segmenter, transcriber, translator: Translator, subtitle_formats):
+    def __init__(
+        self,
+        segmenter,
+        transcriber,
+        translator: Translator,
+        subtitle_formats,
+        translations_in_flight: int = 4,
+        translation_batch_size: int = 10,
+        hooks: Optional[PipelineHooks] = None
+    ):
         """
         Initialize the pipeline.
 
@@ -37,13 +60,31 @@ class Pipeline:
 
             subtitle_format: How to format the subtitles.
 
+            translations_in_flight: Maximum number of translation requests
+                running concurrently to the transcription.
+
+            translation_batch_size: Number of transcripts translated per
+                request by process(). stream() translates each transcript
+                on its own to emit it as soon as possible.
+
+            hooks: Receive the timings of each stage and segment, e.g. a
+                dnt.metrics.Profiler.
+
         """
         self.segmenter = segmenter
         self.transcriber = transcriber
         self.translator = translator
         self.subtitle_formats = listify(subtitle_formats)
+        self.translations_in_flight = translations_in_flight
+        self.translation_batch_size = translation_batch_size
+        self.hooks = hooks
 
-    def process(self, audiofile: Path, keep_original: bool = True) -> List[Subtitles]:
+    def process(
+        self,
+        audiofile: Union[Path, BinaryIO],
+        keep_original: bool = True,
+        progress: Optional[Progress] = None
+    ) -> List[Subtitles]:
         """
         Run the transcription pipeline on given audio file.
 
@@ -57,9 +98,13 @@ class Pipeline:
         4. Finally, generate subtitle files in configured formats.
 
         Args:
-            audiofile: Location of the audio file to transcribe.
+            audiofile: Location of the audio file to transcribe, or a stream
+                of raw PCM if the segmenter supports it.
             keep_original: When set to True, the pipeline also generates
                 subtitles in the audio's source language.
+            progress: Called with the number of segments done and the total
+                number of segments (None if unknown) after each transcribed
+                segment.
 
         Example:
             >>> some_audio = Path("some-audio-file.wav")
@@ -77,15 +122,52 @@ class Pipeline:
         """
 
         # 1. Segment the input audio into segments
-        segments = self.segmenter.segment(audiofile)
+        segments = self.segment(audiofile)
+
+        total = number_of_segments(self.segmenter, audiofile) if progress is not None else None
+
+        return self.process_segments(segments, keep_original, progress, total)
+
+    def process_segments(
+        self,
+        segments: Iterable,
+        keep_original: bool = True,
+        progress: Optional[Progress] = None,
+        total: Optional[int] = None
+    ) -> List[Subtitles]:
+        """
+        Run the pipeline on already segmented audio (steps 2 - 4 of process).
+
+        Args:
+            segments: The audio segments to transcribe.
+            keep_original: See process().
+            progress: See process().
+            total: The number of segments (for the progress), if known.
+
+        Returns:
+            A list of generated subtitles.
+
+        """
+        start = time.perf_counter()
 
         # 2. Transcribe each segment (i.e., convert speech to text)
-        transcripts = [
-            self.transcriber.transcribe(segment) for segment in segments
-        ]
+        transcripts: List[Cue] = []
+
+        def transcribe():
+            cues = self.transcribe(segments)
+            if progress is not None:
+                cues = self.report(cues, total, progress)
+
+            for cue in cues:
+                transcripts.append(cue)
+                yield cue
 
         # 3. Translate each transcript into a target language (text to text)
-        translations = [self.translator.translate(t) for t in transcripts]
+        # Translation runs in the background as soon as transcripts are
+        # available, i.e. while the next segments are being transcribed.
+        translations = list(
+            self.translate(transcribe(), self.translation_batch_size)
+        )
 
         # 4. Finally, generate subtitle files in configured formats.
         subtitles_to_create = [('de', translations)]
@@ -93,10 +175,512 @@ class Pipeline:
             subtitles_to_create.append(('en', transcripts))
 
         subtitles = [
-            subtitle_format.compile(subtitle, language)
+            self.compile(subtitle_format, subtitle, language)
             for language, subtitle in subtitles_to_create
             for subtitle_format in self.subtitle_formats
 
         ]
 
+        if self.hooks is not None:
+            self.hooks.processed(time.perf_counter() - start)
+
+        return subtitles
+
+    def stream(self, audiofile: Union[Path, BinaryIO], buffer_size: int = 4) -> Iterator[Dict[str, Cue]]:
+        """
+        Run the transcription pipeline and yield the results segment by segment.
+
+        In contrast to process(), the results are not collected: Segmentation
+        and transcription run in background threads and hand over their
+        results through bounded buffers, while each transcript is translated
+        as soon as it is available. Therefore, the first result is available
+        after the first segment has been processed, not after the whole audio.
+
+        Args:
+            audiofile: Location of the audio file to transcribe, or a stream
+                of raw PCM if the segmenter supports it.
+            buffer_size: Number of items a step may run ahead of the next one.
+
+        Example:
+            >>> for texts in pipeline.stream(Path("some-audio-file.wav")):
+            ...     print(texts)
+            {'en': Cue(start=0, end=4200, text='first segment'),
+             'de': Cue(start=0, end=4200, text='erstes Segment')}
+            {'en': Cue(start=5100, end=9800, text='second segment'),
+             'de': Cue(start=5100, end=9800, text='zweites Segment')}
+
+        Returns:
+            An iterator over the transcript ('en') and translation ('de') of
+            each segment, in order.
+
+        """
+        start = time.perf_counter()
+
+        segments = buffered(self.segment(audiofile), buffer_size)
+        transcripts = buffered(self.transcribe(segments), buffer_size)
+
+        # Transcripts that are being translated, in order.
+        in_translation: deque = deque()
+
+        def remember(cues):
+            for cue in cues:
+                in_translation.append(cue)
+                yield cue
+
+        for translation in self.translate(remember(transcripts), batch_size=1):
+            yield {
+                'en': in_translation.popleft(),
+                'de': translation
+            }
+
+        if self.hooks is not None:
+            self.hooks.processed(time.perf_counter() - start)
+
+    def write_stream(self, audiofile: Union[Path, BinaryIO], writers: List[SubtitleWriter]) -> List[Subtitles]:
+        """
+        Run the pipeline like stream() and append each result to subtitle
+        files as soon as it is available.
+
+        Args:
+            audiofile: See stream().
+            writers: The subtitle files to write, in any of the formats and
+                languages ('en', 'de') of stream().
+
+        Returns:
+            The written subtitles, in the order of the writers.
+
+        """
+        # Time spent formatting and writing each file.
+        seconds = [0.0] * len(writers)
+
+        for texts in self.stream(audiofile):
+            for i, writer in enumerate(writers):
+                start = time.perf_counter()
+                writer.write(texts[writer.language_code])
+                seconds[i] += time.perf_counter() - start
+
+        written = []
+        for writer, spent in zip(writers, seconds):
+            start = time.perf_counter()
+            subtitles = writer.close()
+
+            if self.hooks is not None:
+                self.hooks.compiled(subtitles, spent + time.perf_counter() - start)
+
+            written.append(subtitles)
+
+        return written
+
+    def translate(self, transcripts: Iterable[Cue], batch_size: int) -> Iterator[Cue]:
+        """
+        Translate the transcripts concurrently to producing them.
+
+        Up to `translations_in_flight` batches are translated in background
+        threads (see dnt.translation.translate_concurrently), using the
+        translator's batch API if it provides one.
+
+        Returns:
+            An iterator over the translated cues in the same order as the
+            transcripts, at the same positions.
+
+        """
+        in_translation: deque = deque()
+
+        def texts():
+            for cue in transcripts:
+                in_translation.append(cue)
+                yield cue.text
+
+        translator = self.translator
+        if self.hooks is not None:
+            translator = TimedTranslator(translator, self.hooks)
+
+        translations = translate_concurrently(
+            translator,
+            texts(),
+            max_in_flight=self.translations_in_flight,
+            batch_size=batch_size
+        )
+
+        for translation in translations:
+            yield in_translation.popleft().with_text(translation)
+
+    def segment(self, audiofile: Union[Path, BinaryIO]) -> Iterable:
+        """
+        Split the audio into segments, reporting each one to the hooks.
+        """
+        segments = self.segmenter.segment(audiofile)
+
+        if self.hooks is not None:
+            segments = timed_segments(segments, self.hooks)
+
+        return segments
+
+    def compile(self, subtitle_format, cues: List[Cue], language: str) -> Subtitles:
+        """
+        Compile the cues into subtitles, reporting them to the hooks.
+        """
+        start = time.perf_counter()
+        subtitles = subtitle_format.compile(cues, language)
+
+        if self.hooks is not None:
+            self.hooks.compiled(subtitles, time.perf_counter() - start)
+
         return subtitles
+
+    def report(self, cues: Iterable[Cue], total: Optional[int], progress: Progress) -> Iterator[Cue]:
+        """
+        Report the progress after each cue.
+        """
+        progress(0, total)
+        for done, cue in enumerate(cues, start=1):
+            progress(done, total)
+            yield cue
+
+    def transcribe(self, segments: Iterable) -> Iterator[Cue]:
+        """
+        Transcribe each segment, one after another.
+
+        Returns:
+            An iterator over the transcripts in the same order as the segments,
+            positioned at their segment's start and end.
+
+        """
+        if self.hooks is None:
+            return (transcribe_segment(self.transcriber, s) for s in segments)
+
+        return self.timed(timed_transcribe_segment(self.transcriber, s) for s in segments)
+
+    def timed(self, results: Iterable) -> Iterator[Cue]:
+        """
+        Report the transcripts and how long each one took to the hooks.
+        """
+        for cue, seconds in results:
+            if self.hooks is not None:
+                self.hooks.transcribed(cue, seconds)
+            yield cue
+
+    def close(self):
+        """
+        Release resources held by the pipeline.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def number_of_segments(segmenter, audiofile: Union[Path, BinaryIO]) -> Optional[int]:
+    """
+    Returns the number of segments of the audio, or None if the segmenter
+    can not tell (e.g., for streams).
+    """
+    count = getattr(segmenter, 'number_of_segments', None)
+    return count(audiofile) if count is not None else None
+
+
+def transcribe_segment(transcriber, segment) -> Cue:
+    """
+    Transcribe a segment into a cue at the segment's position.
+    """
+    return Cue(segment.start, segment.end, transcriber.transcribe(segment))
+
+
+def timed_transcribe_segment(transcriber, segment) -> Tuple[Cue, float]:
+    """
+    Transcribe a segment and measure how long it took (in seconds).
+    """
+    start = time.perf_counter()
+    cue = transcribe_segment(transcriber, segment)
+    return cue, time.perf_counter() - start
+
+
+# Each worker process of the ParallelPipeline holds its own transcriber. The
+# transcriber is created once when the worker starts, so that the (expensive)
+# model loading is not repeated for every segment.
+_worker_transcriber = None
+
+
+def _init_worker(transcriber_factory: Callable):
+    global _worker_transcriber
+    _worker_transcriber = transcriber_factory()
+
+
+def _transcribe_in_worker(segment) -> Cue:
+    return transcribe_segment(_worker_transcriber, segment)
+
+
+def _timed_transcribe_in_worker(segment) -> Tuple[Cue, float]:
+    return timed_transcribe_segment(_worker_transcriber, segment)
+
+
+class ParallelPipeline(Pipeline):
+    """
+    Transcription pipeline that transcribes segments in a pool of processes.
+
+    Transcription is by far the most expensive step of the pipeline and
+    DeepSpeech only uses a single core per model. The parallel pipeline starts
+    a pool of worker processes, each loading its own transcriber once. The
+    pool is started lazily and re-used across calls to process(), so use the
+    pipeline as a context manager (or call close()) to shut the workers down.
+
+    Example:
+        >>> factory = functools.partial(DeepSpeechTranscriber, model, scorer)
+        >>> with ParallelPipeline(segmenter, factory, translator, formats,
+        ...                       workers=4) as pipeline:
+        ...     pipeline.process(Path("some-audio-file.wav"))
+
+    """
+
+    def __init__(
+        self,
+        segmenter,
+        transcriber_factory: Callable,
+        translator: Translator,
+        subtitle_formats,
+        workers: Optional[int] = None,
+        segments_in_flight: Optional[int] = None,
+        **options
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            transcriber_factory: Picklable callable without arguments that
+                creates a transcriber, e.g. a functools.partial of
+                DeepSpeechTranscriber. Called once in every worker process.
+
+            workers: Number of worker processes. Defaults to the number of
+                CPUs.
+
+            segments_in_flight: Maximum number of segments handed to the
+                workers but not yet returned. Bounds the memory used by
+                segments waiting in the pool. Defaults to twice the number
+                of workers.
+
+        See Pipeline for the remaining arguments.
+        """
+        super().__init__(segmenter, None, translator, subtitle_formats, **options)
+        self.transcriber_factory = transcriber_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.segments_in_flight = segments_in_flight or 2 * self.workers
+        self._pool = None
+        # The pipeline may be shared by several threads (e.g., by
+        # process-batch), which must not start a pool each.
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.transcriber_factory,)
+                )
+            return self._pool
+
+    def transcribe(self, segments: Iterable) -> Iterator[Cue]:
+        """
+        Transcribe the segments in the worker pool.
+
+        Returns:
+            An iterator over the transcripts in the same order as the segments.
+
+        """
+        if self.hooks is None:
+            return self.submit(_transcribe_in_worker, segments)
+
+        # Time the transcription in the workers, which excludes the time the
+        # segments wait in the pool's queue.
+        return self.timed(self.submit(_timed_transcribe_in_worker, segments))
+
+    def submit(self, function: Callable, segments: Iterable) -> Iterator:
+        """
+        Apply function to each segment in the worker pool.
+
+        Unlike Pool.imap, which consumes all segments upfront, only
+        `segments_in_flight` segments are handed to the pool at a time, so
+        lazily produced segments are not all held in memory.
+
+        Returns:
+            An iterator over the results in the same order as the segments.
+
+        """
+        in_flight: deque = deque()
+
+        for segment in segments:
+            in_flight.append(self.pool.apply_async(function, (segment,)))
+
+            if len(in_flight) >= self.segments_in_flight:
+                yield in_flight.popleft().get()
+
+        while in_flight:
+            yield in_flight.popleft().get()
+
+    def close(self):
+        """
+        Shut down the worker processes.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+
+@dataclass
+class FanOutResult:
+    """
+    The results of transcribing the same audio with several models.
+
+    Attributes:
+        subtitles: The generated subtitles, by model.
+        timings: Time (in seconds) spent segmenting the audio ('segmentation')
+            and running each model's pipeline (by model).
+
+    """
+    subtitles: Dict[str, List[Subtitles]]
+    timings: Dict[str, float]
+
+
+class FanOutPipeline:
+    """
+    Transcribe the same audio with several models, e.g. to compare them.
+
+    The audio is segmented once; each segment is then handed to each model's
+    pipeline, which all run at the same time. Hence, comparing N models costs
+    one segmentation plus N transcriptions, instead of N full runs.
+    Segmentation runs at most `buffer_size` segments ahead of the slowest
+    model, so the segments are not all held in memory.
+
+    Note: The pipelines run in threads. To transcribe on multiple cores, use
+    ParallelPipelines (i.e., worker processes) for the models.
+
+    Example:
+        >>> pipelines = {
+        ...     'pretrained': ParallelPipeline(segmenter, pretrained, translator, formats),
+        ...     'fine-tuned': ParallelPipeline(segmenter, finetuned, translator, formats),
+        ... }
+        >>> with FanOutPipeline(segmenter, pipelines) as pipeline:
+        ...     result = pipeline.process(Path("some-audio-file.wav"))
+        >>> result.timings
+        {'segmentation': 0.2, 'pretrained': 61.3, 'fine-tuned': 63.0}
+
+    """
+
+    def __init__(self, segmenter, pipelines: Dict[str, Pipeline], buffer_size: int = 4):
+        """
+        Initialize the pipeline.
+
+        Args:
+            segmenter: How to split the audio file into smaller pieces.
+            pipelines: The pipeline of each model, by (model) name. Their
+                segmenters are not used.
+            buffer_size: Number of segments the segmentation may run ahead
+                of the slowest model.
+
+        """
+        self.segmenter = segmenter
+        self.pipelines = pipelines
+        self.buffer_size = buffer_size
+
+    def process(
+        self,
+        audiofile: Union[Path, BinaryIO],
+        keep_original: bool = True,
+        progress: Optional[Progress] = None
+    ) -> FanOutResult:
+        """
+        Run each model's pipeline on the audio file.
+
+        Args:
+            audiofile: Location of the audio file to transcribe, or a stream
+                of raw PCM if the segmenter supports it.
+            keep_original: See Pipeline.process().
+            progress: Called with the number of segments done (summed over
+                all models) and the total number of segments to transcribe
+                (None if not known yet, e.g. for streams).
+
+        Returns:
+            The subtitles of each model and the timings.
+
+        """
+        total = number_of_segments(self.segmenter, audiofile) if progress is not None else None
+        segmentation_seconds = 0.0
+        segments_cut = 0
+        segmented = threading.Event()
+
+        def segment():
+            nonlocal segmentation_seconds, segments_cut
+
+            segments = iter(self.segmenter.segment(audiofile))
+            while True:
+                start = time.perf_counter()
+                segment = next(segments, None)
+                segmentation_seconds += time.perf_counter() - start
+
+                if segment is None:
+                    segmented.set()
+                    return
+
+                segments_cut += 1
+                yield segment
+
+        done = {name: 0 for name in self.pipelines}
+        lock = threading.Lock()
+
+        def report(name: Optional[str] = None, segments_done: int = 0, _=None):
+            with lock:
+                if name is not None:
+                    done[name] = segments_done
+
+                # The number of segments of a stream is only known once it
+                # has been segmented.
+                segments = total
+                if segments is None and segmented.is_set():
+                    segments = segments_cut
+                if progress is not None:
+                    progress(sum(done.values()),
+                             segments * len(self.pipelines) if segments is not None else None)
+
+        def run(name: str, pipeline: Pipeline, segments):
+            started = time.perf_counter()
+            try:
+                subtitles = pipeline.process_segments(
+                    segments, keep_original, partial(report, name), total
+                )
+            finally:
+                # Do not hold up the other models if this one failed.
+                segments.close()
+            return subtitles, time.perf_counter() - started
+
+        receivers = broadcast(segment(), len(self.pipelines), self.buffer_size)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.pipelines))) as executor:
+            futures = {
+                name: executor.submit(run, name, pipeline, segments)
+                for (name, pipeline), segments in zip(self.pipelines.items(), receivers)
+            }
+            subtitles, timings = {}, {}
+            for name, future in futures.items():
+                subtitles[name], timings[name] = future.result()
+
+        report()
+
+        return FanOutResult(subtitles, {'segmentation': segmentation_seconds, **timings})
+
+    def close(self):
+        """
+        Release the resources held by the models' pipelines.
+        """
+        for pipeline in self.pipelines.values():
+            pipeline.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
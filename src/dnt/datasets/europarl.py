@@ -79,11 +79,14 @@ transcripts are placed on per line to correspond with the line numbers of
 segments.lst
 
 """
+import sys
 from itertools import islice
 from pathlib import Path
-from typing import Iterator, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from dnt.utils import lines
+import numpy as np
+
+from dnt.utils import LineIndex
 
 
 def parse_segments_listing(line):
@@ -97,12 +100,29 @@ def parse_segments_listing(line):
 
 
 class EuroparlST:
+    """
+    A partition of Europarl-ST, indexed for fast access on the full corpus.
+
+    The segments are stored column by column: their start and end times in
+    NumPy arrays and their speech as an index into `speech_ids` (each id is
+    stored once). The rows of each speech, ordered by start time, are found
+    in O(1) through `speech_rows`. Transcripts are never read into memory as
+    a whole, but accessed through a LineIndex.
+
+    Attributes:
+        speech_ids: The ids of the speeches, in order of their first segment.
+        speech: The speech of each segment (index into `speech_ids`).
+        start: The start of each segment (in seconds).
+        end: The end of each segment (in seconds).
+
+    """
 
     def __init__(self, dataset_location: Path, source_language, target_language, partition):
         self.partition = partition
         self.path = dataset_location
         self.src = source_language
         self.tgt = target_language
+        self._transcripts: Dict[str, LineIndex] = {}
         self.load()
 
         self.audio_path = self.path / self.src / "audios"
@@ -110,30 +130,79 @@ class EuroparlST:
     def load(self):
         """
         Load dataset partition from filesystem.
+
+        Raises:
+            ValueError, if segments.lst contains a malformed line.
+
         """
         self.partition_path = self.path / self.src / self.tgt / self.partition
         segments_lst = self.partition_path / "segments.lst"
-        segments = [
-            parse_segments_listing(line)
-            for line in segments_lst.read_text(encoding="utf-8").splitlines()
-            if line
-        ]
 
-        self.segments = segments
+        speech_codes: Dict[str, int] = {}
+        speech, start, end = [], [], []
+
+        with open(segments_lst, encoding="utf-8") as fd:
+            for number, line in enumerate(fd, 1):
+                if not line.strip():
+                    continue
+
+                segment = parse_segments_listing(line)
+                if segment is None:
+                    raise ValueError(f"{segments_lst}:{number}: Malformed segment {line!r}.")
+
+                audio_file, time_start, time_end = segment
+                code = speech_codes.get(audio_file)
+                if code is None:
+                    code = speech_codes[audio_file] = len(speech_codes)
+
+                speech.append(code)
+                start.append(time_start)
+                end.append(time_end)
+
+        self.speech_ids: List[str] = [sys.intern(audio_file) for audio_file in speech_codes]
+        self._speech_codes = {audio_file: code for code, audio_file in enumerate(self.speech_ids)}
+        self.speech = np.array(speech, dtype=np.int32)
+        self.start = np.array(start, dtype=np.float64)
+        self.end = np.array(end, dtype=np.float64)
+
+        # Rows grouped by speech and ordered by start time; the rows of speech
+        # i are _order[_bounds[i]:_bounds[i + 1]].
+        self._order = np.lexsort((self.start, self.speech))
+        self._bounds = np.concatenate((
+            [0], np.cumsum(np.bincount(self.speech, minlength=len(self.speech_ids)))
+        ))
+
+    @property
+    def segments(self) -> List[Tuple[str, float, float]]:
+        """
+        Returns all segments as (audio_file, start, end) tuples.
+
+        Note:
+            Builds a list of the whole partition. Prefer the columns (e.g.,
+            `start`) or get_segments when working with the full corpus.
+
+        """
+        return [self.segment(row) for row in range(self.number_of_segments)]
+
+    def segment(self, row: int) -> Tuple[str, float, float]:
+        """
+        Returns the segment in `row` as an (audio_file, start, end) tuple.
+        """
+        return (self.speech_ids[self.speech[row]], float(self.start[row]), float(self.end[row]))
 
     @property
     def number_of_segments(self):
         """
         Returns the total number of segments in this partition.
         """
-        return len(self.segments)
+        return len(self.speech)
 
     @property
     def number_of_speeches(self):
         """
         Returns the total number of speeches in this partition.
         """
-        return len(self.speeches)
+        return len(self.speech_ids)
 
     def resolve(self, segments=None, sample=None) -> Path:
         """
@@ -150,15 +219,34 @@ class EuroparlST:
             "Either segments or sample must be set!"
         )
 
+    def transcripts(self, language: str) -> LineIndex:
+        """
+        Returns the transcripts of the segments in a language (line i belongs
+        to segment i). The index is built on first use.
+        """
+        if language not in self._transcripts:
+            self._transcripts[language] = LineIndex(
+                self.resolve(segments=f"segments.{language}")
+            )
+
+        return self._transcripts[language]
+
+    def speech_rows(self, sample: str) -> np.ndarray:
+        """
+        Returns the rows of a speech's segments, ordered by start time.
+        """
+        code = self._speech_codes.get(sample)
+
+        if code is None:
+            return self._order[:0]
+
+        return self._order[self._bounds[code]:self._bounds[code + 1]]
+
     def get_segments_of_sample(self, sample):
         """
         Return all segments by a specific audio sample.
         """
-        return sorted([
-            segment
-            for segment in self.segments
-            if segment[0] == sample
-        ], key=lambda x: x[1])
+        return [self.segment(row) for row in self.speech_rows(sample)]
 
     def get_segments(self, n: int = 0):
         """
@@ -166,33 +254,56 @@ class EuroparlST:
         audio clip. During iteration, we want to process this number of samples
         for later training.
         """
-        transcripts = lines(self.resolve(segments=f"segments.{self.src}"))
+        transcripts = self.transcripts(self.src)
 
         if n == 0 or n > self.number_of_segments:
             n = self.number_of_segments
 
-        for index, segment in enumerate(self.segments[:n]):
-            audio_filename, time_start, time_end = segment
+        for row in range(n):
+            audio_filename, time_start, time_end = self.segment(row)
             filename = self.resolve(sample=audio_filename)
-            yield (filename, time_start, time_end, transcripts[index])
+            yield (filename, time_start, time_end, transcripts[row])
+
+    def get_speeches(self) -> Iterator[Tuple[Path, List[Tuple[int, float, float, str]]]]:
+        """
+        Returns the segments grouped by speech (i.e., audio file).
+
+        Unlike get_segments, each speech is visited once, so its audio has to
+        be decoded only once to cut out all of its segments.
+
+        Returns:
+            An iterator over (audio file, segments) tuples, where segments is
+            a list of (index, start, end, transcript) tuples ordered by start.
+            The index is the segment's position in the partition (as in
+            get_segments). Speeches are in the order of their first segment.
+
+        """
+        transcripts = self.transcripts(self.src)
+
+        for audio_filename in self.speech_ids:
+            rows = self.speech_rows(audio_filename)
+            segments = [
+                (int(row), float(self.start[row]), float(self.end[row]), transcripts[row])
+                for row in rows
+            ]
+            yield self.resolve(sample=audio_filename), segments
 
-    def pairs(self, *, n: int = 0) -> Iterator[Tuple[str, str]]:
+    def pairs(self, *, n: Optional[int] = None) -> Iterator[Tuple[str, str]]:
         """
         Returns an iterator over the first n language pairs (text, text) tuples.
 
         Args:
             n: A positive integer counting the number of pairs.
-               0 by default, returns an iterator over all text pairs.
+               None by default, returns an iterator over all text pairs.
 
         Returns:
             An iterator over (sentence in source language, translated sentence)
             tuples.
 
         """
-        if n < 0:
+        if n is not None and n < 0:
             raise ValueError("n must be a positive integer (>= 0).")
 
-        src = lines(self.resolve(segments="segments." + self.src))
-        dst = lines(self.resolve(segments="segments." + self.tgt))
+        pairs = zip(self.transcripts(self.src), self.transcripts(self.tgt))
 
-        return islice(zip(src, dst), n)
+        return islice(pairs, n)
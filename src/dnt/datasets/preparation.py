@@ -0,0 +1,229 @@
+"""
+Prepare the Europarl-ST dataset for training DeepSpeech.
+
+The speeches of a partition are cut into their (sentence) segments, which are
+written as 16 kHz mono WAV files, plus an index in DeepSpeech's CSV format:
+
+```
+wav_filename,wav_filesize,transcript
+en.20080924.31.3-243.m4a-segment0.wav,344684,madam president the president [...]
+```
+
+Preparing the train partition takes a while, so the work is sharded by speech
+(each speech is decoded once, see dnt.preprocessing.load_audio) and spread
+over a pool of processes. Every finished speech is recorded in a manifest
+next to the index. If the preparation is interrupted, running it again skips
+all segments that are recorded in the manifest and whose WAV file still has
+the recorded size.
+"""
+import csv
+import json
+import multiprocessing
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dnt.audio import write_wav
+from dnt.datasets.europarl import EuroparlST
+from dnt.preprocessing import Normalizer, load_audio, slice_audio
+
+# The columns of the index (DeepSpeech's CSV format).
+LABELS = ['wav_filename', 'wav_filesize', 'transcript']
+
+# An indexed segment: (index, wav_filename, wav_filesize, transcript). The
+# index is the segment's position in the partition (see EuroparlST.segments).
+Row = Tuple[int, str, int, str]
+
+# A segment to cut: (index, start, end, transcript), see EuroparlST.get_speeches.
+Task = Tuple[int, float, float, str]
+
+# Normalizes the transcripts acc. to DeepSpeech alphabet.
+normalizer = Normalizer()
+
+
+class Manifest:
+    """
+    Record the segments that have been written, one JSON object per line.
+
+    Lines are appended and flushed after every speech, so the manifest
+    survives crashes. A partially written last line is ignored on load.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.rows: Dict[int, Row] = {}
+
+        if path.is_file():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                row = tuple(entry[key] for key in ['index', *LABELS])
+                self.rows[entry['index']] = row  # type: ignore
+
+        self._fd = open(path, "a", encoding="utf-8")
+
+    def finished(self, destination: Path) -> Dict[int, Row]:
+        """
+        Returns the recorded segments whose WAV file is still complete.
+        """
+        finished = {}
+
+        for index, row in self.rows.items():
+            outfile = destination / row[1]
+            if outfile.is_file() and outfile.stat().st_size == row[2]:
+                finished[index] = row
+
+        return finished
+
+    def add(self, rows: List[Row]):
+        """
+        Record written segments.
+        """
+        for row in rows:
+            self.rows[row[0]] = row
+            self._fd.write(json.dumps(dict(zip(['index', *LABELS], row))) + "\n")
+
+        self._fd.flush()
+
+    def close(self):
+        self._fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def prepare_speech(sample: Path, segments: List[Task], destination: Path, finished: Dict[int, Row]) -> List[Row]:
+    """
+    Cut the segments of a speech into WAV files.
+
+    Args:
+        sample: The speech's audio file.
+        segments: The segments to cut from the speech.
+        destination: Directory to write the WAV files to.
+        finished: Segments written before (by index), which are skipped.
+
+    Returns:
+        The rows of the written segments.
+
+    """
+    missing = [segment for segment in segments if segment[0] not in finished]
+
+    if not missing:
+        # Do not even decode the speech.
+        return []
+
+    # Decode the whole speech once (16 kHz mono PCM).
+    samples = load_audio(sample)
+    transcripts = normalizer.normalize_many(segment[3] for segment in missing)
+    rows = []
+
+    for (index, time_start, time_end, _), transcript in zip(missing, transcripts):
+        outfile = destination / f"{sample.name}-segment{index}.wav"
+        write_wav(outfile, slice_audio(samples, time_start, time_end))
+
+        rows.append((index, outfile.name, outfile.stat().st_size, transcript))
+
+    return rows
+
+
+def _prepare_speech_in_worker(task) -> List[Row]:
+    return prepare_speech(*task)
+
+
+def prepare_partition(
+    europarl: EuroparlST,
+    destination: Path,
+    workers: int = 1,
+    min_duration: float = 10.0,
+    max_duration: float = 20.0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, int]:
+    """
+    Cut a partition into segments and write its index.
+
+    The index is named after the partition, e.g. `destination/dev.csv`, and
+    ordered by the segments' position in the partition, no matter in which
+    order the workers finish. The manifest is kept next to it (e.g.,
+    `destination/dev.manifest.jsonl`).
+
+    Args:
+        europarl: The partition to prepare.
+        destination: Directory to write the segments and the index to.
+        workers: Number of processes decoding speeches in parallel.
+        min_duration: Discard segments shorter than this (in seconds).
+        max_duration: Discard segments longer than this (in seconds).
+        progress: Called with the number of processed and total segments.
+
+    Returns:
+        Some stats, e.g. the number of discarded and skipped segments.
+
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+
+    indexfile = destination / f"{europarl.partition}.csv"
+    stats = {'discarded': 0, 'skipped': 0, 'written': 0}
+    total = europarl.number_of_segments
+
+    with Manifest(destination / f"{europarl.partition}.manifest.jsonl") as manifest:
+        finished = manifest.finished(destination)
+        rows = []
+        tasks = []
+
+        for sample, segments in europarl.get_speeches():
+            # We only want samples between 10s and 20s, according to the
+            # deepspeech docs.
+            selected = [
+                segment for segment in segments
+                if min_duration <= segment[2] - segment[1] <= max_duration
+            ]
+            skipped = [finished[segment[0]] for segment in selected if segment[0] in finished]
+
+            stats['discarded'] += len(segments) - len(selected)
+            stats['skipped'] += len(skipped)
+            rows.extend(skipped)
+
+            if len(skipped) < len(selected):
+                # Only pass the speech's own finished segments to the worker.
+                tasks.append((sample, selected, destination,
+                              {row[0]: row for row in skipped}))
+
+        done = stats['discarded'] + stats['skipped']
+
+        with (multiprocessing.Pool(workers) if workers > 1 else nullcontext()) as pool:
+            # Speeches are recorded as soon as they are done, in any order;
+            # the index is sorted below.
+            results = (
+                pool.imap_unordered(_prepare_speech_in_worker, tasks) if pool
+                else map(_prepare_speech_in_worker, tasks)
+            )
+
+            for written in results:
+                manifest.add(written)
+                rows.extend(written)
+
+                stats['written'] += len(written)
+                done += len(written)
+                if progress is not None:
+                    progress(done, total)
+
+    # Write the index atomically, so there's either a complete index or none.
+    partial = indexfile.with_name(f".{indexfile.name}.part")
+
+    with open(partial, "w", encoding="utf-8", newline="") as fd:
+        # Normalized transcripts contain neither separators nor quotes, so
+        # nothing needs to be escaped.
+        writer = csv.writer(fd, quoting=csv.QUOTE_NONE)
+        writer.writerow(LABELS)
+
+        for _, *row in sorted(rows):
+            writer.writerow(row)
+
+    partial.replace(indexfile)
+
+    return stats
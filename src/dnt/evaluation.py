@@ -0,0 +1,340 @@
+"""
+Evaluate acoustic models on a Europarl-ST partition.
+
+Computes the word error rate (WER) and character error rate (CER) of a model,
+like DeepSpeech's own evaluation, but natively and on all cores: The speeches
+are transcribed by a pool of processes, each holding its own copy of the
+model. The references are normalized like the training data (see
+dnt.preprocessing.Normalizer), so the scores of a fine-tuned model are
+comparable to the validation loss during training.
+
+Example:
+    >>> europarl = EuroparlST(Path("data/europarlST-v1.1/"), "en", "de", "test")
+    >>> factory = functools.partial(DeepSpeechTranscriber, model, scorer)
+    >>> evaluation = evaluate(europarl, factory, workers=4)
+    >>> evaluation.corpus.wer
+    0.241
+
+"""
+import multiprocessing
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dnt.datasets.europarl import EuroparlST
+from dnt.preprocessing import Normalizer, load_audio, slice_audio
+
+# Normalizes references and transcripts acc. to DeepSpeech alphabet.
+normalizer = Normalizer()
+
+
+def edit_distance(reference: np.ndarray, hypothesis: np.ndarray) -> int:
+    """
+    Levenshtein distance between two sequences of integers.
+
+    The dynamic program is computed row by row, each row in a few vectorized
+    operations: Substitutions and deletions only depend on the previous row.
+    Insertions depend on the row itself, but are a running minimum:
+    row[j] = min(row[j - 1] + 1, candidate[j]) for all j is
+    min(candidate[k] + (j - k)) over k <= j, i.e. j + the running minimum
+    of (candidate[k] - k).
+
+    Args:
+        reference: The expected sequence (1-D).
+        hypothesis: The actual sequence (1-D).
+
+    Returns:
+        The minimum number of substitutions, deletions and insertions that
+        turn the hypothesis into the reference.
+
+    """
+    # The distance is symmetric; loop over the shorter sequence.
+    if len(reference) < len(hypothesis):
+        reference, hypothesis = hypothesis, reference
+
+    if len(hypothesis) == 0:
+        return len(reference)
+
+    offsets = np.arange(len(reference) + 1)
+    row = offsets.copy()
+
+    for i, token in enumerate(hypothesis, start=1):
+        candidate = np.empty_like(row)
+        candidate[0] = i
+        # Substitution (or match) and deletion.
+        np.minimum(row[:-1] + (reference != token), row[1:] + 1, out=candidate[1:])
+        # Insertion.
+        row = np.minimum.accumulate(candidate - offsets) + offsets
+
+    return int(row[-1])
+
+
+def words(text: str, vocabulary: Dict[Hashable, int]) -> np.ndarray:
+    """
+    Returns the words of a text as integers (shared via `vocabulary`).
+    """
+    return np.array(
+        [vocabulary.setdefault(word, len(vocabulary)) for word in text.split()],
+        dtype=np.int64
+    )
+
+
+def characters(text: str) -> np.ndarray:
+    """
+    Returns the characters of a text as integers (Unicode code points).
+    """
+    return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+
+@dataclass
+class Score:
+    """
+    Errors of a model on some segments.
+
+    Attributes:
+        segments: Number of segments.
+        words: Number of words of the references.
+        word_errors: Word-level edit distance of the transcripts.
+        characters: Number of characters of the references.
+        character_errors: Character-level edit distance of the transcripts.
+        audio_seconds: Length of the segments' audio.
+
+    """
+    segments: int = 0
+    words: int = 0
+    word_errors: int = 0
+    characters: int = 0
+    character_errors: int = 0
+    audio_seconds: float = 0.0
+
+    @property
+    def wer(self) -> Optional[float]:
+        return self.word_errors / self.words if self.words else None
+
+    @property
+    def cer(self) -> Optional[float]:
+        return self.character_errors / self.characters if self.characters else None
+
+    def add(self, other: 'Score'):
+        self.segments += other.segments
+        self.words += other.words
+        self.word_errors += other.word_errors
+        self.characters += other.characters
+        self.character_errors += other.character_errors
+        self.audio_seconds += other.audio_seconds
+
+    def as_dict(self) -> Dict:
+        return {'wer': self.wer, 'cer': self.cer, **self.__dict__}
+
+
+def score(reference: str, hypothesis: str, audio_seconds: float = 0.0) -> Score:
+    """
+    Score the transcript of a single segment.
+
+    Both texts are compared as is, i.e. they should be normalized.
+
+    Example:
+        >>> score("the cat sat", "the cat sat down").wer
+        0.3333333333333333
+
+    """
+    vocabulary: Dict[Hashable, int] = {}
+    reference_words = words(reference, vocabulary)
+    hypothesis_words = words(hypothesis, vocabulary)
+
+    # Spaces count as characters, but not leading or trailing ones.
+    reference_text, hypothesis_text = " ".join(reference.split()), " ".join(hypothesis.split())
+
+    return Score(
+        segments=1,
+        words=len(reference_words),
+        word_errors=edit_distance(reference_words, hypothesis_words),
+        characters=len(reference_text),
+        character_errors=edit_distance(characters(reference_text), characters(hypothesis_text)),
+        audio_seconds=audio_seconds,
+    )
+
+
+# A transcribed segment: (index, reference, hypothesis, score). The index is
+# the segment's position in the partition (see EuroparlST.segments).
+Result = Tuple[int, str, str, Score]
+
+# A segment to transcribe: (index, start, end, transcript), see
+# EuroparlST.get_speeches.
+Task = Tuple[int, float, float, str]
+
+
+@dataclass
+class Evaluation:
+    """
+    The results of evaluating a model.
+
+    Attributes:
+        corpus: The errors over all segments. Note that the corpus' WER is
+            not the mean of the segments' WERs, as longer segments weigh more.
+        speeches: The errors by speech (audio file name).
+        segments: The transcript and errors of each segment, ordered by their
+            position in the partition.
+        seconds: Wall-clock time of the evaluation.
+        decode_seconds: Time spent decoding audio (summed over all workers).
+        transcription_seconds: Time spent transcribing (summed over all
+            workers).
+
+    """
+    corpus: Score = field(default_factory=Score)
+    speeches: Dict[str, Score] = field(default_factory=dict)
+    segments: List[Result] = field(default_factory=list)
+    seconds: float = 0.0
+    decode_seconds: float = 0.0
+    transcription_seconds: float = 0.0
+
+    @property
+    def throughput(self) -> Dict[str, Optional[float]]:
+        """
+        How fast the model transcribed, e.g. to size the number of workers.
+        """
+        audio_seconds = self.corpus.audio_seconds
+
+        return {
+            'seconds': self.seconds,
+            'audio_seconds': audio_seconds,
+            'decode_seconds': self.decode_seconds,
+            'transcription_seconds': self.transcription_seconds,
+            # Audio transcribed per second, over all workers.
+            'speed': audio_seconds / self.seconds if self.seconds else None,
+            'segments_per_second': self.corpus.segments / self.seconds if self.seconds else None,
+            # Transcription time per second of audio, within a worker.
+            'real_time_factor': self.transcription_seconds / audio_seconds if audio_seconds else None,
+        }
+
+    def as_dict(self) -> Dict:
+        return {
+            'corpus': self.corpus.as_dict(),
+            'throughput': self.throughput,
+            'speeches': {speech: s.as_dict() for speech, s in self.speeches.items()},
+            'segments': [
+                {'index': index, 'reference': reference, 'hypothesis': hypothesis, **s.as_dict()}
+                for index, reference, hypothesis, s in self.segments
+            ],
+        }
+
+
+def evaluate_speech(transcriber, sample: Path, segments: Sequence[Task]) -> Tuple[List[Result], float, float]:
+    """
+    Transcribe and score the segments of a speech.
+
+    Returns:
+        The results of the segments, and the time spent decoding the speech
+        and transcribing its segments (in seconds).
+
+    """
+    start = time.perf_counter()
+    # Decode the whole speech once (16 kHz mono PCM).
+    samples = load_audio(sample)
+    decoded = time.perf_counter()
+
+    references = normalizer.normalize_many(segment[3] for segment in segments)
+    hypotheses = [
+        transcriber.transcribe(slice_audio(samples, time_start, time_end))
+        for _, time_start, time_end, _ in segments
+    ]
+    transcribed = time.perf_counter()
+
+    results = [
+        (index, reference, hypothesis, score(reference, hypothesis, time_end - time_start))
+        for (index, time_start, time_end, _), reference, hypothesis
+        in zip(segments, references, normalizer.normalize_many(hypotheses))
+    ]
+
+    return results, decoded - start, transcribed - decoded
+
+
+# Each worker process holds its own transcriber, created once when the worker
+# starts (c.f. dnt.core.ParallelPipeline).
+_worker_transcriber = None
+
+
+def _init_worker(transcriber_factory: Callable):
+    global _worker_transcriber
+    _worker_transcriber = transcriber_factory()
+
+
+def _evaluate_speech_in_worker(task) -> Tuple[str, List[Result], float, float]:
+    sample, segments = task
+    return (sample.name, *evaluate_speech(_worker_transcriber, sample, segments))
+
+
+def evaluate(
+    europarl: EuroparlST,
+    transcriber_factory: Callable,
+    workers: int = 1,
+    n: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Evaluation:
+    """
+    Evaluate a model on a partition.
+
+    The work is split by speech, so each speech is decoded once (c.f.
+    dnt.datasets.preparation) and its segments are transcribed by the same
+    worker.
+
+    Args:
+        europarl: The partition to evaluate on.
+        transcriber_factory: Picklable callable without arguments that
+            creates a transcriber, e.g. a functools.partial of
+            DeepSpeechTranscriber. Called once in every worker process.
+        workers: Number of processes transcribing in parallel.
+        n: Only evaluate on the first n segments of the partition (like
+            EuroparlST.get_segments). 0 evaluates on all segments.
+        progress: Called with the number of evaluated and total segments.
+
+    Returns:
+        The scores of the corpus, of each speech and each segment.
+
+    """
+    if n < 0:
+        raise ValueError("n must be a positive integer (>= 0).")
+
+    total = min(n, europarl.number_of_segments) if n else europarl.number_of_segments
+
+    tasks = []
+    for sample, segments in europarl.get_speeches():
+        selected = [segment for segment in segments if segment[0] < total]
+        if selected:
+            tasks.append((sample, selected))
+
+    evaluation = Evaluation()
+    start = time.perf_counter()
+
+    with (multiprocessing.Pool(workers, initializer=_init_worker, initargs=(transcriber_factory,))
+          if workers > 1 else nullcontext()) as pool:
+        if pool is None:
+            _init_worker(transcriber_factory)
+
+        results = (
+            pool.imap_unordered(_evaluate_speech_in_worker, tasks) if pool
+            else map(_evaluate_speech_in_worker, tasks)
+        )
+
+        for speech, speech_results, decode_seconds, transcription_seconds in results:
+            speech_score = evaluation.speeches.setdefault(speech, Score())
+
+            for result in speech_results:
+                speech_score.add(result[3])
+                evaluation.corpus.add(result[3])
+
+            evaluation.segments.extend(speech_results)
+            evaluation.decode_seconds += decode_seconds
+            evaluation.transcription_seconds += transcription_seconds
+
+            if progress is not None:
+                progress(evaluation.corpus.segments, total)
+
+    evaluation.seconds = time.perf_counter() - start
+    evaluation.segments.sort(key=lambda result: result[0])
+
+    return evaluation
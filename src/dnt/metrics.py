@@ -0,0 +1,430 @@
+"""
+Measure what the pipeline spends its time on.
+
+The pipelines report what they do to hooks (see PipelineHooks): every
+segment cut from the audio, every transcribed segment, every translation
+request and every compiled subtitle file, along with the time it took. Two
+kinds of hooks are included:
+
+* Profiler, which collects a report of a single run (e.g., for the CLI's
+  --profile option).
+* PrometheusMetrics, which aggregates all runs into counters and histograms
+  in Prometheus' text format (e.g., for the Web UI's /metrics endpoint).
+
+Example:
+    >>> profiler = Profiler()
+    >>> with Pipeline(segmenter, transcriber, translator, [VTT()], hooks=profiler) as pipeline:
+    ...     pipeline.process(Path("lecture.wav"))
+    >>> profiler.report()['transcription']['real_time_factor']
+    0.31
+
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from dnt.subtitles import Cue, Subtitles
+from dnt.translation import Translator
+
+
+class PipelineHooks:
+    """
+    Receives the events of a pipeline. All hooks do nothing by default.
+
+    Hooks may be called from several threads at the same time (e.g.,
+    translations run in background threads), so implementations must be
+    thread-safe. Times are in seconds.
+    """
+
+    def segmented(self, segment, seconds: float):
+        """
+        Called for every segment cut from the audio.
+        """
+
+    def transcribed(self, cue: Cue, seconds: float):
+        """
+        Called for every transcribed segment, with the segment's transcript.
+        """
+
+    def translated(self, texts: List[str], seconds: float):
+        """
+        Called for every translation request, with the texts to translate.
+        """
+
+    def compiled(self, subtitles: Subtitles, seconds: float):
+        """
+        Called for every compiled subtitle file.
+        """
+
+    def processed(self, seconds: float):
+        """
+        Called when the pipeline has processed the audio.
+        """
+
+
+class HookChain(PipelineHooks):
+    """
+    Pass the events on to several hooks.
+    """
+
+    def __init__(self, hooks: Iterable[PipelineHooks]):
+        self.hooks = list(hooks)
+
+    def segmented(self, segment, seconds: float):
+        for hooks in self.hooks:
+            hooks.segmented(segment, seconds)
+
+    def transcribed(self, cue: Cue, seconds: float):
+        for hooks in self.hooks:
+            hooks.transcribed(cue, seconds)
+
+    def translated(self, texts: List[str], seconds: float):
+        for hooks in self.hooks:
+            hooks.translated(texts, seconds)
+
+    def compiled(self, subtitles: Subtitles, seconds: float):
+        for hooks in self.hooks:
+            hooks.compiled(subtitles, seconds)
+
+    def processed(self, seconds: float):
+        for hooks in self.hooks:
+            hooks.processed(seconds)
+
+
+def chain(*hooks: Optional[PipelineHooks]) -> Optional[PipelineHooks]:
+    """
+    Combine hooks, skipping None. Returns None if there are no hooks.
+    """
+    given: List[PipelineHooks] = [h for h in hooks if h is not None]
+
+    if len(given) <= 1:
+        return given[0] if given else None
+
+    return HookChain(given)
+
+
+def timed_segments(segments: Iterable, hooks: PipelineHooks) -> Iterator:
+    """
+    Report how long it takes to cut each segment from the audio.
+    """
+    iterator = iter(segments)
+
+    while True:
+        start = time.perf_counter()
+        try:
+            segment = next(iterator)
+        except StopIteration:
+            return
+        hooks.segmented(segment, time.perf_counter() - start)
+        yield segment
+
+
+class TimedTranslator(Translator):
+    """
+    Report the latency of every translation request of a translator.
+    """
+
+    def __init__(self, translator: Translator, hooks: PipelineHooks):
+        self.translator = translator
+        self.hooks = hooks
+
+    def translate(self, text: str, target_lang: str = 'DE') -> str:
+        return self.translate_many([text], target_lang)[0]
+
+    def translate_many(self, texts: List[str], target_lang: str = 'DE') -> List[str]:
+        start = time.perf_counter()
+        translations = self.translator.translate_many(texts, target_lang)
+        self.hooks.translated(list(texts), time.perf_counter() - start)
+        return translations
+
+
+def duration(cue: Cue) -> float:
+    """
+    Returns the length of the audio of a cue (in seconds).
+    """
+    return (cue.end - cue.start) / 1000
+
+
+def summary(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """
+    Summarize a distribution by its mean, median, 95th percentile and maximum.
+    """
+    if not values:
+        return {'mean': None, 'p50': None, 'p95': None, 'max': None}
+
+    ordered = sorted(values)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1)]
+
+    return {
+        'mean': sum(ordered) / len(ordered),
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'max': ordered[-1],
+    }
+
+
+class Profiler(PipelineHooks):
+    """
+    Collect the timings of pipeline runs into a report.
+
+    The stages overlap (e.g., translations run while the next segments are
+    transcribed), so the time of each stage is the time spent in it, not the
+    wall-clock time of the run.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.segmentation: List[float] = []
+        self.audio: List[float] = []
+        self.transcription: List[float] = []
+        self.translation: List[Tuple[int, int, float]] = []
+        self.subtitles: List[Tuple[str, str, int, float]] = []
+        self.runs: List[float] = []
+
+    def segmented(self, segment, seconds: float):
+        with self.lock:
+            self.segmentation.append(seconds)
+
+    def transcribed(self, cue: Cue, seconds: float):
+        with self.lock:
+            self.audio.append(duration(cue))
+            self.transcription.append(seconds)
+
+    def translated(self, texts: List[str], seconds: float):
+        with self.lock:
+            self.translation.append((len(texts), sum(len(text) for text in texts), seconds))
+
+    def compiled(self, subtitles: Subtitles, seconds: float):
+        with self.lock:
+            self.subtitles.append((subtitles.format, subtitles.language_code,
+                                   len(subtitles.content.encode("utf-8")), seconds))
+
+    def processed(self, seconds: float):
+        with self.lock:
+            self.runs.append(seconds)
+
+    def report(self) -> Dict:
+        """
+        Returns the report, e.g. to dump as JSON.
+        """
+        with self.lock:
+            audio_seconds = sum(self.audio)
+            transcription_seconds = sum(self.transcription)
+            rtfs = [t / a for t, a in zip(self.transcription, self.audio) if a > 0]
+
+            return {
+                'seconds': sum(self.runs),
+                'segments': len(self.transcription),
+                'audio_seconds': audio_seconds,
+                'stages': {
+                    'segmentation': sum(self.segmentation),
+                    'transcription': transcription_seconds,
+                    'translation': sum(seconds for _, _, seconds in self.translation),
+                    'compile': sum(seconds for *_, seconds in self.subtitles),
+                },
+                'transcription': {
+                    'real_time_factor': transcription_seconds / audio_seconds if audio_seconds else None,
+                    'segment_seconds': summary(self.transcription),
+                    'segment_real_time_factor': summary(rtfs),
+                },
+                'translation': {
+                    'requests': len(self.translation),
+                    'texts': sum(texts for texts, _, _ in self.translation),
+                    'characters': sum(characters for _, characters, _ in self.translation),
+                    'latency': summary([seconds for _, _, seconds in self.translation]),
+                },
+                'subtitles': [
+                    {'format': fmt, 'language': language, 'bytes': size, 'seconds': seconds}
+                    for fmt, language, size, seconds in self.subtitles
+                ],
+            }
+
+
+class Counter:
+    """
+    A Prometheus counter, optionally with labels.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(labels[label] for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self.lock:
+            values = dict(self.values)
+
+        if not values and not self.labels:
+            values[()] = 0
+
+        for key, value in sorted(values.items()):
+            yield self.name + '_total', dict(zip(self.labels, key)), value
+
+
+class Histogram:
+    """
+    A Prometheus histogram with fixed buckets (upper bounds).
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(buckets)
+        # Observations per bucket; the last one is +Inf.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+
+        cumulative = 0
+        for bound, count in zip([*self.buckets, math.inf], counts):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else f"{bound:g}"
+            yield self.name + '_bucket', {'le': le}, cumulative
+
+        yield self.name + '_sum', {}, total
+        yield self.name + '_count', {}, cumulative
+
+
+class PrometheusMetrics(PipelineHooks):
+    """
+    Aggregate the events of all pipeline runs into Prometheus metrics.
+
+    Example:
+        >>> metrics = PrometheusMetrics()
+        >>> pipeline = Pipeline(..., hooks=metrics)
+        >>> print(metrics.render())
+        # HELP dnt_segments_total Segments transcribed.
+        # TYPE dnt_segments_total counter
+        dnt_segments_total 90
+        ...
+
+    """
+
+    def __init__(self, namespace: str = 'dnt'):
+        def name(metric: str) -> str:
+            return f"{namespace}_{metric}"
+
+        self.runs = Counter(name('pipeline_runs'), "Pipeline runs (i.e., transcribed videos).")
+        self.run_seconds = Histogram(
+            name('pipeline_seconds'), "Duration of pipeline runs.",
+            [10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200]
+        )
+        self.segments = Counter(name('segments'), "Segments transcribed.")
+        self.audio_seconds = Counter(name('audio_seconds'), "Seconds of audio transcribed.")
+        self.stage_seconds = Counter(
+            name('stage_seconds'), "Time spent in each stage of the pipeline.", ['stage']
+        )
+        self.segment_seconds = Histogram(
+            name('segment_transcription_seconds'), "Time to transcribe a segment.",
+            [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+        )
+        self.real_time_factor = Histogram(
+            name('transcription_real_time_factor'),
+            "Transcription time per second of audio, by segment.",
+            [0.05, 0.1, 0.25, 0.5, 1, 2, 5]
+        )
+        self.translation_seconds = Histogram(
+            name('translation_request_seconds'), "Latency of translation requests.",
+            [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+        )
+        self.translation_texts = Counter(name('translation_texts'), "Texts translated.")
+        self.translation_characters = Counter(
+            name('translation_characters'), "Characters sent for translation."
+        )
+        self.subtitle_bytes = Counter(
+            name('subtitle_bytes'), "Size of the generated subtitles.", ['format', 'language']
+        )
+
+        self.metrics: List[Union[Counter, Histogram]] = [
+            self.runs, self.run_seconds, self.segments, self.audio_seconds,
+            self.stage_seconds, self.segment_seconds, self.real_time_factor,
+            self.translation_seconds, self.translation_texts,
+            self.translation_characters, self.subtitle_bytes,
+        ]
+
+    def segmented(self, segment, seconds: float):
+        self.stage_seconds.inc(seconds, stage='segmentation')
+
+    def transcribed(self, cue: Cue, seconds: float):
+        audio = duration(cue)
+
+        self.segments.inc()
+        self.audio_seconds.inc(audio)
+        self.stage_seconds.inc(seconds, stage='transcription')
+        self.segment_seconds.observe(seconds)
+        if audio > 0:
+            self.real_time_factor.observe(seconds / audio)
+
+    def translated(self, texts: List[str], seconds: float):
+        self.stage_seconds.inc(seconds, stage='translation')
+        self.translation_seconds.observe(seconds)
+        self.translation_texts.inc(len(texts))
+        self.translation_characters.inc(sum(len(text) for text in texts))
+
+    def compiled(self, subtitles: Subtitles, seconds: float):
+        self.stage_seconds.inc(seconds, stage='compile')
+        self.subtitle_bytes.inc(len(subtitles.content.encode("utf-8")),
+                                format=subtitles.format, language=subtitles.language_code)
+
+    def processed(self, seconds: float):
+        self.runs.inc()
+        self.run_seconds.observe(seconds)
+
+    def render(self) -> str:
+        """
+        Returns the metrics in Prometheus' text exposition format.
+        """
+        lines = []
+
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name}{'_total' if metric.kind == 'counter' else ''} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name}{'_total' if metric.kind == 'counter' else ''} {metric.kind}")
+
+            for name, labels, value in metric.samples():
+                rendered = ",".join(f'{label}="{escape(v)}"' for label, v in labels.items())
+                lines.append(f"{name}{{{rendered}}} {number(value)}" if rendered else f"{name} {number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def number(value: float) -> str:
+    """
+    Format a sample's value for Prometheus' text format without losing
+    precision (unlike e.g. "%g", which keeps 6 significant digits).
+    """
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if isinstance(value, int) or (value.is_integer() and abs(value) < 2 ** 53):
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape(value: str) -> str:
+    """
+    Escape a label value for Prometheus' text format.
+    """
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
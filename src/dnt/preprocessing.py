@@ -1,14 +1,22 @@
 """
 Module pre-processes video input into audio segments.
 """
+import multiprocessing
 import re
 import subprocess
-from math import ceil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union, cast
 
-import pydub
+import numpy as np
 from num2words import num2words
 
+from dnt.audio import (SAMPLE_DTYPE, SAMPLE_RATE, Segment, map_wav,
+                       read_samples)
+
 
 # All lowercase, English letters and apostrophe:
 # See https://github.com/mozilla/DeepSpeech/blob/master/data/alphabet.txt
@@ -80,6 +88,129 @@ def normalize(transcript: str, alphabet: str = DEEPSPEECH_ALPHABET) -> str:
     return ''.join(ch for ch in transcript if ch in include)
 
 
+# Number of distinct numbers (per kind: years and cardinals) whose spoken form
+# is kept in memory; transcripts repeat the same numbers over and over.
+NUMBER_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=NUMBER_CACHE_SIZE)
+def _year(digits: str) -> str:
+    return num2words(digits, to='year')
+
+
+@lru_cache(maxsize=NUMBER_CACHE_SIZE)
+def _cardinal(digits: str) -> str:
+    return num2words(digits)
+
+
+class Normalizer:
+    """
+    Normalize many transcripts quickly, with the same output as normalize().
+
+    normalize() runs two regex passes calling num2words for every number and
+    filters the transcript character by character in Python. Instead, the
+    normalizer
+
+    * expands years (4 digits) and other numbers in a single pass, only if
+      there are any, caching their spoken forms (see NUMBER_CACHE_SIZE), and
+    * drops the characters outside of the alphabet with a byte translation
+      table (after dropping all non-ASCII characters, if the alphabet is ASCII).
+
+    The replacements remain str.replace calls, in the same order: They depend
+    on their order, and replacing is cheaper than str.translate, which is
+    slow on non-ASCII text (e.g., German).
+
+    Example:
+        >>> normalizer = Normalizer()
+        >>> normalizer("Paulson & Co has placed bets")
+        'paulson and co has placed bets'
+        >>> normalizer.normalize_many(transcripts, workers=4)
+
+    """
+
+    # Removes apostrophes used as quotes (see normalize).
+    QUOTES = re.compile(r"(‘.(?P<inner>\w+).’)")
+
+    NUMBERS = re.compile(r'\d+')
+    # Within a number, years are 4 ASCII digits and the other numbers end
+    # where a year starts, just like expanding all years before all other
+    # numbers (see normalize).
+    YEARS = re.compile(r'(?P<year>[0-9]{4})|(?:(?![0-9]{4})\d)+')
+
+    def __init__(self, alphabet: str = DEEPSPEECH_ALPHABET):
+        self.alphabet = alphabet
+
+        # Ensure whitespace is included, altough not in the alphabet usually.
+        include = set(alphabet) | {" "}
+
+        # The ASCII characters to delete (see bytes.translate).
+        self.deleted = bytes(c for c in range(128) if chr(c) not in include)
+        # Alphabets with other characters are filtered by a regex instead.
+        self.excluded = None if all(ch.isascii() for ch in include) \
+            else re.compile(f"[^{re.escape(''.join(sorted(include)))}]+")
+
+    def __call__(self, transcript: str) -> str:
+        transcript = transcript.lower()
+
+        if '‘' in transcript:
+            transcript = self.QUOTES.sub(lambda m: m.group('inner'), transcript)
+
+        transcript = transcript.replace(" ’ ", "'")
+        transcript = transcript.replace(" - ", " ")
+        transcript = transcript.replace(" – ", " ")
+        transcript = transcript.replace("&", "and")
+        transcript = transcript.replace("ä", "a")
+        transcript = transcript.replace("ö", "o")
+        transcript = transcript.replace("ü", "u")
+        transcript = transcript.replace("-", " ")
+        transcript = transcript.replace("  ", " ")
+
+        # Most transcripts contain no numbers at all; looking for ASCII digits
+        # in ASCII text is cheaper than a regex search.
+        if any(digit in transcript for digit in '0123456789') if transcript.isascii() \
+                else self.NUMBERS.search(transcript):
+            transcript = self.NUMBERS.sub(_spoken_number, transcript)
+
+        if self.excluded is not None:
+            return self.excluded.sub('', transcript)
+
+        return transcript.encode('ascii', 'ignore').translate(None, self.deleted).decode('ascii')
+
+    def normalize_many(self, transcripts: Iterable[str], workers: int = 1, chunksize: int = 1024) -> List[str]:
+        """
+        Normalize transcripts, optionally in a pool of `workers` processes.
+
+        A pool only pays off for large corpora on multiple CPUs, as the
+        transcripts have to be sent to the workers and back.
+
+        Returns:
+            The normalized transcripts in the order of `transcripts`.
+
+        """
+        if workers <= 1:
+            return [self(transcript) for transcript in transcripts]
+
+        with multiprocessing.Pool(workers) as pool:
+            return pool.map(self, transcripts, chunksize=chunksize)
+
+
+def _spoken_number(match: re.Match) -> str:
+    digits = match.group()
+
+    if digits.isascii():
+        # Years first, the (up to 3) remaining digits are a cardinal number.
+        end = len(digits) - len(digits) % 4
+        spoken = [_year(digits[i:i + 4]) for i in range(0, end, 4)]
+        if end < len(digits):
+            spoken.append(_cardinal(digits[end:]))
+        return ''.join(spoken)
+
+    return Normalizer.YEARS.sub(
+        lambda m: _year(m.group()) if m.group('year') else _cardinal(m.group()),
+        digits
+    )
+
+
 def extract_audio(video: Path, outfile: Path, channels: int = 1, sample_rate: int = 16_000) -> Path:
     """
     Extract audio track from an mp4 video as wav.
@@ -89,6 +220,10 @@ def extract_audio(video: Path, outfile: Path, channels: int = 1, sample_rate: in
         channels: Number of channels to extract (1 = mono)
         sample_rate: Sample rate of the resulting audio.
 
+    Raises:
+        CalledProcessError, if ffmpeg fails (e.g., the video is damaged).
+        A partially written audio file may be left behind.
+
     Returns:
        Path of the resulting audio file.
 
@@ -105,11 +240,70 @@ def extract_audio(video: Path, outfile: Path, channels: int = 1, sample_rate: in
         str(outfile.absolute())
     ]
 
-    subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     return outfile
 
 
+@contextmanager
+def decode_audio(
+        video: Optional[Path], channels: int = 1, sample_rate: int = SAMPLE_RATE
+) -> Iterator[BinaryIO]:
+    """
+    Decode the audio track of a video into a stream of raw PCM.
+
+    In contrast to extract_audio, no file is written: ffmpeg decodes the audio
+    to raw 16-bit little-endian samples (s16le) on its stdout, which can be
+    consumed while ffmpeg is still decoding.
+
+    Args:
+        video: Path to the source video file. If None, ffmpeg reads the video
+            from this process' stdin. Note that the input must be streamable
+            then, e.g. MP4 files need their index (moov atom) at the start.
+        channels: Number of channels to extract (1 = mono)
+        sample_rate: Sample rate of the resulting audio.
+
+    Raises:
+        CalledProcessError, if ffmpeg failed to decode the video.
+
+    Example:
+        >>> with decode_audio(Path("video.mp4")) as pcm:
+        ...     segments = IntervalSegmenter().segment(pcm)
+
+    Returns:
+        A context manager providing ffmpeg's output stream.
+
+    """
+    args = [
+        'ffmpeg',
+        '-i', '-' if video is None else str(video.absolute()),
+        '-vn',                              # skip the video stream
+        '-f', 's16le',                      # raw 16-bit samples, no header
+        '-acodec', 'pcm_s16le',
+        '-ac', str(channels),
+        '-ar', str(sample_rate),
+        '-'                                 # write to stdout
+    ]
+
+    # Without a video path, ffmpeg inherits our stdin.
+    stdin = None if video is None else subprocess.DEVNULL
+
+    process = subprocess.Popen(args, stdin=stdin, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+
+    try:
+        yield process.stdout  # type: ignore
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()  # type: ignore
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args)
+
+
 def segment_audio(
         audiofile: Path, outfile: Path, start: float, end: float, sample_rate=16000
 ):
@@ -142,8 +336,41 @@ def segment_audio(
         str(outfile.absolute())             # write to desired output path.
     ]
 
-    subprocess.run(ffmpeg_commands, shell=True, check=True,
-                   stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)  # type: ignore
+    subprocess.run(ffmpeg_commands, check=True,
+                   stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+
+
+def load_audio(audiofile: Path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode a whole audio (or video) file into memory.
+
+    In contrast to segment_audio, the file is decoded once; segments are
+    then sliced from the returned samples (see slice_audio). Hence, cutting
+    a recording into many segments costs a single ffmpeg run.
+
+    Args:
+        audiofile: Path to the audio file, e.g. a m4a speech of Europarl-ST.
+        sample_rate: Sample rate to resample the audio to.
+
+    Raises:
+        CalledProcessError, if ffmpeg failed to decode the file.
+
+    Returns:
+        The file's samples as 16-bit mono PCM.
+
+    """
+    with decode_audio(audiofile, sample_rate=sample_rate) as pcm:
+        return np.frombuffer(pcm.read(), dtype=SAMPLE_DTYPE)
+
+
+def slice_audio(samples: np.ndarray, start: float, end: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Returns the samples between `start` and `end` (in seconds) as a view.
+    """
+    first = max(0, round(start * sample_rate))
+    last = min(len(samples), round(end * sample_rate))
+
+    return samples[first:max(first, last)]
 
 
 class IntervalSegmenter:
@@ -151,21 +378,395 @@ class IntervalSegmenter:
     def __init__(self, interval=10_000):
         self.interval = interval
 
-    def segment(self, audiofile: Path):
+    def segment(self, audiofile: Union[Path, BinaryIO]) -> Iterator[Segment]:
         """
         Segment an audio at a regular interval.
 
+        The audio file is memory-mapped and the segments are yielded lazily as
+        views into the map. Neither the audio nor the segments are copied
+        into memory, regardless of the recording's length.
+
         Args:
-            audio: Audio to segment (pydub.AudioSegment)
-            interval: Interval to split audio at (in ms)
+            audiofile: 16-bit mono WAV file to segment (c.f. extract_audio)
+                or a stream of raw 16 kHz PCM (c.f. decode_audio), which is
+                consumed as it arrives.
+
+        Raises:
+            ValueError, if the audio is not 16-bit mono.
 
         Returns:
-            A list of audio segments.
+            An iterator over the audio segments.
+        """
+        if hasattr(audiofile, 'read'):
+            yield from self.segment_stream(cast(BinaryIO, audiofile))
+            return
+
+        samples, sample_rate = map_wav(audiofile)  # type: ignore
+
+        # Interval is in ms, convert to number of samples.
+        step = self.interval * sample_rate // 1000
+
+        for offset in range(0, len(samples), step):
+            yield Segment(samples[offset:offset + step], sample_rate,
+                          start=offset * 1000 // sample_rate)
+
+    def segment_stream(self, stream: BinaryIO, sample_rate: int = SAMPLE_RATE) -> Iterator[Segment]:
+        """
+        Segment a stream of raw 16-bit mono PCM at a regular interval.
+
+        Each segment is read as soon as enough samples have arrived, i.e. the
+        first segment is available long before the stream ends.
         """
-        audio = pydub.AudioSegment.from_wav(str(audiofile))
-        number_of_segments = ceil(len(audio) / self.interval)
+        step = self.interval * sample_rate // 1000
+        offset = 0
 
-        return [
-            audio[i * self.interval: i * self.interval + self.interval]
-            for i in range(0, number_of_segments)
+        while True:
+            samples = read_samples(stream, step)
+            if len(samples) == 0:
+                return
+
+            yield Segment(samples, sample_rate,
+                          start=offset * 1000 // sample_rate)
+            offset += len(samples)
+
+    def number_of_segments(self, audiofile: Union[Path, BinaryIO]) -> Optional[int]:
+        """
+        Returns the number of segments segment() yields for `audiofile`, or
+        None for streams (their length is unknown until they end).
+        """
+        if hasattr(audiofile, 'read'):
+            return None
+
+        samples, sample_rate = map_wav(audiofile)  # type: ignore
+        step = self.interval * sample_rate // 1000
+
+        return -(-len(samples) // step)
+
+
+class VadSegmenter:
+    """
+    Segment audio at pauses in speech, skipping silence.
+
+    Cutting the audio at a fixed interval splits words across segments and
+    wastes time transcribing stretches without speech (breaks, setting up a
+    demo, ...). VadSegmenter uses a simple voice activity detection (VAD) to
+    find the regions that contain speech:
+
+    1. The audio is split into short frames (e.g., 30 ms). For each frame, the
+       short-time energy and the zero-crossing rate are computed.
+    2. Frames that are loud enough are speech. Quieter frames with a high
+       zero-crossing rate are speech as well, as these are typical for
+       unvoiced sounds (like the "s" in "speech").
+    3. Short pauses within speech are closed and short noises are discarded.
+    4. Speech regions shorter than `min_length` are merged with the following
+       ones, regions longer than `max_length` are cut at their quietest frame.
+
+    Silence between the regions is dropped entirely. Each segment knows its
+    real offset in the audio, so the subtitles line up with the speech.
+
+    The audio is analyzed in windows of a few times `max_length`, therefore
+    memory use does not depend on the recording's length.
+    """
+
+    # Number of files whose speech regions are kept (see file_regions).
+    regions_cache_size = 8
+
+    def __init__(
+        self,
+        min_length: int = 3_000,
+        max_length: int = 15_000,
+        min_pause: int = 300,
+        min_speech: int = 150,
+        padding: int = 200,
+        frame_length: int = 30,
+        threshold: Optional[float] = None,
+    ):
+        """
+        Initialize the segmenter. All durations are in ms.
+
+        Args:
+            min_length: Speech regions shorter than this are merged with the
+                next one, unless the merged segment exceeds max_length.
+            max_length: Maximum length of a segment.
+            min_pause: Pauses shorter than this do not end a speech region.
+            min_speech: Speech regions shorter than this are discarded.
+            padding: Silence kept before and after each segment.
+            frame_length: Length of the frames to analyze.
+            threshold: Energy (in dBFS) above which a frame counts as speech.
+                If None, the threshold adapts to the recording's noise floor.
+
+        """
+        if min_length > max_length:
+            raise ValueError("min_length must not be greater than max_length.")
+
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_pause = min_pause
+        self.min_speech = min_speech
+        self.padding = padding
+        self.frame_length = frame_length
+        self.threshold = threshold
+
+        # Speech regions of the files segmented last. Private attributes are
+        # not settings (c.f. dnt.cache.result_key).
+        self._regions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def segment(self, audiofile: Union[Path, BinaryIO]) -> Iterator[Segment]:
+        """
+        Segment the speech in an audio file.
+
+        Args:
+            audiofile: 16-bit mono WAV file to segment (c.f. extract_audio)
+                or a stream of raw 16 kHz PCM (c.f. decode_audio).
+
+        Returns:
+            An iterator over the speech segments.
+
+        """
+        if hasattr(audiofile, 'read'):
+            yield from self.segment_stream(cast(BinaryIO, audiofile))
+            return
+
+        samples, sample_rate = map_wav(audiofile)  # type: ignore
+
+        # Segments are views into the memory-mapped file.
+        for start, end in self.file_regions(cast(Path, audiofile), samples, sample_rate):
+            yield Segment(samples[start:end], sample_rate,
+                          start=start * 1000 // sample_rate)
+
+    def segment_stream(self, stream: BinaryIO, sample_rate: int = SAMPLE_RATE) -> Iterator[Segment]:
+        """
+        Segment the speech in a stream of raw 16-bit mono PCM.
+        """
+        window_size = self.window_size(sample_rate)
+        buffer = read_samples(stream, window_size)
+        # Offset of the buffer's first sample in the stream.
+        position = 0
+
+        while len(buffer) > 0:
+            final = len(buffer) < window_size
+            regions, consumed = self.regions_in_window(buffer, sample_rate, final)
+
+            for start, end in regions:
+                yield Segment(buffer[start:end], sample_rate,
+                              start=(position + start) * 1000 // sample_rate)
+
+            position += consumed
+            missing = window_size - (len(buffer) - consumed)
+            buffer = np.concatenate(
+                [buffer[consumed:], read_samples(stream, missing)]
+            ) if not final else buffer[:0]
+
+    def number_of_segments(self, audiofile: Union[Path, BinaryIO]) -> Optional[int]:
+        """
+        Returns the number of segments segment() yields for `audiofile`, or
+        None for streams (their length is unknown until they end).
+
+        Note: Analyzes the whole file. That's cheap compared to transcribing
+        it, but not free. The speech regions found are kept, so segmenting
+        the file afterwards does not analyze it again.
+        """
+        if hasattr(audiofile, 'read'):
+            return None
+
+        samples, sample_rate = map_wav(audiofile)  # type: ignore
+
+        return sum(1 for _ in self.file_regions(cast(Path, audiofile), samples, sample_rate))
+
+    def file_regions(
+        self, audiofile: Path, samples: np.ndarray, sample_rate: int
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        Find the speech regions of a WAV file.
+
+        The regions of the last `regions_cache_size` files are kept, until
+        the files change.
+
+        Returns:
+            An iterator over the (start, end) sample offsets of the regions.
+
+        """
+        stat = audiofile.stat()
+        key = (str(audiofile.resolve()), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._regions.get(key)
+            if cached is not None:
+                self._regions.move_to_end(key)
+
+        if cached is not None:
+            yield from cached
+            return
+
+        window_size = self.window_size(sample_rate)
+        regions = []
+        position = 0
+
+        while position < len(samples):
+            window = samples[position:position + window_size]
+            final = position + len(window) >= len(samples)
+
+            in_window, consumed = self.regions_in_window(window, sample_rate, final)
+
+            for start, end in in_window:
+                regions.append((position + start, position + end))
+                yield position + start, position + end
+
+            position += consumed
+
+        with self._lock:
+            self._regions[key] = regions
+            while len(self._regions) > self.regions_cache_size:
+                self._regions.popitem(last=False)
+
+    def window_size(self, sample_rate: int) -> int:
+        # The window must be long enough to hold a segment of max_length
+        # that starts close to the end of the previous window.
+        return 4 * self.max_length * sample_rate // 1000
+
+    def regions_in_window(
+        self, window: np.ndarray, sample_rate: int, final: bool
+    ) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        Find the speech regions of an analysis window.
+
+        Regions that end in the last max_length of the window might continue
+        in the next window. Unless this is the final window, they are left for
+        the next window, which starts at the first of them.
+
+        Returns:
+            The (start, end) sample offsets of the regions within the window
+            and the number of samples that have been consumed.
+
+        """
+        frame_size = self.frame_length * sample_rate // 1000
+        regions = [
+            (start * frame_size, min(end * frame_size, len(window)))
+            for start, end in self.speech_regions(window, frame_size)
         ]
+
+        if final:
+            return regions, len(window)
+
+        limit = len(window) - self.max_length * sample_rate // 1000
+        complete = [(start, end) for start, end in regions if end <= limit]
+        left = regions[len(complete):]
+
+        if left:
+            # Continue at the first region left for the next window, even if
+            # it starts before the limit. Otherwise, its start would be lost.
+            return complete, min(limit, left[0][0])
+
+        return complete, complete[-1][1] if complete else limit
+
+    def speech_regions(self, samples: np.ndarray, frame_size: int) -> List[Tuple[int, int]]:
+        """
+        Detect the speech regions in `samples`.
+
+        Returns:
+            A list of (start, end) frame indices, end exclusive.
+
+        """
+        number_of_frames = -(-len(samples) // frame_size)
+        if number_of_frames == 0:
+            return []
+
+        # Pad the last frame with silence, so that all frames have the same
+        # size and can be analyzed at once.
+        frames = np.zeros(number_of_frames * frame_size, dtype=np.float32)
+        frames[:len(samples)] = samples
+        frames = frames.reshape(number_of_frames, frame_size) / 32768.0
+
+        energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        zero_crossings = np.mean(
+            np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1
+        )
+
+        threshold = self.threshold
+        if threshold is None:
+            # Adapt to the recording: The quietest frames are background
+            # noise, speech is considerably louder than that.
+            noise_floor = np.percentile(energy, 10)
+            threshold = float(np.clip(noise_floor + 15, -55, -35))
+
+        is_speech = (energy > threshold) | (
+            (energy > threshold - 10) & (zero_crossings > 0.25)
+        )
+
+        is_speech = fill_runs(is_speech, False, self.min_pause // self.frame_length)
+        is_speech = fill_runs(is_speech, True, self.min_speech // self.frame_length)
+
+        return self.cut(runs(is_speech), energy)
+
+    def cut(self, regions: List[Tuple[int, int]], energy: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Fit the speech regions (in frames) into the configured length bounds.
+        """
+        min_frames = self.min_length // self.frame_length
+        max_frames = self.max_length // self.frame_length
+        padding = self.padding // self.frame_length
+
+        # Split regions that are too long at their quietest frame.
+        splitted = []
+        for start, end in regions:
+            while end - start > max_frames:
+                earliest = start + max(1, min(min_frames, max_frames - 1))
+                quietest = np.argmin(energy[earliest:start + max_frames])
+                cut = earliest + int(quietest)
+                splitted.append((start, cut))
+                start = cut
+            splitted.append((start, end))
+
+        # Merge short regions with the next one, if it is close enough.
+        merged: List[Tuple[int, int]] = []
+        for start, end in splitted:
+            if merged:
+                previous_start, previous_end = merged[-1]
+                if previous_end - previous_start < min_frames \
+                        and end - previous_start <= max_frames:
+                    merged[-1] = (previous_start, end)
+                    continue
+            merged.append((start, end))
+
+        # Keep some silence around the speech, without overlapping the
+        # neighbouring segments or exceeding max_length.
+        padded = []
+        for index, (start, end) in enumerate(merged):
+            lower = merged[index - 1][1] if index > 0 else 0
+            upper = merged[index + 1][0] if index + 1 < len(merged) else len(energy)
+            room = max(0, max_frames - (end - start))
+            before = min(padding, room // 2, (start - lower) // 2)
+            after = min(padding, room - before, (upper - end) // 2)
+            padded.append((start - before, end + after))
+
+        return padded
+
+
+def runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Return the (start, end) indices of the runs of True values in `mask`.
+    """
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def fill_runs(mask: np.ndarray, value: bool, max_length: int) -> np.ndarray:
+    """
+    Flip runs of `value` shorter than `max_length` in `mask`.
+
+    Runs touching the beginning or end of `mask` are only flipped when looking
+    for runs of True (i.e., discarding short noises), not when closing gaps.
+    """
+    mask = mask.copy()
+    target = mask if value else ~mask
+
+    for start, end in runs(target):
+        touches_border = start == 0 or end == len(mask)
+        if end - start < max_length and (value or not touches_border):
+            mask[start:end] = not value
+
+    return mask
@@ -0,0 +1,161 @@
+"""
+Keep loaded models in memory across transcriptions.
+
+Loading a DeepSpeech model, and in particular its scorer, takes seconds and a
+lot of memory. Long-running processes like the web app should therefore load
+each model once and re-use it. The ModelRegistry holds the loaded
+transcribers, keyed by (model path, scorer path).
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+Key = Tuple[Path, Path]
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded transcribers.
+
+    The registry is safe to use from multiple threads. When a model is
+    requested that is not loaded yet, it is loaded exactly once, even if
+    several threads request it at the same time.
+
+    If a memory budget is set, the least recently used models are unloaded
+    once the loaded models exceed the budget. A model's memory footprint is
+    estimated by the size of its model and scorer files.
+
+    Example:
+        >>> registry = ModelRegistry(DeepSpeechTranscriber,
+        ...                          memory_budget=4 * 1024 ** 3)
+        >>> registry.preload([(model_path, scorer_path)])
+        >>> with registry.lease(model_path, scorer_path) as transcriber:
+        ...     transcriber.transcribe(segment)
+
+    """
+
+    def __init__(self, factory: Callable, memory_budget: Optional[int] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            factory: Creates a transcriber from a model and scorer path,
+                e.g. DeepSpeechTranscriber.
+            memory_budget: Maximum memory (in bytes) used by the loaded
+                models. Unlimited if None.
+
+        """
+        self.memory_budget = memory_budget
+        self.factory = factory
+
+        self.lock = threading.Lock()
+        # Loaded transcribers, the least recently used first.
+        self.transcribers: 'OrderedDict[Key, object]' = OrderedDict()
+        self.sizes: Dict[Key, int] = {}
+        # Held while a model is being loaded or used (see lease()).
+        self.model_locks: Dict[Key, threading.Lock] = {}
+
+    def get(self, model_path: Path, scorer_path: Path):
+        """
+        Returns the transcriber for a model, loading it if necessary.
+
+        Note: The transcriber may be used by other threads at the same time.
+        Use lease() for exclusive access.
+        """
+        key = (Path(model_path), Path(scorer_path))
+
+        with self.lock:
+            if key in self.transcribers:
+                self.transcribers.move_to_end(key)
+                return self.transcribers[key]
+
+            model_lock = self.model_locks.setdefault(key, threading.Lock())
+
+        # Load outside of the registry's lock, so that other models can be
+        # used in the meantime. The model's lock ensures it's loaded once.
+        with model_lock:
+            with self.lock:
+                if key in self.transcribers:
+                    self.transcribers.move_to_end(key)
+                    return self.transcribers[key]
+
+            transcriber = self.factory(*key)
+
+            with self.lock:
+                self.transcribers[key] = transcriber
+                self.sizes[key] = estimate_size(*key)
+                self.evict(keep=key)
+
+        return transcriber
+
+    @contextmanager
+    def lease(self, model_path: Path, scorer_path: Path) -> Iterator:
+        """
+        Use the transcriber for a model exclusively.
+
+        Other threads leasing the same model wait until the lease ends.
+        """
+        transcriber = self.get(model_path, scorer_path)
+
+        with self.locked(model_path, scorer_path):
+            yield transcriber
+
+    @contextmanager
+    def locked(self, model_path: Path, scorer_path: Path) -> Iterator[None]:
+        """
+        Hold a model's lock like lease(), but without (re-)loading the model.
+
+        For users of a transcriber obtained before, e.g. a live transcription
+        feeding its stream.
+        """
+        key = (Path(model_path), Path(scorer_path))
+
+        with self.lock:
+            model_lock = self.model_locks.setdefault(key, threading.Lock())
+
+        with model_lock:
+            yield
+
+    def preload(self, models: Iterable[Key]):
+        """
+        Load the given (model path, scorer path) pairs.
+        """
+        for model_path, scorer_path in models:
+            self.get(model_path, scorer_path)
+
+    def evict(self, keep: Optional[Key] = None):
+        """
+        Unload the least recently used models until the budget is met.
+
+        Must be called while holding the registry's lock.
+        """
+        if self.memory_budget is None:
+            return
+
+        for key in list(self.transcribers):
+            if sum(self.sizes.values()) <= self.memory_budget:
+                break
+
+            if key == keep:
+                continue
+
+            # Transcribers still in use stay alive until they are released.
+            del self.transcribers[key]
+            del self.sizes[key]
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return tuple(Path(p) for p in key) in self.transcribers
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.transcribers)
+
+
+def estimate_size(model_path: Path, scorer_path: Path) -> int:
+    """
+    Estimate the memory (in bytes) a loaded model occupies.
+    """
+    return sum(p.stat().st_size for p in (model_path, scorer_path) if p.exists())
@@ -3,8 +3,8 @@ Module generates subtitles in multiple file formats: SRT, VTT.
 """
 from dataclasses import dataclass
 from textwrap import dedent
-from datetime import timedelta
-from typing import List, Literal, Optional, Tuple
+from pathlib import Path
+from typing import List, Literal, Optional, Sequence, Tuple, Union
 
 
 @dataclass
@@ -12,6 +12,60 @@ class Subtitles:
     format: str
     language_code: str
     content: str
+    # The model that transcribed the audio, when comparing several models.
+    model: Optional[str] = None
+
+
+class Cue:
+    """
+    A single subtitle line with its position in the audio.
+
+    Cues are created for every segment, so there may be a lot of them. Using
+    __slots__ keeps them small.
+
+    Attributes:
+        start: Start of the cue (in ms).
+        end: End of the cue (in ms).
+        text: The cue's text, i.e. the transcript or its translation.
+
+    """
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start: int, end: int, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def as_dict(self) -> dict:
+        return {"start": self.start, "end": self.end, "text": self.text}
+
+    def with_text(self, text: str) -> 'Cue':
+        """
+        Returns a cue at the same position with another text.
+        """
+        return Cue(self.start, self.end, text)
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+    def __repr__(self):
+        return f"Cue(start={self.start}, end={self.end}, text={self.text!r})"
+
+
+def as_cues(lines: Sequence[Union[Cue, str]], interval: int = 10_000) -> List[Cue]:
+    """
+    Ensure all subtitle lines are cues.
+
+    Plain strings are placed at a regular interval (in ms), according to their
+    position in `lines`.
+    """
+    return [
+        line if isinstance(line, Cue)
+        else Cue(index * interval, (index + 1) * interval, line)
+        for index, line in enumerate(lines)
+    ]
 
 
 class SubtitleFormat:
@@ -38,27 +92,36 @@ class SubtitleFormat:
         else:
             return None
 
-    def compile(self, texts: List[str], language_code: str) -> Subtitles:
+    def compile(self, cues: Sequence[Union[Cue, str]], language_code: str) -> Subtitles:
         """
-        Compile a list of strings into subtitles of specified format.
+        Compile a list of cues into subtitles of specified format.
+
+        Cues are rendered at their start and end time. For convenience, plain
+        strings are accepted too; they are placed at a 10 s interval.
         """
         subtitles = []
 
         if self.header:
             subtitles.append(self.header)
 
-        for index, text in enumerate(texts):
-            start, end = timecodes(index, self.timecode_format)
-            line = dedent(f"""\
-                {index + 1}
-                {start} --> {end}
-                {text}
-            """)
-
-            subtitles.append(line)
+        for index, cue in enumerate(as_cues(cues)):
+            subtitles.append(self.cue(index, cue))
 
         return Subtitles(format=self.name, content="\n".join(subtitles), language_code=language_code)
 
+    def cue(self, index: int, cue: Cue) -> str:
+        """
+        Format the `index`-th subtitle line (counting from 0).
+        """
+        start = timecode(cue.start, self.timecode_format)
+        end = timecode(cue.end, self.timecode_format)
+
+        return dedent(f"""\
+            {index + 1}
+            {start} --> {end}
+            {cue.text}
+        """)
+
 
 class VTT(SubtitleFormat):
     # WebVTT requires a special header at the beginning of the file.
@@ -75,6 +138,61 @@ class SRT(SubtitleFormat):
     timecode_format = "%02d:%02d:%02d,%03d"
 
 
+class SubtitleWriter:
+    """
+    Append subtitle lines to a file as they are produced.
+
+    Unlike SubtitleFormat.compile(), which formats all lines at once, the
+    writer emits each line as soon as it is available. Every line is flushed
+    to disk immediately, so the subtitles can be followed while the rest of the
+    audio is still being transcribed. The resulting file is the same as the
+    compiled one.
+    """
+
+    def __init__(self, subtitle_format: SubtitleFormat, language_code: str, path: Path):
+        self.subtitle_format = subtitle_format
+        self.language_code = language_code
+        self.path = path
+        self.lines = 0
+
+        self.fd = open(path, "w", encoding="utf-8")
+
+        if subtitle_format.header:
+            self.fd.write(subtitle_format.header)
+
+    def write(self, cue: Union[Cue, str]):
+        """
+        Append the next subtitle line.
+
+        Like for compile(), plain strings are placed at a 10 s interval.
+        """
+        if isinstance(cue, str):
+            cue = Cue(self.lines * 10_000, (self.lines + 1) * 10_000, cue)
+
+        if self.lines > 0 or self.subtitle_format.header:
+            self.fd.write("\n")
+
+        self.fd.write(self.subtitle_format.cue(self.lines, cue))
+        self.fd.flush()
+        self.lines += 1
+
+    def close(self) -> Subtitles:
+        """
+        Close the file.
+
+        Returns:
+            The written subtitles.
+
+        """
+        self.fd.close()
+
+        return Subtitles(
+            format=self.subtitle_format.name,
+            content=self.path.read_text(encoding="utf-8"),
+            language_code=self.language_code
+        )
+
+
 def timecodes(offset: int, formatstr: str, interval: int = 10) -> List[str]:
     """
     Generate timecodes based on an interval.
@@ -88,17 +206,27 @@ def timecodes(offset: int, formatstr: str, interval: int = 10) -> List[str]:
         Formatted timecodes for the interval's start and end.
 
     """
-    codes = []
+    start = offset * interval * 1000
+    end = start + interval * 1000
+
+    return [timecode(start, formatstr), timecode(end, formatstr)]
 
-    start = timedelta(seconds=offset * interval)
-    end = timedelta(seconds=offset * interval + interval)
 
-    for t in [start, end]:
-        hrs, secs_remainder = divmod(t.seconds, 60 * 60)
-        hrs += t.days * 24
-        mins, secs = divmod(secs_remainder, 60)
-        msecs = t.microseconds // 1000
-        timecode = formatstr % (hrs, mins, secs, msecs)
-        codes.append(timecode)
+def timecode(milliseconds: int, formatstr: str) -> str:
+    """
+    Format a point in time.
+
+    Args:
+        milliseconds: Offset from the beginning of the audio (in ms).
+        formatstr: Format string (%-syntax) for time codes, receiving hours,
+            minutes, seconds and milliseconds.
+
+    Returns:
+        The formatted timecode.
+
+    """
+    secs, msecs = divmod(int(milliseconds), 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
 
-    return codes
+    return formatstr % (hrs, mins, secs, msecs)
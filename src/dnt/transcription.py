@@ -1,12 +1,16 @@
 """
 Module contains transcribers.
 """
+from collections import deque
 from pathlib import Path
+from typing import List
 
-import wave
 import numpy as np
 from deepspeech import Model
 
+from dnt.audio import SAMPLE_RATE, as_pcm
+from dnt.subtitles import Cue
+
 
 class DeepSpeechTranscriber:
     """
@@ -26,16 +30,191 @@ class DeepSpeechTranscriber:
         """
         Transcribe a segment of audio.
 
-        TODO:
-            Wrap pydub's AudioSegment into a custom type, so that we
-            don't have to rely on pydub here. Best place is to change
-            it in the Pipeline class.
+        Args:
+            segment: 16 kHz mono audio as a dnt.audio.Segment, an int16 numpy
+                array or a buffer of raw 16-bit PCM (see dnt.audio.as_pcm).
+                The samples are passed to DeepSpeech without copying.
+
+        Returns:
+            The transcript of the segment.
+
+        """
+        return self.ds.stt(as_pcm(segment))
+
+    def live(self, **options) -> 'LiveTranscription':
+        """
+        Start transcribing audio as it arrives (e.g., from a microphone).
+
+        The live transcription shares the model with this transcriber. See
+        LiveTranscription for the options.
+        """
+        return LiveTranscription(self.ds, **options)
+
+
+class LiveTranscription:
+    """
+    Transcribe audio while it is being recorded.
+
+    Uses DeepSpeech's streaming API: Audio is fed to the model as it arrives,
+    so the transcript of the current utterance is available at any time
+    (interim results). An utterance ends after a pause in speech or when it
+    gets too long; its final transcript is then emitted as a cue and a new
+    utterance starts.
+
+    Example:
+        >>> live = transcriber.live()
+        >>> for chunk in microphone:
+        ...     for cue in live.feed(chunk):
+        ...         print("final:", cue.text)
+        ...     print("interim:", live.interim().text)
+        >>> live.finish()
+
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        sample_rate: int = SAMPLE_RATE,
+        max_length: int = 10_000,
+        min_pause: int = 500,
+        threshold: float = -40.0,
+        frame_length: int = 30
+    ):
+        """
+        Initialize the live transcription. All durations are in ms.
+
+        Args:
+            model: DeepSpeech model to use.
+            sample_rate: Sample rate of the audio.
+            max_length: Maximum length of an utterance (i.e., a cue).
+            min_pause: Pause after which an utterance ends.
+            threshold: Energy (in dBFS) below which audio counts as silence.
+            frame_length: Resolution of the pause detection.
+
+        """
+        self.model = model
+        self.sample_rate = sample_rate
+        self.max_length = max_length * sample_rate // 1000
+        self.min_pause = min_pause * sample_rate // 1000
+        self.threshold = threshold
+        self.frame_size = frame_length * sample_rate // 1000
+
+        self.stream = model.createStream()
+        # Number of samples received so far, the sample the current utterance
+        # started at and the number of silent samples at its end.
+        self.position = 0
+        self.utterance_start = 0
+        self.silence = 0
+        # Silence received since the last utterance ended (up to min_pause).
+        self.leading: deque = deque()
+        self.leading_samples = 0
+        self.heard_speech = False
+
+    def feed(self, audio) -> List[Cue]:
+        """
+        Feed the next chunk of audio.
+
+        Args:
+            audio: Raw 16-bit mono PCM (see dnt.audio.as_pcm) of any length.
+
+        Returns:
+            Cues of the utterances that ended within the chunk.
 
         """
-        segment_as_wav = segment.export(format="wav")
-        with wave.open(segment_as_wav, 'r') as w:
-            frames = w.getnframes()
-            buffer = w.readframes(frames)
-            data = np.frombuffer(buffer, dtype=np.int16)
+        samples = as_pcm(audio)
+        cues = []
+
+        # Analyze all frames of the chunk at once, then feed them one by
+        # one to end utterances at the right frame.
+        number_of_frames = -(-len(samples) // self.frame_size)
+        padded = np.zeros(number_of_frames * self.frame_size, dtype=np.float32)
+        padded[:len(samples)] = samples
+        padded = padded.reshape(number_of_frames, self.frame_size) / 32768.0
+        energy = 10 * np.log10(np.mean(padded ** 2, axis=1) + 1e-10)
+
+        frames = range(0, len(samples), self.frame_size)
+
+        for offset, frame_energy in zip(frames, energy):
+            frame = samples[offset:offset + self.frame_size]
+            silent = frame_energy < self.threshold
+            self.position += len(frame)
+
+            if not self.heard_speech:
+                if silent:
+                    # Don't spend inference on silence before an utterance,
+                    # only keep its end as padding.
+                    self.leading.append(frame)
+                    self.leading_samples += len(frame)
+                    while self.leading_samples - len(self.leading[0]) >= self.min_pause:
+                        self.leading_samples -= len(self.leading.popleft())
+                    continue
+
+                # Speech starts: The utterance begins with the padding.
+                self.heard_speech = True
+                self.utterance_start = self.position - len(frame) - self.leading_samples
+                for padding in self.leading:
+                    self.stream.feedAudioContent(padding)
+                self.leading.clear()
+                self.leading_samples = 0
+
+            self.stream.feedAudioContent(frame)
+            self.silence = self.silence + len(frame) if silent else 0
+
+            paused = self.silence >= self.min_pause
+            too_long = self.position - self.utterance_start >= self.max_length
+
+            if paused or too_long:
+                cues += self.end_utterance()
+
+        return cues
+
+    def interim(self) -> Cue:
+        """
+        Returns the transcript of the current utterance so far.
+        """
+        if not self.heard_speech:
+            return Cue(self.milliseconds(self.position),
+                       self.milliseconds(self.position), "")
+
+        return Cue(self.milliseconds(self.utterance_start),
+                   self.milliseconds(self.position),
+                   self.stream.intermediateDecode())
+
+    def finish(self) -> List[Cue]:
+        """
+        End the live transcription.
+
+        Returns:
+            The cue of the last utterance, if there is one.
+
+        """
+        cues = self.end_utterance(restart=False)
+        self.stream = None
+        return cues
+
+    def close(self):
+        """
+        Discard the live transcription without decoding, e.g. when the client
+        is gone. Frees the model's stream.
+        """
+        if self.stream is not None:
+            self.stream.freeStream()
+            self.stream = None
+
+    def end_utterance(self, restart: bool = True) -> List[Cue]:
+        text = self.stream.finishStream()
+        cue = Cue(self.milliseconds(self.utterance_start),
+                  self.milliseconds(self.position - self.silence), text)
+
+        if restart:
+            self.stream = self.model.createStream()
+
+        self.utterance_start = self.position
+        self.silence = 0
+        self.heard_speech = False
+
+        # Utterances without any words (e.g., noise) do not make a cue.
+        return [cue] if text.strip() else []
 
-        return self.ds.stt(data)
+    def milliseconds(self, samples: int) -> int:
+        return samples * 1000 // self.sample_rate
@@ -1,12 +1,23 @@
 """
 Translate transcripts using commercial translation service DeepL.
 """
-from typing import Protocol
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol
 
 import requests  # type: ignore
 
 DEEPL_API_URL = "https://api-free.deepl.com/v2/translate"
 
+# DeepL accepts up to 50 texts per request and requests up to 128 KiB.
+DEEPL_MAX_TEXTS = 50
+DEEPL_MAX_REQUEST_SIZE = 128 * 1024
+
 
 class Translator(Protocol):
 
@@ -14,6 +25,19 @@ class Translator(Protocol):
         # TODO: Should there be a default implementation that NOPs?
         pass
 
+    def translate_many(self, texts: List[str], target_lang: str = 'DE') -> List[str]:
+        """
+        Translate multiple texts at once.
+
+        Translators that can translate several texts more efficiently than one
+        by one (e.g., in a single API call) should override this method.
+
+        Returns:
+            The translations, in the same order as `texts`.
+
+        """
+        return [self.translate(text, target_lang) for text in texts]
+
 
 class DeepL(Translator):
     """
@@ -34,8 +58,31 @@ class DeepL(Translator):
 
     """
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        url: str = DEEPL_API_URL,
+        max_texts: int = DEEPL_MAX_TEXTS,
+        max_request_size: int = DEEPL_MAX_REQUEST_SIZE
+    ):
+        """
+        Initialize the translator.
+
+        Args:
+            api_key: Your DeepL API key.
+            url: URL of the translation endpoint (e.g., to use DeepL Pro).
+            max_texts: Maximum number of texts sent in a single request.
+            max_request_size: Maximum number of (UTF-8 encoded) bytes of text
+                sent in a single request.
+
+        """
         self.api_key = api_key
+        self.url = url
+        self.max_texts = max_texts
+        self.max_request_size = max_request_size
+        # Re-use the connection to the API across requests instead of
+        # establishing a new TCP + TLS connection for every request.
+        self.session = requests.Session()
 
     def translate(self, text: str, target_lang: str = 'DE') -> str:
         """
@@ -54,24 +101,67 @@ class DeepL(Translator):
             The text translated in the traget language.
 
         """
-        response = requests.post(url=DEEPL_API_URL,
-                                 data={
-                                     'target_lang': target_lang,
-                                     'auth_key': self.api_key,
-                                     'text': text,
-                                 })
+        return self.translate_many([text], target_lang)[0]
 
-        response.raise_for_status()
-        translation = response.json()
+    def translate_many(self, texts: List[str], target_lang: str = 'DE') -> List[str]:
+        """
+        Translate multiple texts using as few API calls as possible.
+
+        DeepL translates multiple texts in a single request when providing the
+        `text` parameter multiple times. The texts are split into batches that
+        stay below DeepL's request limits.
+
+        Raises:
+            HTTPError, if any of the API calls went wrong.
+
+        Returns:
+            The translations, in the same order as `texts`.
 
-        # API response JSON looks like:
-        # "translations": [{
-        # 		"detected_source_language":"EN",
-        # 		"text":"Hallo, Welt!"
-        # 	}]
-        # }
+        """
+        translations = []
+
+        for batch in self.batches(texts):
+            data = [('target_lang', target_lang), ('auth_key', self.api_key)]
+            data += [('text', text) for text in batch]
+
+            response = self.session.post(url=self.url, data=data)
 
-        return translation['translations'][0]['text']
+            response.raise_for_status()
+            translation = response.json()
+
+            # API response JSON looks like:
+            # "translations": [{
+            # 		"detected_source_language":"EN",
+            # 		"text":"Hallo, Welt!"
+            # 	}]
+            # }
+            # The translations are in the same order as the texts.
+            translations += [t['text'] for t in translation['translations']]
+
+        return translations
+
+    def batches(self, texts: List[str]) -> Iterator[List[str]]:
+        """
+        Split texts into batches that respect the configured request limits.
+
+        A single text exceeding max_request_size is sent on its own.
+        """
+        batch: List[str] = []
+        size = 0
+
+        for text in texts:
+            text_size = len(text.encode("utf-8"))
+
+            if batch and (len(batch) == self.max_texts
+                          or size + text_size > self.max_request_size):
+                yield batch
+                batch, size = [], 0
+
+            batch.append(text)
+            size += text_size
+
+        if batch:
+            yield batch
 
 
 class NopTranslator(Translator):
@@ -84,3 +174,243 @@ class NopTranslator(Translator):
 
     def translate(self, text: str, target_lang: str = 'DE') -> str:
         return text
+
+    def translate_many(self, texts: List[str], target_lang: str = 'DE') -> List[str]:
+        return list(texts)
+
+
+def translate_concurrently(
+    translator: Translator,
+    texts: Iterable[str],
+    target_lang: str = 'DE',
+    max_in_flight: int = 4,
+    batch_size: int = 1
+) -> Iterator[str]:
+    """
+    Translate texts in background threads while they are still produced.
+
+    Texts are taken from `texts` as they arrive (e.g., from a generator that
+    transcribes audio), grouped into batches of up to `batch_size` texts and
+    submitted to a thread pool. While up to `max_in_flight` batches are being
+    translated, the caller's iterator keeps producing texts, so translation
+    overlaps with whatever produces them.
+
+    Args:
+        translator: Translator to use; batches are translated with
+            translate_many if the translator provides it.
+        texts: The texts to translate.
+        target_lang: Language code for the desired translation direction.
+        max_in_flight: Maximum number of batches translated concurrently.
+        batch_size: Maximum number of texts per batch. Larger batches need
+            fewer requests, but a batch is only submitted once it is full.
+
+    Returns:
+        An iterator over the translations, in the same order as `texts`.
+
+    """
+    def translate_one_by_one(batch: List[str], target_lang: str) -> List[str]:
+        return [translator.translate(text, target_lang) for text in batch]
+
+    translate_batch: Callable[[List[str], str], List[str]] = (
+        translator.translate_many if hasattr(translator, 'translate_many')
+        else translate_one_by_one
+    )
+
+    texts = iter(texts)
+    pending: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while True:
+            batch = list(islice(texts, batch_size))
+            if not batch:
+                break
+
+            if len(pending) == max_in_flight:
+                # Wait for the oldest batch, before submitting more work.
+                yield from pending.popleft().result()
+
+            pending.append(executor.submit(translate_batch, batch, target_lang))
+
+            # Hand out finished translations right away, but only in order.
+            while pending and pending[0].done():
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
+def translator_identity(translator) -> str:
+    """
+    Return a string identifying the translation engine of `translator`.
+
+    Translators can define an `identity` attribute, otherwise the class name
+    is used. Translations from different engines must not be mixed up, e.g.
+    in a cache.
+    """
+    return getattr(translator, 'identity', type(translator).__name__)
+
+
+class CachingTranslator(Translator):
+    """
+    Cache translations of another translator on disk.
+
+    The cache is a SQLite database, keyed by the (whitespace-normalized) source
+    text, the target language and the translator's identity. Therefore, texts
+    that were translated before - e.g., in a previous upload of the same
+    lecture - do not cost any characters of your DeepL plan.
+
+    Entries older than `max_age` are discarded. If the cache holds more than
+    `max_entries`, the least recently used entries are evicted.
+
+    Example:
+        >>> translator = CachingTranslator(DeepL(api_key), Path("cache.db"))
+        >>> translator.translate("Hello, world!")
+        'Hallo, Welt!'
+        >>> translator.translate("Hello,  world! ")  # No API call.
+        'Hallo, Welt!'
+        >>> translator.hits, translator.misses
+        (1, 1)
+
+    """
+
+    def __init__(
+        self,
+        translator: Translator,
+        path: Path,
+        max_entries: int = 100_000,
+        max_age: Optional[float] = None
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            translator: The translator to cache.
+            path: Location of the SQLite database (created if missing).
+            max_entries: Maximum number of cached translations.
+            max_age: Maximum age of cached translations (in seconds). Cached
+                translations never expire if None.
+
+        """
+        self.translator = translator
+        self.identity = translator_identity(translator)
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+
+        # The connection is shared across threads, but only used while
+        # holding the lock.
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    translator TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (source, target_lang, translator)
+                )
+            """)
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS translations_accessed"
+                " ON translations (accessed)"
+            )
+
+    def translate(self, text: str, target_lang: str = 'DE') -> str:
+        return self.translate_many([text], target_lang)[0]
+
+    def translate_many(self, texts: List[str], target_lang: str = 'DE') -> List[str]:
+        """
+        Translate texts, only passing the uncached ones to the translator.
+        """
+        sources = [normalize_whitespace(text) for text in texts]
+
+        cached = self.lookup(set(sources), target_lang)
+        missing = sorted(set(sources) - cached.keys())
+
+        hits = sum(1 for source in sources if source in cached)
+        with self.lock:
+            self.hits += hits
+            self.misses += len(sources) - hits
+
+        if missing:
+            translations = self.translator.translate_many(missing, target_lang) \
+                if hasattr(self.translator, 'translate_many') \
+                else [self.translator.translate(s, target_lang) for s in missing]
+
+            fresh = dict(zip(missing, translations))
+            self.store(fresh, target_lang)
+            cached.update(fresh)
+
+        return [cached[source] for source in sources]
+
+    def lookup(self, sources, target_lang: str) -> Dict[str, str]:
+        """
+        Return the cached translations of `sources`, marking them as used.
+        """
+        now = time.time()
+        oldest = now - self.max_age if self.max_age is not None else 0
+        found = {}
+
+        with self.lock, self.db:
+            for source in sources:
+                row = self.db.execute(
+                    "SELECT translation FROM translations"
+                    " WHERE source = ? AND target_lang = ? AND translator = ?"
+                    " AND created >= ?",
+                    (source, target_lang, self.identity, oldest)
+                ).fetchone()
+
+                if row is not None:
+                    found[source] = row[0]
+
+            self.db.executemany(
+                "UPDATE translations SET accessed = ?"
+                " WHERE source = ? AND target_lang = ? AND translator = ?",
+                [(now, source, target_lang, self.identity) for source in found]
+            )
+
+        return found
+
+    def store(self, translations: Dict[str, str], target_lang: str):
+        """
+        Add translations to the cache and evict old entries.
+        """
+        now = time.time()
+
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (source, target_lang, self.identity, translation, now, now)
+                    for source, translation in translations.items()
+                ]
+            )
+
+            if self.max_age is not None:
+                self.db.execute(
+                    "DELETE FROM translations WHERE created < ?",
+                    (now - self.max_age,)
+                )
+
+            # Keep the `max_entries` most recently used entries.
+            self.db.execute(
+                "DELETE FROM translations WHERE rowid IN ("
+                " SELECT rowid FROM translations"
+                " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapse runs of whitespace into single spaces and strip the ends.
+    """
+    return " ".join(text.split())
@@ -1,21 +1,33 @@
 """
 Simple Web UI to serve the Deep Neural Transcriber MVP to users.
 """
+import json
+import os
 import sys
+import threading
 import time
-from collections import defaultdict
+import uuid
+from contextlib import ExitStack
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Set, Union
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple, Union
 
-from flask import Flask, render_template, request, send_from_directory
-from flask.scaffold import F
+from flask import (Flask, Response, redirect, render_template, request,
+                   send_from_directory, url_for)
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
-from dnt.cli import process
+from dnt.cache import ResultCache, prune, result_key, save_and_hash
+from dnt.cli import make_segmenter, make_translator, model_labels, process
+from dnt.metrics import PrometheusMetrics
+from dnt.registry import ModelRegistry
+from dnt.ui.jobs import DONE, Job, JobQueue
 from dnt.ui.validation import Invalid, Valid, validate_into
-from dnt.utils import detect_runtime, first, list_models
+from dnt.utils import Runtime, detect_runtime, first, list_models, listify
+
+if TYPE_CHECKING:
+    from dnt.transcription import LiveTranscription
 
 # Store uploaded videos and the generated subtitles in this directory.
 # Caution: The directory is accessible by the user.
@@ -27,14 +39,52 @@ ALLOWED_EXTENSIONS = {'mp4'}
 # Path to where the models are stored. Required to locate the different models a
 # user can select for transcription.
 MODELS_PATH = Path("models/")
+# Upper bound for the number of transcription workers a user can request.
+MAX_WORKERS = os.cpu_count() or 1
 # We do not support providing a custom language model at the moment,
 # therefore we always use Mozilla's pre-trained language model:
 DEFAULT_LANGUAGE_MODEL = Path(
     'models/pretrained-v0.9.3/deepspeech-0.9.3-models.scorer'
 )
-# Detect whether we are running the deepspeech vanilla package or
-# deepspeech-tflite.
-RUNTIME = detect_runtime(MODELS_PATH)
+# Loaded models are kept in memory between requests, as loading them (in
+# particular the scorer) takes seconds. Once the loaded models exceed this
+# budget (in MiB), the least recently used ones are unloaded.
+MODEL_MEMORY_BUDGET = int(os.environ.get('DNT_MODEL_MEMORY_BUDGET', 4096))
+# Names of the models (as listed on the index page) to load at startup,
+# separated by commas.
+PRELOAD_MODELS = [
+    name.strip()
+    for name in os.environ.get('DNT_PRELOAD_MODELS', '').split(',')
+    if name.strip()
+]
+# Transcription jobs are stored in this SQLite database. Do not put it into
+# the UPLOAD_FOLDER, as that's accessible by the user.
+JOBS_DATABASE = Path(os.environ.get('DNT_JOBS_DATABASE', 'jobs.db'))
+# Maximum number of videos transcribed at the same time, and how many of them
+# may use the same model. Further uploads wait in the queue.
+JOB_WORKERS = int(os.environ.get('DNT_JOB_WORKERS', 2))
+JOBS_PER_MODEL = int(os.environ.get('DNT_JOBS_PER_MODEL', 1))
+# Subtitles are cached by the video's content (and the model etc. used), so
+# uploading a video again returns its subtitles right away. Cached subtitles
+# unused for RESULT_CACHE_DAYS are discarded, as are the least recently used
+# ones once the cache exceeds RESULT_CACHE_SIZE (in MiB).
+RESULT_CACHE = Path(os.environ.get('DNT_RESULT_CACHE', 'cache/results'))
+RESULT_CACHE_DAYS = int(os.environ.get('DNT_RESULT_CACHE_DAYS', 30))
+RESULT_CACHE_SIZE = int(os.environ.get('DNT_RESULT_CACHE_SIZE', 256))
+# The decoded audio of uploads is kept, so that transcribing a video again
+# (e.g., with another model) does not decode it again. The least recently used
+# audio is discarded once the cache exceeds AUDIO_CACHE_SIZE (in MiB).
+AUDIO_CACHE = Path(os.environ.get('DNT_AUDIO_CACHE', 'cache/audio'))
+AUDIO_CACHE_SIZE = int(os.environ.get('DNT_AUDIO_CACHE_SIZE', 4096))
+# Uploads and generated subtitles are deleted after UPLOAD_DAYS, or earlier if
+# the UPLOAD_FOLDER exceeds UPLOAD_QUOTA (in MiB), oldest first.
+UPLOAD_DAYS = int(os.environ.get('DNT_UPLOAD_DAYS', 7))
+UPLOAD_QUOTA = int(os.environ.get('DNT_UPLOAD_QUOTA', 10 * 1024))
+# Live transcriptions hold a stream on their model. At most MAX_LIVE_SESSIONS
+# run at the same time; sessions that receive no audio for
+# LIVE_SESSION_IDLE_SECONDS (e.g., the browser was closed) are discarded.
+MAX_LIVE_SESSIONS = int(os.environ.get('DNT_MAX_LIVE_SESSIONS', 8))
+LIVE_SESSION_IDLE_SECONDS = int(os.environ.get('DNT_LIVE_SESSION_IDLE_SECONDS', 60))
 
 if not DEFAULT_LANGUAGE_MODEL.is_file():
     raise RuntimeError(
@@ -43,6 +93,12 @@ if not DEFAULT_LANGUAGE_MODEL.is_file():
     )
 
 
+results = ResultCache(
+    RESULT_CACHE,
+    max_age=RESULT_CACHE_DAYS * 24 * 60 * 60,
+    max_size=RESULT_CACHE_SIZE * 1024 * 1024
+)
+
 app = Flask(__name__, template_folder='templates')
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER.absolute())
 # Disable caching, otherwise you'll end up downloading older versions of some
@@ -51,6 +107,36 @@ app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER.absolute())
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
 
+
+@lru_cache(maxsize=None)
+def runtime() -> Runtime:
+    """
+    Detect whether we are running the deepspeech vanilla package or
+    deepspeech-tflite.
+
+    Detected on first use, so that the app starts serving right away.
+    """
+    return detect_runtime(MODELS_PATH)
+
+
+def load_transcriber(model_path: Path, scorer_path: Path):
+    """
+    Load a DeepSpeech model (imports DeepSpeech on first use).
+    """
+    from dnt.transcription import DeepSpeechTranscriber
+
+    return DeepSpeechTranscriber(model_path, scorer_path)
+
+
+models = ModelRegistry(
+    load_transcriber,
+    memory_budget=MODEL_MEMORY_BUDGET * 1024 * 1024
+)
+
+# Timings of all jobs' pipelines, exported at /metrics.
+metrics = PrometheusMetrics()
+
+
 @dataclass
 class Submission:
     """
@@ -59,25 +145,59 @@ class Submission:
 
     # Uploaded video file.
     video: FileStorage
-    # Selected (acoustic) model.
-    model: Path
+    # Selected (acoustic) models; the video is transcribed with each of them.
+    models: List[Dict]
+    # Number of processes transcribing the video in parallel.
+    workers: int
     # The location of the video on disk - will be set after calling save()
     # successfully.
     video_path: Path = field(init=False)
+    # SHA-256 of the video's content - will be set after calling save().
+    media_hash: str = field(init=False)
 
     def save(self, folder: Path):
         """
         Save the submitted video file to the filesystem.
+
+        The video is hashed while it's written. Its file name starts with the
+        hash, so that different videos with the same name do not overwrite
+        each other.
         """
         if not self.video.filename:
             raise ValueError("No video found!")
 
         filename = secure_filename(self.video.filename)
-        video_path = folder / filename
-        self.video.save(video_path)
+        # The final name is only known once the video has been hashed.
+        partial_path = folder / f".{uuid.uuid4().hex}.part"
+        try:
+            self.media_hash = save_and_hash(self.video.stream, partial_path)
+            video_path = folder / f"{self.media_hash[:12]}-{filename}"
+            partial_path.replace(video_path)
+        finally:
+            partial_path.unlink(missing_ok=True)
+
         self.video_path = video_path
 
 
+@dataclass
+class LiveSession:
+    """
+    A live transcription in progress.
+    """
+    transcription: 'LiveTranscription'
+    # The (model path, scorer path) of the model, which is locked while the
+    # session uses it (see ModelRegistry.locked).
+    model: Tuple[Path, Path]
+    # Chunks of a session must be fed one after another.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+# Live transcriptions in progress, by session id.
+live_sessions: Dict[str, LiveSession] = {}
+live_sessions_lock = threading.Lock()
+
+
 def downloadable(target: Path):
     """
     Assembles the path to download `target` from.
@@ -115,12 +235,53 @@ def validate_model(name: str, available_models: Set) -> Union[Valid, Invalid]:
     return Invalid(["Unable to find selected model on filesystem."])
 
 
+def validate_models(names: List[str], available_models: Set) -> Union[Valid, Invalid]:
+    if not names:
+        return Invalid(["No model selected!"])
+
+    errors, selected = [], []
+
+    # Deduplicate, keeping the order of the selection.
+    for name in dict.fromkeys(names):
+        val = validate_model(name, available_models)
+        if isinstance(val, Invalid):
+            errors.extend(val.value)
+        else:
+            selected.append(val.value)
+
+    if errors:
+        return Invalid(errors)
+
+    return Valid(selected)
+
+
+def validate_workers(workers: str) -> Union[Valid, Invalid]:
+    if workers is None or workers.strip() == "":
+        # Field is optional, fall back to sequential transcription.
+        return Valid(1)
+
+    try:
+        number_of_workers = int(workers)
+    except ValueError:
+        return Invalid(["Number of workers must be a number!"])
+
+    if 1 <= number_of_workers <= MAX_WORKERS:
+        return Valid(number_of_workers)
+
+    return Invalid([f"Number of workers must be between 1 and {MAX_WORKERS}."])
+
+
 @app.route('/')
 def index(errors=[]):
     available_models = [model['name']
-                        for model in list_models(MODELS_PATH, RUNTIME)]
+                        for model in list_models(MODELS_PATH, runtime())]
 
-    return render_template("index.html", available_models=available_models, errors=errors)
+    return render_template(
+        "index.html",
+        available_models=available_models,
+        max_workers=MAX_WORKERS,
+        errors=errors
+    )
 
 
 @app.route("/transcribe", methods=["POST"])
@@ -130,12 +291,13 @@ def transcribe():
     """
     UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 
-    available_models = list_models(MODELS_PATH, RUNTIME)
+    available_models = list_models(MODELS_PATH, runtime())
 
     val = validate_into(
         Submission,
         validate_video_file(request.files.get('video')),
-        validate_model(request.form.get('model'), available_models)
+        validate_models(request.form.getlist('model'), available_models),
+        validate_workers(request.form.get('workers'))
     )
 
     if isinstance(val, Invalid):
@@ -144,38 +306,305 @@ def transcribe():
         submission = val.value
 
     submission.save(UPLOAD_FOLDER)
+    prune_uploads()
 
     # We'll use the deep-neural-transcribers CLI to transcribe the video.
     # Therefore, prepare the docopt argument format here.
     arguments = {
-        '<video_file>': submission.video_path,
-        '--model': str(submission.model['path']),
+        '<video_file>': str(submission.video_path),
+        '--model': [str(model['path']) for model in submission.models],
         '--scorer': str(DEFAULT_LANGUAGE_MODEL),
-        '--output': str(UPLOAD_FOLDER.absolute())
+        '--output': str(UPLOAD_FOLDER.absolute()),
+        '--workers': submission.workers,
+        '--result-cache': str(RESULT_CACHE),
+        '--result-cache-days': RESULT_CACHE_DAYS,
+        '--result-cache-size': RESULT_CACHE_SIZE,
+        '--audio-cache': str(AUDIO_CACHE),
+        '--audio-cache-size': AUDIO_CACHE_SIZE,
     }
 
+    model_names = [model['name'] for model in submission.models]
+
+    translator, segmenter = make_translator(arguments), make_segmenter(arguments)
+    cached = all(
+        results.get(result_key(submission.media_hash, model['path'],
+                               DEFAULT_LANGUAGE_MODEL, translator, segmenter)) is not None
+        for model in submission.models
+    )
+
+    if cached:
+        # The same video has been transcribed the same way before. Serve the
+        # cached subtitles right away instead of queueing a job.
+        start = time.time()
+        subtitle_files = process(arguments, media_hash=submission.media_hash)
+        context = result_context(arguments, ", ".join(model_names), subtitle_files,
+                                 time.time() - start)
+        return render_template("result.html", **context)
+
+    # The hash is passed on to process(), so the job does not hash the video
+    # again.
+    arguments['media_hash'] = submission.media_hash
+
+    # Transcription takes a while, so run it in the background. The user is
+    # sent to the job's page, which shows the progress and, eventually, the
+    # subtitles. Jobs are limited per model (see JOBS_PER_MODEL).
+    job = jobs.submit(model_names, arguments)
+
+    return redirect(url_for('job_result', job_id=job.id), code=303)
+
+
+def run_job(job: Job, progress) -> dict:
+    """
+    Transcribe the video of a job.
+
+    Returns:
+        The context to render the result page with.
+    """
+    arguments = job.arguments
+    media_hash = arguments.get('media_hash')
+
     start = time.time()
 
-    subtitle_files = process(arguments)
+    if int(arguments['--workers']) > 1:
+        # Every worker process loads its own copy of the model.
+        subtitle_files = process(arguments, progress=progress, media_hash=media_hash,
+                                 hooks=metrics)
+    else:
+        scorer_path = Path(arguments['--scorer'])
+
+        with ExitStack() as stack:
+            # Always lease in the same order, so that two jobs waiting for
+            # each other's models can not deadlock.
+            transcribers = {
+                model_path: stack.enter_context(models.lease(model_path, scorer_path))
+                for model_path in sorted(Path(model) for model in arguments['--model'])
+            }
+            subtitle_files = process(arguments, progress=progress, media_hash=media_hash,
+                                     transcribers=transcribers, hooks=metrics)
 
     end = time.time()
-    duration = (end - start)
 
-    context = {
-        "video": downloadable(submission.video_path),
-        "model": submission.model['name'],
-        "duration": f"{duration: .4}"
+    return result_context(arguments, job.model, subtitle_files, end - start)
+
+
+def result_context(arguments: dict, model_name: str, subtitle_files, duration: float) -> dict:
+    """
+    Assemble the context to render the result page with.
+
+    The subtitles are grouped by model (`tracks`); if the video was
+    transcribed with multiple models, `timings` holds the time each of them
+    took (None if its subtitles were cached).
+    """
+    video = Path(arguments['<video_file>'])
+    model_paths = [Path(model) for model in listify(arguments['--model'])]
+
+    context: Dict = {
+        "video": downloadable(video),
+        "model": model_name,
+        "workers": arguments['--workers'],
+        "duration": f"{duration: .4}",
+        "tracks": [],
+        "timings": None
     }
 
     # Assemble the context to deliver the subtitles
+    tracks: Dict = {}
     for subtitles, subtitle_file in subtitle_files:
-        if not subtitles.format in context:
-            context[subtitles.format] = defaultdict(str)
-
-        context[subtitles.format][subtitles.language_code] = downloadable(
+        track = tracks.setdefault(subtitles.model, {"model": subtitles.model})
+        track.setdefault(subtitles.format, {})[subtitles.language_code] = downloadable(
             subtitle_file)
 
-    return render_template("result.html", **context)
+    labels = model_labels(model_paths) if len(model_paths) > 1 else {model_paths[0]: None}
+    context["tracks"] = [tracks[labels[model_path]] for model_path in model_paths]
+
+    report = Path(arguments['--output']) / f"{video.name}.timings.json"
+    if len(model_paths) > 1 and report.is_file():
+        context["timings"] = json.loads(report.read_text(encoding="utf-8"))
+
+    return context
+
+
+def prune_uploads():
+    """
+    Keep the UPLOAD_FOLDER within its age and size limits.
+
+    The videos of jobs that are not done yet are kept.
+    """
+    pending = [job.arguments['<video_file>'] for job in jobs.pending()]
+
+    prune(UPLOAD_FOLDER, max_age=UPLOAD_DAYS * 24 * 60 * 60,
+          max_size=UPLOAD_QUOTA * 1024 * 1024, keep=pending)
+
+
+jobs = JobQueue(
+    JOBS_DATABASE, run_job, workers=JOB_WORKERS, jobs_per_model=JOBS_PER_MODEL
+)
+jobs.start()
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id: str):
+    """
+    Return the status and progress of a job, e.g.:
+
+        {
+            "id": "3f2a...",
+            "status": "running",
+            "progress": {"done": 12, "total": 90},
+            ...
+        }
+
+    The total is null if not known (yet).
+    """
+    job = jobs.get(job_id)
+
+    if job is None:
+        return {"errors": ["Unknown job."]}, 404
+
+    status = job.as_dict()
+    status['result'] = url_for('job_result', job_id=job.id)
+
+    return status
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id: str):
+    """
+    Show the subtitles of a job, or its progress while it's still running.
+    """
+    job = jobs.get(job_id)
+
+    if job is None:
+        return index(errors=["Unknown job."]), 404
+
+    if job.status == DONE and job.result is not None:
+        return render_template("result.html", **job.result)
+
+    return render_template("job.html", job=job.as_dict(),
+                           status_url=url_for('job_status', job_id=job.id))
+
+
+@app.route("/live", methods=["POST"])
+def live_start():
+    """
+    Start a live transcription.
+
+    Expects the model to use in the form field `model`. Returns the id of the
+    live session, which the audio is then sent to.
+    """
+    available_models = list_models(MODELS_PATH, runtime())
+    val = validate_model(request.form.get('model'), available_models)
+
+    if isinstance(val, Invalid):
+        return {"errors": val.value}, 400
+
+    expire_live_sessions()
+
+    model = (val.value['path'], DEFAULT_LANGUAGE_MODEL)
+    with models.lease(*model) as transcriber:
+        session = LiveSession(transcriber.live(), model)
+
+    session_id = uuid.uuid4().hex
+
+    with live_sessions_lock:
+        full = len(live_sessions) >= MAX_LIVE_SESSIONS
+        if not full:
+            live_sessions[session_id] = session
+
+    if full:
+        close_live_session(session)
+        return {"errors": ["Too many live transcriptions, please try again later."]}, 503
+
+    return {"id": session_id}, 201
+
+
+@app.route("/live/<session_id>", methods=["POST"])
+def live_feed(session_id: str):
+    """
+    Feed the next chunk of audio to a live transcription.
+
+    The request body contains raw 16 kHz, 16-bit mono PCM (s16le). The
+    response contains the cues of all utterances that ended in this chunk
+    and the interim transcript of the current utterance, e.g.:
+
+        {
+            "final": [{"start": 0, "end": 2310, "text": "good morning"}],
+            "interim": {"start": 2800, "end": 3400, "text": "today we"}
+        }
+
+    Times are in ms from the start of the live session.
+    """
+    expire_live_sessions()
+
+    with live_sessions_lock:
+        session = live_sessions.get(session_id)
+
+    if session is None:
+        return {"errors": ["Unknown live session."]}, 404
+
+    chunk = request.get_data()
+    if len(chunk) % 2 != 0:
+        return {"errors": ["Audio must consist of 16-bit samples."]}, 400
+
+    with session.lock, models.locked(*session.model):
+        if session.transcription.stream is None:
+            # The session expired in the meantime.
+            return {"errors": ["Unknown live session."]}, 404
+
+        session.last_used = time.monotonic()
+        cues = session.transcription.feed(chunk)
+        interim = session.transcription.interim()
+
+    return {
+        "final": [cue.as_dict() for cue in cues],
+        "interim": interim.as_dict()
+    }
+
+
+@app.route("/live/<session_id>", methods=["DELETE"])
+def live_finish(session_id: str):
+    """
+    End a live transcription and return the cue of the last utterance.
+    """
+    with live_sessions_lock:
+        session = live_sessions.pop(session_id, None)
+
+    if session is None:
+        return {"errors": ["Unknown live session."]}, 404
+
+    with session.lock, models.locked(*session.model):
+        if session.transcription.stream is None:
+            return {"errors": ["Unknown live session."]}, 404
+
+        cues = session.transcription.finish()
+
+    return {"final": [cue.as_dict() for cue in cues]}
+
+
+def expire_live_sessions():
+    """
+    Discard live sessions that have not received audio for a while, e.g.
+    because the browser was closed.
+    """
+    deadline = time.monotonic() - LIVE_SESSION_IDLE_SECONDS
+
+    with live_sessions_lock:
+        expired = [
+            session_id for session_id, session in live_sessions.items()
+            if session.last_used < deadline
+        ]
+        sessions = [live_sessions.pop(session_id) for session_id in expired]
+
+    for session in sessions:
+        close_live_session(session)
+
+
+def close_live_session(session: LiveSession):
+    """
+    Free the model's stream of a live session.
+    """
+    with session.lock, models.locked(*session.model):
+        session.transcription.close()
 
 
 @app.route("/sysinfo")
@@ -183,7 +612,15 @@ def sysinfo():
     """
     Display some information about the system.
     """
-    return render_template("info.html", runtime=RUNTIME)
+    return render_template("info.html", runtime=runtime())
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Export the pipelines' metrics in Prometheus' text format.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route('/uploads/<path:filename>', methods=['GET', 'POST'])
@@ -195,5 +632,26 @@ def download(filename: str):
     return send_from_directory(directory=directory, path=filename)
 
 
+def preload_models():
+    """
+    Load the models configured in PRELOAD_MODELS into the registry.
+    """
+    available_models = list_models(MODELS_PATH, runtime())
+
+    for name in PRELOAD_MODELS:
+        val = validate_model(name, available_models)
+
+        if isinstance(val, Invalid):
+            print(f"Can not preload model '{name}':", *val.value, file=sys.stderr)
+            continue
+
+        models.preload([(val.value['path'], DEFAULT_LANGUAGE_MODEL)])
+
+
+if PRELOAD_MODELS:
+    # Preload in the background, so the app is able to serve requests right away.
+    threading.Thread(target=preload_models, daemon=True).start()
+
+
 if __name__ == "__main__":
     app.run('0.0.0.0', port=8080)
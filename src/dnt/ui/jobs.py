@@ -0,0 +1,413 @@
+"""
+Run transcriptions in the background.
+
+Transcribing a video takes minutes, far too long to keep an HTTP request
+waiting. Instead, the Web UI submits a job to the JobQueue and returns right
+away; a bounded number of worker threads run the jobs, while the user polls
+the job's status.
+
+The jobs are stored in a SQLite database, so they survive restarts of the app
+and multiple app processes can share the same queue without a broker.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+# Job states.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+@dataclass
+class Job:
+    """
+    A transcription job.
+
+    Attributes:
+        id: Unique id of the job.
+        models: Names of the models the job uses. Jobs are limited per model.
+        arguments: Arguments to run the job with (JSON-serializable).
+        status: One of QUEUED, RUNNING, DONE or FAILED.
+        done: Number of segments transcribed so far.
+        total: Total number of segments, None if not known (yet).
+        result: The job's result, once it is DONE.
+        error: Why the job FAILED.
+        created, started, finished: Timestamps (seconds since the epoch).
+
+    """
+    id: str
+    models: List[str]
+    arguments: dict
+    status: str = QUEUED
+    done: int = 0
+    total: Optional[int] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def model(self) -> str:
+        """
+        The names of the job's models, e.g. to show them to the user.
+        """
+        return ", ".join(self.models)
+
+    def as_dict(self) -> dict:
+        """
+        Returns the job's status, e.g. to serve it as JSON.
+        """
+        return {
+            'id': self.id,
+            'model': self.model,
+            'status': self.status,
+            'progress': {'done': self.done, 'total': self.total},
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """
+    Queue of jobs, run by a pool of worker threads.
+
+    At most `workers` jobs run at the same time, and at most `jobs_per_model`
+    of them use the same model; a job using several models counts towards the
+    limit of each. Jobs are started in the order they were submitted, unless
+    one of their models is at its limit; then, jobs for other models go first.
+
+    Multiple processes (e.g., app replicas) can share a database: A job is
+    only run by the process that claimed it (its owner), which regularly
+    sends heartbeats while the job is running. The jobs of a process that
+    stopped sending heartbeats, e.g. because it crashed, are run again by
+    the others. Note that the limits apply per process, though.
+
+    Example:
+        >>> def run(job, progress):
+        ...     progress(1, 1)
+        ...     return {'answer': 42}
+        >>> jobs = JobQueue(Path("jobs.db"), run, workers=2)
+        >>> jobs.start()
+        >>> job = jobs.submit("some-model", {'video': 'lecture.mp4'})
+        >>> jobs.get(job.id).status  # Poll until 'done' (or 'failed').
+        'running'
+
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        run: Callable,
+        workers: int = 2,
+        jobs_per_model: int = 1,
+        poll_interval: float = 1.0,
+        heartbeat_interval: float = 10.0,
+        heartbeat_timeout: float = 60.0,
+        owner: Optional[str] = None
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            path: Location of the SQLite database (created if missing).
+            run: Runs a job. Called with the Job and a progress callback,
+                which takes the number of segments done and the total number
+                of segments (None if unknown). Returns the job's result
+                (JSON-serializable); raises an exception if the job failed.
+            workers: Maximum number of jobs running at the same time.
+            jobs_per_model: Maximum number of running jobs per model.
+            poll_interval: How often idle workers check for jobs submitted
+                by other processes (in seconds).
+            heartbeat_interval: How often to send heartbeats for the
+                running jobs (in seconds).
+            heartbeat_timeout: After how many seconds without a heartbeat
+                a running job is considered abandoned and queued again.
+            owner: Identifies this process among those sharing the
+                database. Defaults to host:pid.
+
+        """
+        self.run = run
+        self.workers = workers
+        self.jobs_per_model = jobs_per_model
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+        # Guards the connection and the running jobs; notified whenever a
+        # job might have become runnable.
+        self.condition = threading.Condition()
+        self.running: Dict[str, int] = defaultdict(int)
+        self.threads: List[threading.Thread] = []
+        self.stopped = False
+
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    arguments TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    done INTEGER NOT NULL,
+                    total INTEGER,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    owner TEXT,
+                    heartbeat REAL,
+                    models TEXT
+                )
+            """)
+            # Databases created by older versions lack some columns.
+            columns = {row['name'] for row in self.db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (('owner', 'TEXT'), ('heartbeat', 'REAL'), ('models', 'TEXT')):
+                if column not in columns:
+                    self.db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)"
+            )
+
+    def start(self):
+        """
+        Start the worker threads.
+
+        Jobs that were running when the app stopped are run again, i.e. the
+        jobs this process claimed before it was restarted and those abandoned
+        by other processes. The jobs running in other processes are not.
+        """
+        with self.condition:
+            self.requeue(owned=True)
+
+        for target in [self.work] * self.workers + [self.beat]:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """
+        Stop the worker threads once they finished their current job.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join()
+
+        self.threads = []
+
+    def submit(self, models: Union[str, List[str]], arguments: dict) -> Job:
+        """
+        Add a job to the queue.
+
+        Args:
+            models: Name of the model the job uses, or the names of all of
+                them.
+            arguments: Arguments to run the job with (JSON-serializable).
+
+        """
+        models = [models] if isinstance(models, str) else list(models)
+        job = Job(uuid.uuid4().hex, models, arguments, created=time.time())
+
+        with self.condition:
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO jobs (id, model, models, arguments, status, done, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job.id, job.model, json.dumps(job.models), json.dumps(job.arguments),
+                     job.status, job.done, job.created)
+                )
+            self.condition.notify_all()
+
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Returns the job with given id, or None if there is no such job.
+        """
+        with self.condition:
+            row = self.db.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        return as_job(row) if row is not None else None
+
+    def pending(self) -> List[Job]:
+        """
+        Returns the jobs that are queued or running.
+        """
+        with self.condition:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created",
+                (QUEUED, RUNNING)
+            ).fetchall()
+
+        return [as_job(row) for row in rows]
+
+    def work(self):
+        """
+        Run jobs until the queue is stopped.
+        """
+        while True:
+            with self.condition:
+                job = self.claim()
+                while job is None and not self.stopped:
+                    self.condition.wait(self.poll_interval)
+                    job = self.claim()
+
+                if job is None:
+                    return
+
+                for model in set(job.models):
+                    self.running[model] += 1
+
+            try:
+                result = self.run(job, partial(self.progress, job.id))
+            except Exception as e:
+                self.finish(job.id, FAILED, error=str(e) or type(e).__name__)
+            else:
+                self.finish(job.id, DONE, result=result)
+            finally:
+                with self.condition:
+                    for model in set(job.models):
+                        self.running[model] -= 1
+                    self.condition.notify_all()
+
+    def claim(self) -> Optional[Job]:
+        """
+        Mark the oldest job whose models are all below their limit as running.
+
+        Must be called while holding the condition's lock.
+        """
+        if self.stopped:
+            return None
+
+        rows = self.db.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created", (QUEUED,)
+        ).fetchall()
+
+        for row in rows:
+            job = as_job(row)
+            if any(self.running[model] >= self.jobs_per_model for model in job.models):
+                continue
+
+            started = time.time()
+            with self.db:
+                # Another process might have claimed the job in the meantime.
+                claimed = self.db.execute(
+                    "UPDATE jobs SET status = ?, started = ?, owner = ?, heartbeat = ?"
+                    " WHERE id = ? AND status = ?",
+                    (RUNNING, started, self.owner, started, row['id'], QUEUED)
+                ).rowcount
+
+            if claimed:
+                job.status, job.started = RUNNING, started
+                return job
+
+        return None
+
+    def beat(self):
+        """
+        Send heartbeats for the running jobs of this process, and queue
+        abandoned jobs again, until the queue is stopped.
+        """
+        with self.condition:
+            while not self.stopped:
+                with self.db:
+                    self.db.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE status = ? AND owner = ?",
+                        (time.time(), RUNNING, self.owner)
+                    )
+
+                if self.requeue():
+                    self.condition.notify_all()
+
+                self.condition.wait_for(lambda: self.stopped, self.heartbeat_interval)
+
+    def requeue(self, owned: bool = False) -> int:
+        """
+        Queue the running jobs again whose owner stopped sending heartbeats.
+
+        Must be called while holding the condition's lock.
+
+        Args:
+            owned: Whether to queue the running jobs of this process again
+                as well, i.e. when it (re)starts.
+
+        Returns:
+            The number of jobs queued again.
+
+        """
+        with self.db:
+            return self.db.execute(
+                "UPDATE jobs SET status = ?, done = 0, started = NULL, owner = NULL,"
+                " heartbeat = NULL WHERE status = ? AND (owner = ? OR IFNULL(heartbeat, 0) < ?)",
+                (QUEUED, RUNNING, self.owner if owned else None,
+                 time.time() - self.heartbeat_timeout)
+            ).rowcount
+
+    def progress(self, job_id: str, done: int, total: Optional[int]):
+        """
+        Record the progress of a running job.
+        """
+        with self.condition, self.db:
+            self.db.execute(
+                "UPDATE jobs SET done = ?, total = ? WHERE id = ? AND owner = ?",
+                (done, total, job_id, self.owner)
+            )
+
+    def finish(self, job_id: str, status: str, result=None, error=None):
+        # If the job has been queued again (i.e. this process missed its
+        # heartbeats), it now belongs to another process.
+        with self.condition, self.db:
+            self.db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?"
+                " WHERE id = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None,
+                 error, time.time(), job_id, self.owner)
+            )
+
+    def close(self):
+        """
+        Stop the workers and close the database.
+        """
+        self.stop()
+        self.db.close()
+
+
+def as_job(row: sqlite3.Row) -> Job:
+    """
+    Convert a row of the jobs table into a Job.
+    """
+    return Job(
+        id=row['id'],
+        # Jobs submitted by older versions only have a single model.
+        models=json.loads(row['models']) if row['models'] else [row['model']],
+        arguments=json.loads(row['arguments']),
+        status=row['status'],
+        done=row['done'],
+        total=row['total'],
+        result=json.loads(row['result']) if row['result'] else None,
+        error=row['error'],
+        created=row['created'],
+        started=row['started'],
+        finished=row['finished'],
+    )
@@ -2,10 +2,13 @@
 This module contains common helpers and utils that are (encouraged to be) used
 throughout the project.
 """
+import importlib.util
+import json
+import queue
+import threading
+from importlib import metadata
 from pathlib import Path
-from typing import Any, List, Literal
-
-import deepspeech
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Set
 
 
 def first(iterable, default=None) -> Any:
@@ -27,6 +30,69 @@ def lines(fname: Path) -> List[str]:
     return fname.read_text(encoding="utf-8").splitlines()
 
 
+class LineIndex:
+    """
+    Random access to the lines of a (large) text file without reading it.
+
+    The file is memory-mapped and the offsets of its lines are indexed once
+    (a single vectorized scan for newlines). Accessing a line then only
+    decodes that line; the OS pages in the parts of the file that are used.
+    Lines end at newlines (a trailing carriage return is removed), like
+    lines() for text files with Unix or Windows line endings.
+
+    Example:
+        >>> transcripts = LineIndex(Path("segments.en"))
+        >>> len(transcripts), transcripts[42]
+        >>> for transcript in transcripts:
+        ...     print(transcript)
+
+    """
+
+    def __init__(self, fname: Path, encoding: str = "utf-8"):
+        # Imported here, as importing numpy slows down the CLI's startup.
+        import mmap
+
+        import numpy as np
+
+        self.fname = fname
+        self.encoding = encoding
+
+        with open(fname, 'rb') as fd:
+            size = fd.seek(0, 2)
+            # Empty files can not be mapped.
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        newlines = np.flatnonzero(np.frombuffer(self._map, dtype=np.uint8) == ord('\n'))
+
+        # Line i spans [starts[i], ends[i]); a last line without a newline
+        # counts as well.
+        ends = newlines
+        if size and (len(newlines) == 0 or newlines[-1] != size - 1):
+            ends = np.append(newlines, size)
+
+        self._starts = np.concatenate(([0], newlines[:len(ends) - 1] + 1)).astype(np.int64)
+        self._ends = ends.astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"{self.fname} has no line {index}.")
+
+        line = self._map[self._starts[index]:self._ends[index]]
+        return line.rstrip(b'\r').decode(self.encoding)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[index] for index in range(len(self)))
+
+    def close(self):
+        if not isinstance(self._map, bytes):
+            self._map.close()
+
+
 def list_models(models_path: Path, supported_format: str):
     """
     Return a list of available models.
@@ -76,19 +142,35 @@ def list_models(models_path: Path, supported_format: str):
 Runtime = Literal['pbmm', 'tflite']
 
 
-def detect_runtime(models_dir: Path) -> Runtime:
+# Distribution names of the deepspeech packages and the runtime they provide.
+RUNTIME_PACKAGES: Dict[str, Runtime] = {
+    'deepspeech': 'pbmm',
+    'deepspeech-gpu': 'pbmm',
+    'deepspeech-tflite': 'tflite',
+}
+
+
+def detect_runtime(models_dir: Path, cache_file: Optional[Path] = None) -> Runtime:
     """
     Detect installed deepspeech runtime.
 
     Availability depends on the runtime, i.e. deepspeech (pbmm) or deepspeech-tflite
-    Unfortunately, there is no straightforward way to tell which version is installed
-    as both names install the same package. However, we can find out by try and error.
+    Unfortunately, both distributions install the same `deepspeech` package.
+    Usually, the installed distribution's metadata tells them apart, which is
+    cheap. Only if that's ambiguous (e.g., both are installed), we find out by
+    trial and error, i.e. by loading a pbmm model. As that takes seconds, the
+    result is cached on disk until the deepspeech package changes.
 
     Args:
         models_dir: Base directory that contains the DeepSpeech models.
+        cache_file: Where to cache the probed runtime. Defaults to a file in
+            `models_dir`.
+
+    Raises:
+        RuntimeError, if deepspeech is not installed.
 
     Note:
-        When runtime is deepspeech-tflite, this method causes DeepSpeech to print an
+        When runtime is deepspeech-tflite, probing causes DeepSpeech to print an
         Error: "ERROR: Model provided has model identifier '^←6╝', should be 'TFL3'".
         This error can be ignored.
 
@@ -96,6 +178,53 @@ def detect_runtime(models_dir: Path) -> Runtime:
         A string that identifies the installed runtime.
 
     """
+    spec = importlib.util.find_spec('deepspeech')
+    if spec is None or spec.origin is None:
+        raise RuntimeError("DeepSpeech is not installed.")
+
+    runtimes: Set[Runtime] = set()
+    for package, runtime in RUNTIME_PACKAGES.items():
+        try:
+            metadata.distribution(package)
+            runtimes.add(runtime)
+        except metadata.PackageNotFoundError:
+            pass
+
+    if len(runtimes) == 1:
+        return runtimes.pop()
+
+    # The cache is only valid for the currently installed deepspeech package.
+    origin = Path(spec.origin)
+    installation = f"{origin}:{origin.stat().st_mtime_ns}"
+    cache_file = cache_file or models_dir / '.deepspeech-runtime.json'
+
+    try:
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+        if cached['installation'] == installation:
+            return cached['runtime']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    runtime = probe_runtime(models_dir)
+
+    try:
+        cache_file.write_text(
+            json.dumps({'installation': installation, 'runtime': runtime}),
+            encoding="utf-8"
+        )
+    except OSError:
+        # Caching is an optimization only, e.g. models_dir may be read-only.
+        pass
+
+    return runtime
+
+
+def probe_runtime(models_dir: Path) -> Runtime:
+    """
+    Detect the installed deepspeech runtime by loading a pbmm model.
+    """
+    import deepspeech
+
     some_pbmm_file = first(models_dir.glob("**/*.pbmm"))
 
     try:
@@ -110,3 +239,142 @@ def listify(obj):
     Ensure that `obj` is a list.
     """
     return [obj] if not isinstance(obj, list) else obj
+
+
+def buffered(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Iterate over `iterable` in a background thread.
+
+    The background thread keeps producing items while the caller processes
+    the previous ones, but never runs more than `maxsize` items ahead. Chaining
+    buffered() iterators turns a sequence of generators into a pipeline whose
+    stages run concurrently with bounded memory.
+
+    Exceptions raised while producing an item are re-raised in the caller.
+
+    Example:
+        >>> squares = buffered((x * x for x in range(3)), maxsize=2)
+        >>> list(squares)
+        [0, 1, 4]
+
+    """
+    items: queue.Queue = queue.Queue(maxsize)
+    stopped = threading.Event()
+    # Markers to tell the caller why the producer stopped.
+    end, error = object(), object()
+
+    def put(item) -> bool:
+        # Block until there is room in the buffer, but give up when the
+        # caller stopped iterating. Otherwise, the thread would hang forever.
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    return
+        except BaseException as e:
+            put((error, e))
+        else:
+            put((end, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            marker, item = items.get()
+            if marker is end:
+                return
+            if marker is error:
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
+class _Receiver:
+    """
+    The items of broadcast() for one consumer.
+    """
+    # Markers to tell the consumer why the producer stopped.
+    end, error = object(), object()
+
+    def __init__(self, maxsize: int):
+        self.items: queue.Queue = queue.Queue(maxsize)
+        self.stopped = threading.Event()
+
+    def put(self, item) -> bool:
+        # Like buffered(), give up when the consumer stopped iterating.
+        while not self.stopped.is_set():
+            try:
+                self.items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self) -> '_Receiver':
+        return self
+
+    def __next__(self):
+        if self.stopped.is_set():
+            raise StopIteration
+
+        marker, item = self.items.get()
+        if marker is self.end:
+            self.close()
+            raise StopIteration
+        if marker is self.error:
+            self.close()
+            raise item
+        return item
+
+    def close(self):
+        """
+        Stop receiving items.
+        """
+        self.stopped.set()
+
+
+def broadcast(iterable: Iterable, consumers: int, maxsize: int) -> List[_Receiver]:
+    """
+    Iterate over `iterable` once, in a background thread, and hand each item
+    to several consumers, e.g. threads that process the same items.
+
+    Like buffered(), the background thread never runs more than `maxsize`
+    items ahead of any consumer. Exceptions raised while producing an item are
+    re-raised in every consumer. A consumer that stops iterating early must
+    close() its iterator; otherwise, the others wait for it.
+
+    Example:
+        >>> first, second = broadcast((x * x for x in range(3)), consumers=2, maxsize=4)
+        >>> list(first), list(second)
+        ([0, 1, 4], [0, 1, 4])
+
+    """
+    receivers = [_Receiver(maxsize) for _ in range(consumers)]
+
+    def produce():
+        try:
+            for item in iterable:
+                delivered = [receiver.put((None, item)) for receiver in receivers]
+                if not any(delivered):
+                    return
+        except BaseException as e:
+            for receiver in receivers:
+                receiver.put((_Receiver.error, e))
+        else:
+            for receiver in receivers:
+                receiver.put((_Receiver.end, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    return receivers
@@ -0,0 +1,137 @@
+"""
+Tests transcribing many videos, with stand-ins for ffmpeg and the models.
+"""
+import json
+import os
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+from docopt import docopt
+
+from dnt import cli
+from dnt.batch import find_videos, is_up_to_date
+
+
+def test_find_videos(tmp_path):
+    lectures = tmp_path / "lectures"
+    lectures.mkdir()
+    for name in ("02.mp4", "01.mp4", "notes.txt"):
+        (lectures / name).write_bytes(b"")
+
+    (tmp_path / "extra").mkdir()
+    (tmp_path / "extra" / "03.mkv").write_bytes(b"")
+
+    manifest = tmp_path / "nightly.txt"
+    manifest.write_text("# Re-run\nlectures/01.mp4\n\nextra/03.mkv\n", encoding="utf-8")
+
+    videos = find_videos([str(lectures), str(tmp_path / "*" / "*.mkv"), str(manifest)])
+
+    assert videos == [
+        lectures / "01.mp4",
+        lectures / "02.mp4",
+        tmp_path / "extra" / "03.mkv",
+    ]
+
+    # Explicitly given videos are kept, even if they do not exist.
+    assert find_videos([str(tmp_path / "missing.mp4")]) == [tmp_path / "missing.mp4"]
+
+
+def test_is_up_to_date(tmp_path):
+    video, model = tmp_path / "lecture.mp4", tmp_path / "model.tflite"
+    outputs = [tmp_path / "lecture.mp4.de.vtt", tmp_path / "lecture.mp4.en.vtt"]
+
+    for path in (video, model, *outputs):
+        path.write_bytes(b"")
+        os.utime(path, (1000, 1000))
+
+    assert is_up_to_date(outputs, [video, model])
+
+    # The model has been re-trained.
+    os.utime(model, (2000, 2000))
+    assert not is_up_to_date(outputs, [video, model])
+
+    os.utime(outputs[0], (3000, 3000))
+    assert not is_up_to_date(outputs, [video, model])
+
+    outputs[1].unlink()
+    assert not is_up_to_date(outputs, [video, model])
+
+
+class FakeTranscriber:
+    """
+    "Transcribes" a segment into the model's name. Counts the loaded models.
+    """
+    loaded = 0
+
+    def __init__(self, model_path, scorer_path):
+        FakeTranscriber.loaded += 1
+        self.name = model_path.parent.name
+
+    def transcribe(self, segment):
+        return f"{self.name} at {segment.start}"
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """
+    Fixture "decoding" every video into 25 seconds of silence, except for
+    videos named broken.mp4.
+    """
+    decoded = []
+
+    def extract_audio(video, outfile):
+        if video.name == "broken.mp4":
+            raise RuntimeError("Damaged video")
+
+        decoded.append(video.name)
+        with wave.open(str(outfile), 'wb') as fd:
+            fd.setnchannels(1)
+            fd.setsampwidth(2)
+            fd.setframerate(16_000)
+            fd.writeframes(np.zeros(25 * 16_000, dtype=np.int16).tobytes())
+
+    monkeypatch.setattr("dnt.preprocessing.extract_audio", extract_audio)
+    monkeypatch.delenv("DEEPL_API_KEY", raising=False)
+    FakeTranscriber.loaded = 0
+    return decoded
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_process_batch(tmp_path, decoded, workers):
+    model, scorer = tmp_path / "models" / "fine-tuned" / "model.tflite", tmp_path / "lm.scorer"
+    model.parent.mkdir(parents=True)
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    for path in (model, scorer, *(videos / f"{name}.mp4" for name in ("a", "b", "c", "broken"))):
+        path.write_bytes(path.name.encode())
+
+    report_file = tmp_path / "report.json"
+    arguments = docopt(cli.__doc__, [
+        "process-batch", str(videos), f"--model={model}", f"--scorer={scorer}",
+        f"--output={tmp_path}", f"--workers={workers}", "--jobs=2", f"--report={report_file}"
+    ])
+
+    with pytest.raises(SystemExit):
+        cli.process_batch(arguments, transcriber_factory=FakeTranscriber)
+
+    report = json.loads(report_file.read_text(encoding="utf-8"))
+    statuses = {Path(entry['video']).name: entry['status'] for entry in report['files']}
+
+    assert statuses == {"a.mp4": "done", "b.mp4": "done", "broken.mp4": "failed", "c.mp4": "done"}
+    assert "Damaged video" in report['files'][2]['error']
+    assert sorted(decoded) == ["a.mp4", "b.mp4", "c.mp4"]
+    assert "fine-tuned at 10000" in (tmp_path / "a.mp4.en.vtt").read_text(encoding="utf-8")
+    if workers == "1":
+        # The model is loaded once for all videos.
+        assert FakeTranscriber.loaded == 1
+
+    # Up-to-date videos are skipped.
+    (videos / "broken.mp4").unlink()
+    decoded.clear()
+    cli.process_batch(arguments, transcriber_factory=FakeTranscriber)
+
+    report = json.loads(report_file.read_text(encoding="utf-8"))
+    assert (report['done'], report['skipped'], report['failed']) == (0, 3, 0)
+    assert decoded == []
@@ -0,0 +1,149 @@
+"""
+Tests the content-addressed result and audio caches.
+"""
+import io
+import os
+import subprocess
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from dnt.cache import (AudioCache, ResultCache, hash_file, prune, result_key,
+                       save_and_hash)
+from dnt.preprocessing import IntervalSegmenter, VadSegmenter
+from dnt.subtitles import Subtitles
+from dnt.translation import NopTranslator
+
+
+@pytest.fixture
+def model(tmp_path):
+    model, scorer = tmp_path / "model.tflite", tmp_path / "lm.scorer"
+    model.write_bytes(b"model")
+    scorer.write_bytes(b"scorer")
+    return model, scorer
+
+
+def test_save_and_hash(tmp_path):
+    content = os.urandom(3 * 1024 * 1024 + 17)
+    path = tmp_path / "video.mp4"
+
+    digest = save_and_hash(io.BytesIO(content), path)
+
+    assert path.read_bytes() == content
+    assert digest == hash_file(path)
+
+
+def test_result_key_depends_on_settings(model):
+    key = result_key("abc", *model, NopTranslator(), IntervalSegmenter())
+
+    assert key == result_key("abc", *model, NopTranslator(), IntervalSegmenter())
+    assert key != result_key("abd", *model, NopTranslator(), IntervalSegmenter())
+    assert key != result_key("abc", *model, NopTranslator(), IntervalSegmenter(5_000))
+
+    # Replacing the model invalidates its results.
+    model[0].write_bytes(b"fine-tuned model")
+    assert key != result_key("abc", *model, NopTranslator(), IntervalSegmenter())
+
+
+def test_result_key_ignores_state_of_segmenter(model, tmp_path):
+    wavfile = tmp_path / "audio.wav"
+    with wave.open(str(wavfile), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(16_000)
+        fd.writeframes(np.zeros(16_000, dtype=np.int16).tobytes())
+
+    segmenter = VadSegmenter()
+    key = result_key("abc", *model, NopTranslator(), segmenter)
+    segmenter.number_of_segments(wavfile)
+
+    assert key == result_key("abc", *model, NopTranslator(), segmenter)
+    assert key != result_key("abc", *model, NopTranslator(), VadSegmenter(max_length=10_000))
+
+
+def test_result_cache(tmp_path):
+    cache = ResultCache(tmp_path / "results")
+    subtitles = [Subtitles('vtt', 'en', "WEBVTT\n"), Subtitles('srt', 'de', "1\n")]
+
+    assert cache.get("key") is None
+    cache.put("key", subtitles)
+
+    assert cache.get("key") == subtitles
+    assert ResultCache(tmp_path / "results").get("key") == subtitles
+
+
+def age(path, seconds):
+    """
+    Pretend `path` was last modified `seconds` ago.
+    """
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_prune(tmp_path):
+    for name, seconds in [("old", 300), ("older", 400), ("kept", 500),
+                          ("new", 10), ("newer", 5)]:
+        (tmp_path / name).write_bytes(b"x" * 100)
+        age(tmp_path / name, seconds)
+
+    deleted = prune(tmp_path, max_age=200, keep=[tmp_path / "kept"])
+
+    assert deleted == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["kept", "new", "newer"]
+
+    # Over quota: Delete the least recently modified files first.
+    prune(tmp_path, max_size=150)
+
+    assert [p.name for p in tmp_path.iterdir()] == ["newer"]
+
+
+def test_audio_cache_decodes_once(tmp_path, monkeypatch):
+    decoded = []
+
+    def extract_audio(video, outfile):
+        decoded.append(video)
+        outfile.write_bytes(b"RIFF")
+
+    monkeypatch.setattr("dnt.preprocessing.extract_audio", extract_audio)
+    cache = AudioCache(tmp_path / "audio")
+
+    first = cache.get("abc", tmp_path / "lecture.mp4")
+    second = cache.get("abc", tmp_path / "renamed-lecture.mp4")
+
+    assert first == second == tmp_path / "audio" / "abc.wav"
+    assert first.read_bytes() == b"RIFF"
+    assert decoded == [tmp_path / "lecture.mp4"]
+    # No partially decoded files are left behind.
+    assert [p.name for p in (tmp_path / "audio").iterdir()] == ["abc.wav"]
+
+
+def test_audio_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr("dnt.preprocessing.extract_audio",
+                        lambda video, outfile: outfile.write_bytes(b"x" * 100))
+    cache = AudioCache(tmp_path / "audio", max_size=250)
+
+    for media_hash in ("a", "b"):
+        cache.get(media_hash, tmp_path / "video.mp4")
+        age(tmp_path / "audio" / f"{media_hash}.wav", 100)
+
+    cache.get("a", tmp_path / "video.mp4")
+    cache.get("c", tmp_path / "video.mp4")
+
+    assert sorted(p.name for p in (tmp_path / "audio").iterdir()) == ["a.wav", "c.wav"]
+
+
+def test_audio_cache_discards_failed_decodes(tmp_path, monkeypatch):
+    def extract_audio(video, outfile):
+        # ffmpeg wrote part of the audio, then failed.
+        outfile.write_bytes(b"RIFF")
+        raise subprocess.CalledProcessError(1, ["ffmpeg"])
+
+    monkeypatch.setattr("dnt.preprocessing.extract_audio", extract_audio)
+    cache = AudioCache(tmp_path / "audio")
+
+    with pytest.raises(RuntimeError):
+        cache.get("abc", tmp_path / "damaged.mp4")
+
+    assert list((tmp_path / "audio").iterdir()) == []
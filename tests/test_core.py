@@ -0,0 +1,165 @@
+"""
+Tests the pipelines with stand-ins for the models, so the tests neither need
+DeepSpeech nor trained models.
+"""
+import wave
+from functools import partial
+
+import numpy as np
+import pytest
+
+from dnt.core import FanOutPipeline, ParallelPipeline, Pipeline
+from dnt.preprocessing import IntervalSegmenter
+from dnt.subtitles import VTT
+from dnt.translation import NopTranslator
+
+
+class FakeTranscriber:
+    """
+    "Transcribes" a segment into its start time and the model's name.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def transcribe(self, segment):
+        return f"{self.name} at {segment.start}"
+
+
+class CountingSegmenter(IntervalSegmenter):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def segment(self, audiofile):
+        self.calls += 1
+        return super().segment(audiofile)
+
+
+@pytest.fixture
+def wavfile(tmp_path):
+    """
+    Fixture providing 25 seconds of silent 16 kHz mono audio.
+    """
+    path = tmp_path / "audio.wav"
+
+    with wave.open(str(path), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(16_000)
+        fd.writeframes(np.zeros(25 * 16_000, dtype=np.int16).tobytes())
+
+    return path
+
+
+def test_fan_out_segments_once(wavfile):
+    segmenter = CountingSegmenter()
+    pipelines = {
+        name: Pipeline(segmenter, FakeTranscriber(name), NopTranslator(), VTT())
+        for name in ("a", "b")
+    }
+    reported = []
+
+    with FanOutPipeline(segmenter, pipelines) as pipeline:
+        result = pipeline.process(wavfile, progress=lambda done, total: reported.append((done, total)))
+
+    assert segmenter.calls == 1
+    assert set(result.subtitles) == {"a", "b"}
+    assert set(result.timings) == {"segmentation", "a", "b"}
+
+    for name, subtitles in result.subtitles.items():
+        english = next(s for s in subtitles if s.language_code == 'en')
+        assert f"{name} at 0\n" in english.content
+        assert f"{name} at 20000\n" in english.content
+
+    # Three segments per model.
+    assert reported[-1] == (6, 6)
+
+
+class RecordingTranscriber(FakeTranscriber):
+    """
+    Records how many segments had been cut when each segment is transcribed.
+    """
+
+    def __init__(self, name, segmenter):
+        super().__init__(name)
+        self.segmenter = segmenter
+        self.cut = []
+
+    def transcribe(self, segment):
+        self.cut.append(self.segmenter.cut)
+        return super().transcribe(segment)
+
+
+class LazySegmenter(IntervalSegmenter):
+
+    def __init__(self, interval):
+        super().__init__(interval)
+        self.cut = 0
+
+    def segment(self, audiofile):
+        for segment in super().segment(audiofile):
+            self.cut += 1
+            yield segment
+
+
+@pytest.mark.parametrize("as_stream", [False, True])
+def test_fan_out_segments_lazily(wavfile, as_stream):
+    # 25 segments of one second each.
+    segmenter = LazySegmenter(interval=1_000)
+    transcribers = {name: RecordingTranscriber(name, segmenter) for name in ("a", "b")}
+    pipelines = {
+        name: Pipeline(segmenter, transcriber, NopTranslator(), VTT())
+        for name, transcriber in transcribers.items()
+    }
+    reported = []
+
+    with open(wavfile, 'rb') as fd, FanOutPipeline(segmenter, pipelines, buffer_size=2) as pipeline:
+        if as_stream:
+            # Skip the WAV header, i.e. stream raw PCM.
+            fd.seek(44)
+        result = pipeline.process(fd if as_stream else wavfile,
+                                  progress=lambda done, total: reported.append((done, total)))
+
+    for name, transcriber in transcribers.items():
+        # The models started before the audio had been segmented.
+        assert len(transcriber.cut) == 25
+        assert transcriber.cut[0] < 25
+        english = next(s for s in result.subtitles[name] if s.language_code == 'en')
+        assert f"{name} at 24000\n" in english.content
+
+    assert reported[-1] == (50, 50)
+    if as_stream:
+        assert (0, None) in reported
+
+
+def test_parallel_pipeline_keeps_order(wavfile):
+    pipeline = ParallelPipeline(IntervalSegmenter(), partial(FakeTranscriber, "p"),
+                                NopTranslator(), VTT(), workers=2)
+
+    with pipeline:
+        subtitles = pipeline.process(wavfile)
+
+    assert pipeline._pool is None
+
+    english = next(s for s in subtitles if s.language_code == 'en')
+    positions = [english.content.index(f"p at {start}\n") for start in (0, 10000, 20000)]
+    assert positions == sorted(positions)
+
+
+def test_parallel_pipeline_bounds_segments_in_flight(wavfile):
+    consumed = []
+
+    def segments():
+        for segment in IntervalSegmenter(interval=1000).segment(wavfile):
+            consumed.append(segment)
+            yield segment
+
+    with ParallelPipeline(IntervalSegmenter(), partial(FakeTranscriber, "p"), NopTranslator(),
+                          VTT(), workers=2, segments_in_flight=3) as pipeline:
+        cues = pipeline.transcribe(segments())
+
+        assert next(cues).text == "p at 0"
+        assert len(consumed) == 3
+        assert [cue.start for cue in cues] == list(range(1000, 25000, 1000))
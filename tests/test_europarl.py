@@ -75,6 +75,25 @@ def test_segments_are_ordered(europarl):
         europarl.get_segments(n=10))
 
 
+def test_get_speeches(europarl):
+    """
+    Grouping the segments by speech must neither lose nor reorder segments,
+    so that each speech only has to be decoded once.
+    """
+    speeches = list(europarl.get_speeches())
+
+    assert len({sample for sample, _ in speeches}) == len(speeches)
+
+    regrouped = sorted(
+        (index, (sample, time_start, time_end, transcript))
+        for sample, segments in speeches
+        for index, time_start, time_end, transcript in segments
+    )
+
+    assert [index for index, _ in regrouped] == list(range(europarl.number_of_segments))
+    assert [segment for _, segment in regrouped] == list(europarl.get_segments())
+
+
 @pytest.mark.parametrize('to_resolve, expected_path', [
     (
         dict(segments="segments.en"),
@@ -118,6 +137,29 @@ def test_get_pairs(europarl):
     assert list(some_pairs) == expected
 
 
+def test_get_all_pairs(europarl):
+    """
+    By default, pairs() returns all pairs.
+    """
+    assert len(list(europarl.pairs())) == europarl.number_of_segments
+    assert list(europarl.pairs(n=0)) == []
+
+
+def test_get_segments_of_sample(europarl):
+    """
+    The segments of a speech are looked up in the index, ordered by start.
+    """
+    segments = europarl.get_segments_of_sample("en.20080924.31.3-243")
+
+    assert segments == sorted(
+        (segment for segment in europarl.segments if segment[0] == "en.20080924.31.3-243"),
+        key=lambda segment: segment[1]
+    )
+    assert segments[0] == ("en.20080924.31.3-243", 0.0, 10.77)
+    assert europarl.get_segments_of_sample("unknown") == []
+    assert europarl.number_of_speeches == len({segment[0] for segment in europarl.segments})
+
+
 @pytest.mark.integration
 def test_split_segment(europarl, tmp_path):
     """
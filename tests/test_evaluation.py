@@ -0,0 +1,74 @@
+"""
+Tests the evaluation of models on the Europarl-ST dataset.
+
+The speeches are not part of the test data, so decoding them is replaced by
+silence, and the model by a stand-in.
+"""
+import random
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from dnt.datasets.europarl import EuroparlST
+from dnt.evaluation import edit_distance, evaluate, score
+
+
+def levenshtein(a, b):
+    """
+    Textbook implementation to compare with.
+    """
+    previous = list(range(len(b) + 1))
+
+    for i, x in enumerate(a, start=1):
+        current = [i]
+        for j, y in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+
+    return previous[-1]
+
+
+def test_edit_distance():
+    rng = random.Random(42)
+
+    for _ in range(500):
+        a = [rng.randrange(4) for _ in range(rng.randrange(12))]
+        b = [rng.randrange(4) for _ in range(rng.randrange(12))]
+
+        assert edit_distance(np.array(a, dtype=np.int64), np.array(b, dtype=np.int64)) == levenshtein(a, b)
+
+
+@pytest.mark.parametrize("reference, hypothesis, wer, cer", [
+    ("the cat sat", "the cat sat", 0.0, 0.0),
+    ("the cat sat", "the cat sat down", 1 / 3, 5 / 11),
+    ("the cat sat", "a cat", 2 / 3, 7 / 11),
+    ("the cat sat", "", 1.0, 1.0),
+])
+def test_score(reference, hypothesis, wer, cer):
+    s = score(reference, hypothesis)
+
+    assert s.wer == pytest.approx(wer)
+    assert s.cer == pytest.approx(cer)
+
+
+class FakeTranscriber:
+
+    def transcribe(self, segment):
+        return "Madam President"
+
+
+def test_evaluate(monkeypatch):
+    monkeypatch.setattr("dnt.evaluation.load_audio", lambda sample: np.zeros(600 * 16_000, dtype=np.int16))
+    europarl = EuroparlST(Path("tests/data/europarlST-v1.1/"), 'en', 'de', 'dev')
+
+    evaluation = evaluate(europarl, FakeTranscriber, n=5)
+
+    assert evaluation.corpus.segments == 5
+    assert [index for index, *_ in evaluation.segments] == list(range(5))
+    assert sum(s.segments for s in evaluation.speeches.values()) == 5
+    # The transcripts are normalized like the references.
+    assert all(hypothesis == "madam president" for _, _, hypothesis, _ in evaluation.segments)
+    assert evaluation.corpus.word_errors == sum(s.word_errors for *_, s in evaluation.segments)
+    assert 0 < evaluation.corpus.wer < 1
+    assert evaluation.throughput['audio_seconds'] == pytest.approx(evaluation.corpus.audio_seconds)
@@ -0,0 +1,187 @@
+"""
+Tests the job queue of the Web UI.
+"""
+import threading
+import time
+
+import pytest
+
+from dnt.ui.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def wait_for(jobs, job_id, *statuses, timeout=5.0):
+    """
+    Poll the job until it's in one of the given states.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f"Job {job_id} is still {job.status}.")
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make_queue(run, **options):
+        jobs = JobQueue(tmp_path / "jobs.db", run, poll_interval=0.01, **options)
+        queues.append(jobs)
+        return jobs
+
+    yield make_queue
+
+    for jobs in queues:
+        jobs.close()
+
+
+def test_job_reports_progress_and_result(make_queue):
+    proceed = threading.Event()
+
+    def run(job, progress):
+        progress(1, 3)
+        proceed.wait()
+        progress(3, 3)
+        return {'video': job.arguments['video']}
+
+    jobs = make_queue(run)
+    jobs.start()
+    job = jobs.submit("model", {'video': 'lecture.mp4'})
+
+    wait_for(jobs, job.id, RUNNING)
+    time.sleep(0.05)
+    assert jobs.get(job.id).as_dict()['progress'] == {'done': 1, 'total': 3}
+
+    proceed.set()
+    job = wait_for(jobs, job.id, DONE)
+
+    assert (job.done, job.total) == (3, 3)
+    assert job.result == {'video': 'lecture.mp4'}
+
+
+def test_failed_job(make_queue):
+    def run(job, progress):
+        raise RuntimeError("ffmpeg failed")
+
+    jobs = make_queue(run)
+    jobs.start()
+    job = jobs.submit("model", {})
+
+    assert wait_for(jobs, job.id, DONE, FAILED).error == "ffmpeg failed"
+
+
+def test_jobs_are_limited_per_model(make_queue):
+    """
+    With one job per model, a second job for a busy model has to wait, while
+    a job for another model starts right away.
+    """
+    proceed = threading.Event()
+    running = []
+
+    def run(job, progress):
+        running.append(job.model)
+        proceed.wait()
+        return {}
+
+    jobs = make_queue(run, workers=3, jobs_per_model=1)
+    jobs.start()
+    first = jobs.submit("a", {})
+    second = jobs.submit("a", {})
+    other = jobs.submit("b", {})
+
+    wait_for(jobs, other.id, RUNNING)
+    assert jobs.get(first.id).status == RUNNING
+    assert jobs.get(second.id).status == QUEUED
+
+    proceed.set()
+    for job in (first, second, other):
+        wait_for(jobs, job.id, DONE)
+
+    assert sorted(running) == ["a", "a", "b"]
+
+
+def test_jobs_with_several_models_are_limited_per_model(make_queue):
+    """
+    A job using two models holds a slot of each, whatever their order.
+    """
+    proceed = threading.Event()
+
+    def run(job, progress):
+        proceed.wait()
+        return {}
+
+    jobs = make_queue(run, workers=4, jobs_per_model=1)
+    jobs.start()
+    both = jobs.submit(["a", "b"], {})
+    reversed_ = jobs.submit(["b", "a"], {})
+    a = jobs.submit("a", {})
+    c = jobs.submit(["c"], {})
+
+    wait_for(jobs, c.id, RUNNING)
+    assert jobs.get(both.id).status == RUNNING
+    assert jobs.get(both.id).as_dict()['model'] == "a, b"
+    assert jobs.get(reversed_.id).status == QUEUED
+    assert jobs.get(a.id).status == QUEUED
+
+    proceed.set()
+    for job in (both, reversed_, a, c):
+        wait_for(jobs, job.id, DONE)
+
+
+def test_jobs_survive_restarts(make_queue):
+    # The first queue is never started, i.e. the app stopped before running
+    # the job, or while running the other one.
+    stopped = make_queue(lambda job, progress: {})
+    job = stopped.submit("model", {})
+    running = stopped.submit("other-model", {})
+    with stopped.condition:
+        assert stopped.claim().id == job.id
+        assert stopped.claim().id == running.id
+
+    jobs = make_queue(lambda job, progress: {'restarted': True})
+    jobs.start()
+
+    assert wait_for(jobs, job.id, DONE).result == {'restarted': True}
+    assert wait_for(jobs, running.id, DONE).result == {'restarted': True}
+
+
+def test_jobs_of_other_processes_are_not_run_again(make_queue):
+    proceed = threading.Event()
+    ran = []
+
+    def run(job, progress):
+        proceed.wait()
+        return {}
+
+    replica = make_queue(run, owner="replica", heartbeat_interval=0.01, heartbeat_timeout=0.5)
+    replica.start()
+    job = replica.submit("model", {})
+    wait_for(replica, job.id, RUNNING)
+
+    # Another replica (re)starts while the job is running.
+    jobs = make_queue(lambda job, progress: ran.append(job.id), owner="other",
+                      heartbeat_interval=0.01, heartbeat_timeout=0.5)
+    jobs.start()
+    time.sleep(1.0)
+
+    assert jobs.get(job.id).status == RUNNING
+    proceed.set()
+    wait_for(jobs, job.id, DONE)
+    assert ran == []
+
+
+def test_abandoned_jobs_are_run_again(make_queue):
+    # The process claimed the job and then crashed, i.e. never sends a
+    # heartbeat.
+    crashed = make_queue(lambda job, progress: {}, owner="crashed")
+    job = crashed.submit("model", {})
+    with crashed.condition:
+        crashed.claim()
+
+    jobs = make_queue(lambda job, progress: {'rescued': True}, owner="other",
+                      heartbeat_interval=0.01, heartbeat_timeout=0.2)
+    jobs.start()
+
+    assert wait_for(jobs, job.id, DONE).result == {'rescued': True}
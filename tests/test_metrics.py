@@ -0,0 +1,126 @@
+"""
+Tests the instrumentation of the pipeline, using stand-ins for the models.
+"""
+import wave
+
+import numpy as np
+import pytest
+
+from dnt.core import Pipeline
+from dnt.metrics import HookChain, Profiler, PrometheusMetrics
+from dnt.preprocessing import IntervalSegmenter
+from dnt.subtitles import SRT, VTT, SubtitleWriter
+from dnt.translation import NopTranslator
+
+
+class FakeTranscriber:
+
+    def transcribe(self, segment):
+        return f"segment at {segment.start}"
+
+
+@pytest.fixture
+def wavfile(tmp_path):
+    """
+    Fixture providing 25 seconds of silent 16 kHz mono audio.
+    """
+    path = tmp_path / "audio.wav"
+
+    with wave.open(str(path), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(16_000)
+        fd.writeframes(np.zeros(25 * 16_000, dtype=np.int16).tobytes())
+
+    return path
+
+
+def test_profiler_reports_stages(wavfile):
+    profiler = Profiler()
+    pipeline = Pipeline(IntervalSegmenter(), FakeTranscriber(), NopTranslator(),
+                        [VTT(), SRT()], hooks=profiler)
+
+    subtitles = pipeline.process(wavfile)
+    report = profiler.report()
+
+    assert report['segments'] == 3
+    assert report['audio_seconds'] == pytest.approx(25.0)
+    assert report['transcription']['real_time_factor'] >= 0
+    assert report['translation']['texts'] == 3
+    assert report['translation']['characters'] == sum(
+        len(f"segment at {start}") for start in (0, 10000, 20000)
+    )
+    assert sorted((s['format'], s['language']) for s in report['subtitles']) == [
+        ('srt', 'de'), ('srt', 'en'), ('vtt', 'de'), ('vtt', 'en')
+    ]
+    assert sum(s['bytes'] for s in report['subtitles']) == sum(
+        len(s.content.encode("utf-8")) for s in subtitles
+    )
+    assert set(report['stages']) == {'segmentation', 'transcription', 'translation', 'compile'}
+
+
+def test_profiler_reports_streamed_runs(wavfile, tmp_path):
+    profiler = Profiler()
+    pipeline = Pipeline(IntervalSegmenter(), FakeTranscriber(), NopTranslator(),
+                        [VTT(), SRT()], hooks=profiler)
+    writers = [
+        SubtitleWriter(subtitle_format, language, tmp_path / f"audio.{language}.{subtitle_format.name}")
+        for language in ('de', 'en') for subtitle_format in pipeline.subtitle_formats
+    ]
+
+    subtitles = pipeline.write_stream(wavfile, writers)
+    report = profiler.report()
+
+    assert report['segments'] == 3
+    assert report['seconds'] > 0
+    assert report['translation']['texts'] == 3
+    assert sorted((s['format'], s['language']) for s in report['subtitles']) == [
+        ('srt', 'de'), ('srt', 'en'), ('vtt', 'de'), ('vtt', 'en')
+    ]
+    assert sum(s['bytes'] for s in report['subtitles']) == sum(
+        len(s.content.encode("utf-8")) for s in subtitles
+    )
+    assert set(report['stages']) == {'segmentation', 'transcription', 'translation', 'compile'}
+    assert report['stages']['compile'] > 0
+
+
+def test_prometheus_metrics(wavfile):
+    metrics, profiler = PrometheusMetrics(), Profiler()
+    pipeline = Pipeline(IntervalSegmenter(), FakeTranscriber(), NopTranslator(),
+                        VTT(), hooks=HookChain([metrics, profiler]))
+
+    pipeline.process(wavfile)
+    pipeline.process(wavfile)
+    # Streamed runs count as well.
+    assert len(list(pipeline.stream(wavfile))) == 3
+
+    lines = metrics.render().splitlines()
+
+    assert "# TYPE dnt_segments_total counter" in lines
+    assert "dnt_segments_total 9" in lines
+    assert "dnt_audio_seconds_total 75" in lines
+    assert "dnt_pipeline_runs_total 3" in lines
+    assert "# TYPE dnt_segment_transcription_seconds histogram" in lines
+    assert 'dnt_segment_transcription_seconds_bucket{le="+Inf"} 9' in lines
+    assert "dnt_segment_transcription_seconds_count 9" in lines
+    assert "dnt_pipeline_seconds_count 3" in lines
+    assert any(line.startswith('dnt_stage_seconds_total{stage="transcription"}') for line in lines)
+    assert any(line.startswith('dnt_subtitle_bytes_total{format="vtt",language="de"}') for line in lines)
+
+    assert profiler.report()['segments'] == 9
+
+
+def test_prometheus_metrics_keep_large_values():
+    metrics = PrometheusMetrics()
+    metrics.subtitle_bytes.inc(1_234_567, format='vtt', language='de')
+    metrics.audio_seconds.inc(1_800_012.25)
+    for _ in range(1_000_001):
+        metrics.segment_seconds.observe(0.5)
+    metrics.run_seconds.observe(1_000_001)
+
+    lines = metrics.render().splitlines()
+
+    assert 'dnt_subtitle_bytes_total{format="vtt",language="de"} 1234567' in lines
+    assert "dnt_audio_seconds_total 1800012.25" in lines
+    assert "dnt_pipeline_seconds_sum 1000001" in lines
+    assert "dnt_segment_transcription_seconds_count 1000001" in lines
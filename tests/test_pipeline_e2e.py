@@ -8,10 +8,12 @@ transcribe some video using the pre-trained models and return the subtitles.
 NOTE: These tests only work with the tflite packages (i.e., deepspeech-tflite).
 The tests will break if you use any other format.
 """
+import time
 from pathlib import Path
 
 import pytest
 
+from dnt.audio import map_wav
 from dnt.core import Pipeline
 from dnt.preprocessing import IntervalSegmenter, extract_audio
 from dnt.transcription import DeepSpeechTranscriber
@@ -55,3 +57,38 @@ def test_pipeline_generates_subtitles(tmp_path):
     # - German (translated) subtitles in SRT format
     # - German (translated) subtitles in VTT format
     assert len(subtitles) == 4
+
+
+@pytest.mark.integration
+def test_live_transcription_in_real_time(tmp_path):
+    """
+    Plays back the sample video's audio in real time (100 ms chunks) and
+    feeds it to a live transcription, which must keep up with the audio.
+    """
+    wavfile = tmp_path / "sample.wav"
+    extract_audio(TEST_VIDEO, wavfile)
+    samples, sample_rate = map_wav(wavfile)
+
+    # 30 seconds are enough to see a few utterances.
+    samples = samples[:30 * sample_rate]
+    chunk_size = sample_rate // 10
+
+    live = DeepSpeechTranscriber(TEST_MODEL_PATH, TEST_SCORER_PATH).live()
+    cues = []
+    start = time.monotonic()
+
+    for index, offset in enumerate(range(0, len(samples), chunk_size)):
+        # Wait until the chunk has been "recorded".
+        time.sleep(max(0, start + (index + 1) * 0.1 - time.monotonic()))
+
+        cues += live.feed(samples[offset:offset + chunk_size])
+        live.interim()
+
+    cues += live.finish()
+    lag = time.monotonic() - (start + len(samples) / sample_rate)
+
+    assert cues
+    assert all(cue.text for cue in cues)
+    assert all(a.end <= b.start for a, b in zip(cues, cues[1:]))
+    # The transcription must not fall behind the recording.
+    assert lag < 1.0
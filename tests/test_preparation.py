@@ -0,0 +1,82 @@
+"""
+Tests preparing the Europarl-ST dataset for training.
+
+The speeches are not part of the test data, so decoding them is replaced by
+silence of the speech's length.
+"""
+import csv
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from dnt.datasets.europarl import EuroparlST
+from dnt.datasets.preparation import prepare_partition
+
+
+@pytest.fixture
+def europarl():
+    return EuroparlST(Path("tests/data/europarlST-v1.1/"), 'en', 'de', 'dev')
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """
+    Fixture recording the decoded speeches.
+    """
+    decoded = []
+
+    def load_audio(sample):
+        decoded.append(sample.name)
+        return np.zeros(600 * 16_000, dtype=np.int16)
+
+    monkeypatch.setattr("dnt.datasets.preparation.load_audio", load_audio)
+    return decoded
+
+
+def read_index(path):
+    with open(path, encoding="utf-8", newline="") as fd:
+        return list(csv.reader(fd))
+
+
+def test_prepare_partition(europarl, decoded, tmp_path):
+    stats = prepare_partition(europarl, tmp_path)
+    index = read_index(tmp_path / "dev.csv")
+
+    assert index[0] == ['wav_filename', 'wav_filesize', 'transcript']
+    assert len(index) - 1 == stats['written'] == 19 - stats['discarded']
+    # Each speech is decoded once.
+    assert len(decoded) == len(set(decoded))
+
+    for wav_filename, wav_filesize, transcript in index[1:]:
+        assert (tmp_path / wav_filename).stat().st_size == int(wav_filesize)
+        assert transcript == transcript.lower()
+
+    # Ordered like the segments in the partition.
+    indices = [int(row[0].rsplit("segment", 1)[1][:-len(".wav")]) for row in index[1:]]
+    assert indices == sorted(indices)
+
+
+def test_prepare_partition_resumes(europarl, decoded, tmp_path):
+    prepare_partition(europarl, tmp_path)
+    expected = read_index(tmp_path / "dev.csv")
+
+    # Pretend the previous run crashed while writing a segment, after writing
+    # the index.
+    damaged = tmp_path / expected[1][0]
+    damaged.write_bytes(damaged.read_bytes()[:100])
+    decoded.clear()
+
+    stats = prepare_partition(europarl, tmp_path)
+
+    assert stats['written'] == 1
+    assert stats['skipped'] == len(expected) - 2
+    assert decoded == [damaged.name.split("-segment")[0]]
+    assert read_index(tmp_path / "dev.csv") == expected
+
+
+def test_prepare_partition_in_parallel(europarl, decoded, tmp_path):
+    prepare_partition(europarl, tmp_path / "serial")
+    prepare_partition(europarl, tmp_path / "parallel", workers=2)
+
+    assert read_index(tmp_path / "parallel" / "dev.csv") == read_index(tmp_path / "serial" / "dev.csv")
@@ -3,9 +3,18 @@ Tests the data pre-processing.
 
 Examples were taken directly from the Europarl-ST dataset.
 """
+import inspect
+import io
+import struct
+import wave
+from pathlib import Path
+
+import numpy as np
 import pytest
 
-from dnt.preprocessing import normalize
+from dnt.audio import map_wav, write_wav
+from dnt.preprocessing import (IntervalSegmenter, Normalizer, VadSegmenter,
+                               normalize, slice_audio)
 
 
 @pytest.mark.parametrize('source, expected', [
@@ -40,3 +49,235 @@ def test_normalize(source, expected):
     The test cases also demonstrate how some special cases are handled.
     """
     assert normalize(source) == expected
+
+
+# Transcripts of the Europarl test data (both languages) and corner cases of
+# the replacements' order and the number expansion.
+TRANSCRIPTS = [
+    line
+    for path in sorted(Path("tests/data/europarlST-v1.1/en/de/dev").glob("s*.[de][en]"))
+    for line in path.read_text(encoding="utf-8").splitlines()
+] + [
+    "In 2009, 12345 people paid EUR 1 000 – or ١2010 – for 3 days",
+    "a - ’ b  - c ‘ x ’ Grüße & Ölpreis",
+    "",
+]
+
+
+def test_normalizer_matches_normalize():
+    expected = [normalize(transcript) for transcript in TRANSCRIPTS]
+
+    assert [Normalizer()(transcript) for transcript in TRANSCRIPTS] == expected
+    assert Normalizer().normalize_many(TRANSCRIPTS, workers=2, chunksize=8) == expected
+    assert Normalizer("abc")("A bcd-e 1") == normalize("A bcd-e 1", "abc")
+
+
+@pytest.fixture
+def wavfile(tmp_path):
+    """
+    Fixture providing 25 seconds of 16 kHz mono audio (a simple ramp).
+    """
+    samples = np.arange(25 * 16_000, dtype=np.int16)
+    path = tmp_path / "audio.wav"
+
+    with wave.open(str(path), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(16_000)
+        fd.writeframes(samples.tobytes())
+
+    return path
+
+
+def test_interval_segmenter(wavfile):
+    """
+    IntervalSegmenter should split the audio into segments of equal length
+    (except for the last one) that know their position in the audio.
+    """
+    segments = IntervalSegmenter(interval=10_000).segment(wavfile)
+
+    # Segments are produced lazily, one after another.
+    assert inspect.isgenerator(segments)
+    segments = list(segments)
+
+    assert [s.start for s in segments] == [0, 10_000, 20_000]
+    assert [s.end for s in segments] == [10_000, 20_000, 25_000]
+
+    # Segments must not lose or duplicate any samples.
+    expected = np.arange(25 * 16_000, dtype=np.int16)
+    assert np.array_equal(np.concatenate([s.samples for s in segments]), expected)
+
+
+def test_map_wav_skips_extra_chunks(tmp_path):
+    """
+    map_wav() should locate the samples behind any additional chunks, like
+    the LIST chunk ffmpeg writes, and map them without copying.
+    """
+    samples = np.arange(1000, dtype=np.int16)
+    info = b'INFOISFT\x0e\x00\x00\x00Lavf58.29.100\x00'
+    fmt = struct.pack('<HHIIHH', 1, 1, 16_000, 32_000, 2, 16)
+    data = samples.tobytes()
+
+    chunks = (
+        b'fmt ' + struct.pack('<I', len(fmt)) + fmt +
+        b'LIST' + struct.pack('<I', len(info)) + info +
+        b'data' + struct.pack('<I', len(data)) + data
+    )
+
+    path = tmp_path / "ffmpeg.wav"
+    path.write_bytes(b'RIFF' + struct.pack('<I', 4 + len(chunks)) + b'WAVE' + chunks)
+
+    mapped, sample_rate = map_wav(path)
+
+    assert sample_rate == 16_000
+    assert isinstance(mapped, np.memmap)
+    assert np.array_equal(mapped, samples)
+
+
+def test_interval_segmenter_consumes_streams():
+    """
+    IntervalSegmenter should also segment raw PCM streams (as produced by
+    decode_audio), yielding the same segments as for WAV files.
+    """
+    samples = np.arange(25 * 16_000, dtype=np.int16)
+    stream = io.BytesIO(samples.tobytes())
+
+    segments = list(IntervalSegmenter(interval=10_000).segment(stream))
+
+    assert [s.start for s in segments] == [0, 10_000, 20_000]
+    assert [s.end for s in segments] == [10_000, 20_000, 25_000]
+    assert np.array_equal(np.concatenate([s.samples for s in segments]), samples)
+
+
+def synthetic_speech(*parts):
+    """
+    Generate audio from (kind, seconds) parts: Quiet noise for silence and
+    loud, amplitude-modulated noise for speech.
+    """
+    rng = np.random.default_rng(42)
+    audio = []
+
+    for kind, seconds in parts:
+        t = np.arange(int(seconds * 16_000)) / 16_000
+        if kind == 'silence':
+            audio.append(rng.normal(0, 30, len(t)))
+        else:
+            envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 0.7 * t)
+            audio.append(rng.normal(0, 3000, len(t)) * envelope)
+
+    return np.concatenate(audio).astype(np.int16)
+
+
+def write_wav(path, samples):
+    with wave.open(str(path), 'wb') as fd:
+        fd.setnchannels(1)
+        fd.setsampwidth(2)
+        fd.setframerate(16_000)
+        fd.writeframes(samples.tobytes())
+
+    return path
+
+
+def test_vad_segmenter_skips_silence(tmp_path):
+    """
+    VadSegmenter should only return segments where there is speech, with
+    their real offsets (allowing for some padding).
+    """
+    samples = synthetic_speech(
+        ('silence', 5), ('speech', 4), ('silence', 3), ('speech', 6), ('silence', 5)
+    )
+    wavfile = write_wav(tmp_path / "speech.wav", samples)
+
+    segments = list(VadSegmenter(padding=200).segment(wavfile))
+
+    assert len(segments) == 2
+    assert segments[0].start == pytest.approx(5_000, abs=250)
+    assert segments[0].end == pytest.approx(9_000, abs=250)
+    assert segments[1].start == pytest.approx(12_000, abs=250)
+    assert segments[1].end == pytest.approx(18_000, abs=250)
+
+
+def test_vad_segmenter_respects_max_length(tmp_path):
+    """
+    Long speech must be cut into segments of at most max_length, no matter
+    whether the audio is read from a file or a stream.
+    """
+    samples = synthetic_speech(('silence', 2), ('speech', 100), ('silence', 2))
+    wavfile = write_wav(tmp_path / "speech.wav", samples)
+
+    segmenter = VadSegmenter(max_length=15_000)
+    segments = list(segmenter.segment(wavfile))
+    streamed = list(segmenter.segment(io.BytesIO(samples.tobytes())))
+
+    assert all(s.duration <= 15_000 for s in segments)
+    assert [(s.start, s.end) for s in segments] == [(s.start, s.end) for s in streamed]
+
+    # Segments are contiguous, as there are no pauses to skip.
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:]))
+    assert segments[0].start < 2_000 < segments[-1].end - 100_000
+
+
+def test_vad_segmenter_keeps_speech_across_windows(tmp_path):
+    """
+    Speech that starts before the end of an analysis window (60 s with the
+    default max_length) and continues after it must not lose its start.
+    """
+    samples = synthetic_speech(('silence', 40), ('speech', 10), ('silence', 30))
+    wavfile = write_wav(tmp_path / "speech.wav", samples)
+
+    segmenter = VadSegmenter()
+    segments = list(segmenter.segment(wavfile))
+    streamed = list(segmenter.segment(io.BytesIO(samples.tobytes())))
+
+    assert [(s.start, s.end) for s in segments] == [(s.start, s.end) for s in streamed]
+    assert segments[0].start == pytest.approx(40_000, abs=250)
+    assert segments[-1].end == pytest.approx(50_000, abs=250)
+
+
+def test_vad_segmenter_analyzes_files_once(tmp_path, monkeypatch):
+    """
+    Counting the segments of a file (for the progress) and segmenting it
+    afterwards must not analyze the audio twice.
+    """
+    samples = synthetic_speech(('silence', 2), ('speech', 100), ('silence', 2))
+    wavfile = write_wav(tmp_path / "speech.wav", samples)
+
+    segmenter = VadSegmenter()
+    expected = [(s.start, s.end) for s in VadSegmenter().segment(wavfile)]
+
+    analyzed = []
+    speech_regions = segmenter.speech_regions
+    monkeypatch.setattr(segmenter, 'speech_regions',
+                        lambda *args: analyzed.append(1) or speech_regions(*args))
+
+    assert segmenter.number_of_segments(wavfile) == len(expected)
+    windows = len(analyzed)
+    assert [(s.start, s.end) for s in segmenter.segment(wavfile)] == expected
+    assert len(analyzed) == windows
+
+    # A changed file is analyzed again.
+    write_wav(wavfile, samples[:16_000 * 50])
+    assert segmenter.number_of_segments(wavfile) < len(expected)
+    assert len(analyzed) > windows
+
+
+def test_slice_audio_into_wav(tmp_path):
+    """
+    Segments are cut from the decoded samples without copying them and
+    written as 16 kHz mono WAV files.
+    """
+    samples = np.arange(5 * 16_000, dtype=np.int16)
+
+    segment = slice_audio(samples, 1.5, 2.25)
+
+    assert np.shares_memory(segment, samples)
+    assert segment[0] == 24_000 and len(segment) == 12_000
+    # Segments reaching beyond the audio are cut off at its end.
+    assert len(slice_audio(samples, 4.5, 6.0)) == 8_000
+    assert len(slice_audio(samples, 6.0, 7.0)) == 0
+
+    outfile = write_wav(tmp_path / "segment.wav", segment)
+    written, rate = map_wav(outfile)
+
+    assert rate == 16_000
+    assert np.array_equal(written, segment)
@@ -0,0 +1,125 @@
+"""
+Tests the model registry.
+
+The registry is tested with a stand-in for DeepSpeechTranscriber, so the
+tests neither need DeepSpeech nor trained models.
+"""
+import threading
+import time
+
+import pytest
+
+from dnt.registry import ModelRegistry
+
+
+class FakeTranscriber:
+    """
+    Records every model it "loads"; loading takes a moment, like the real one.
+    """
+    loaded = []
+
+    def __init__(self, model_file, scorer_file):
+        time.sleep(0.01)
+        self.loaded.append(model_file.name)
+
+
+@pytest.fixture
+def models(tmp_path):
+    """
+    Fixture providing three models of 100 bytes each and a 50 bytes scorer.
+    """
+    FakeTranscriber.loaded = []
+
+    scorer = tmp_path / "lm.scorer"
+    scorer.write_bytes(b"x" * 50)
+
+    paths = []
+    for name in ("a", "b", "c"):
+        model = tmp_path / f"{name}.pbmm"
+        model.write_bytes(b"x" * 100)
+        paths.append((model, scorer))
+
+    return paths
+
+
+def test_registry_loads_each_model_once(models):
+    registry = ModelRegistry(FakeTranscriber)
+
+    transcribers = []
+    threads = [
+        threading.Thread(target=lambda: transcribers.append(registry.get(*models[0])))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FakeTranscriber.loaded == ["a.pbmm"]
+    assert all(transcriber is transcribers[0] for transcriber in transcribers)
+
+
+def test_registry_evicts_least_recently_used(models):
+    # Room for two models (model + scorer = 150 bytes).
+    registry = ModelRegistry(FakeTranscriber, memory_budget=300)
+    a, b, c = models
+
+    registry.preload([a, b])
+    registry.get(*a)
+    registry.get(*c)
+
+    assert a in registry and c in registry
+    assert b not in registry
+    assert len(registry) == 2
+
+
+def test_registry_keeps_model_exceeding_budget(models):
+    registry = ModelRegistry(FakeTranscriber, memory_budget=10)
+
+    transcriber = registry.get(*models[0])
+
+    assert registry.get(*models[0]) is transcriber
+    assert FakeTranscriber.loaded == ["a.pbmm"]
+
+
+def test_registry_lease_is_exclusive(models):
+    registry = ModelRegistry(FakeTranscriber)
+    in_use = []
+    max_in_use = []
+
+    def use():
+        with registry.lease(*models[0]):
+            in_use.append(1)
+            max_in_use.append(len(in_use))
+            time.sleep(0.01)
+            in_use.pop()
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_in_use == [1, 1, 1, 1]
+
+
+def test_registry_locked_excludes_leases(models):
+    registry = ModelRegistry(FakeTranscriber)
+    registry.get(*models[0])
+    events = []
+
+    def lease():
+        with registry.lease(*models[0]):
+            events.append("leased")
+
+    with registry.locked(*models[0]):
+        thread = threading.Thread(target=lease)
+        thread.start()
+        time.sleep(0.05)
+        events.append("unlocked")
+
+    thread.join()
+
+    assert events == ["unlocked", "leased"]
+    # Locking does not load the model again.
+    assert FakeTranscriber.loaded == ["a.pbmm"]
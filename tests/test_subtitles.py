@@ -5,7 +5,8 @@ from textwrap import dedent
 
 import pytest
 
-from dnt.subtitles import SRT, VTT, SubtitleFormat, Subtitles
+from dnt.subtitles import (SRT, VTT, Cue, SubtitleFormat, Subtitles,
+                           SubtitleWriter, timecode)
 
 
 def test_from_suffix_constructor():
@@ -64,3 +65,55 @@ def test_compile_subtitles(subtitle_format, expected):
     subtitles = fmt.compile(texts, 'en')
 
     assert subtitles == expected
+
+
+@pytest.mark.parametrize('subtitle_format', ['vtt', 'srt'])
+def test_writer_matches_compile(subtitle_format, tmp_path):
+    """
+    SubtitleWriter should produce the same subtitles as compile(), only line
+    by line.
+    """
+    texts = [
+        "I am the first subtitle line",
+        "I am the second subtitle line."
+    ]
+
+    fmt = SubtitleFormat.from_suffix(subtitle_format)
+    path = tmp_path / f"subtitles.{subtitle_format}"
+
+    writer = SubtitleWriter(fmt, 'en', path)
+    for text in texts:
+        writer.write(text)
+
+    assert writer.close() == fmt.compile(texts, 'en')
+
+
+def test_compile_cues():
+    """
+    compile() should render cues at their real position in the audio.
+    """
+    cues = [
+        Cue(1_250, 4_000, "I start a bit later"),
+        Cue(3_725_500, 3_731_010, "I am more than an hour in"),
+    ]
+
+    subtitles = SubtitleFormat.from_suffix('srt').compile(cues, 'en')
+
+    assert subtitles.content == dedent("""\
+        1
+        00:00:01,250 --> 00:00:04,000
+        I start a bit later
+
+        2
+        01:02:05,500 --> 01:02:11,010
+        I am more than an hour in
+        """)
+
+
+@pytest.mark.parametrize('milliseconds, expected', [
+    (0, "00:00:00.000"),
+    (59_999, "00:00:59.999"),
+    (90_061_001, "25:01:01.001"),
+])
+def test_timecode(milliseconds, expected):
+    assert timecode(milliseconds, VTT.timecode_format) == expected
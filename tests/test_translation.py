@@ -0,0 +1,184 @@
+"""
+Tests the translators.
+
+The DeepL translator is tested against a local stand-in for the DeepL API, so
+the tests neither need an API key nor network access.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from dnt.translation import (CachingTranslator, DeepL, NopTranslator,
+                             translate_concurrently)
+
+
+class FakeDeepLHandler(BaseHTTPRequestHandler):
+    """
+    Mimics DeepL's translate endpoint: "Translates" by upper-casing the texts.
+    """
+    # HTTP/1.1 is required for keep-alive connections.
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        self.server.requests.append({
+            'client': self.client_address,
+            'form': form
+        })
+
+        body = json.dumps({
+            "translations": [
+                {"detected_source_language": "EN", "text": text.upper()}
+                for text in form['text']
+            ]
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def deepl_server():
+    """
+    Fixture providing a local stand-in for the DeepL API.
+
+    The server records all requests it received in `server.requests`.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDeepLHandler)
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}/v2/translate"
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_deepl_translate(deepl_server):
+    translator = DeepL("some-api-key", url=deepl_server.url)
+
+    assert translator.translate("hello, world!") == "HELLO, WORLD!"
+
+    form = deepl_server.requests[0]['form']
+    assert form['auth_key'] == ["some-api-key"]
+    assert form['target_lang'] == ["DE"]
+
+
+def test_deepl_translates_in_batches(deepl_server):
+    """
+    translate_many() should send multiple texts per request, respect the
+    batch limits and return the translations in order.
+    """
+    texts = [f"sentence {i}" for i in range(25)]
+    translator = DeepL("some-api-key", url=deepl_server.url, max_texts=10)
+
+    translations = translator.translate_many(texts)
+
+    assert translations == [text.upper() for text in texts]
+    assert [len(r['form']['text']) for r in deepl_server.requests] == [10, 10, 5]
+
+    # All requests should re-use the same (keep-alive) connection.
+    assert len({r['client'] for r in deepl_server.requests}) == 1
+
+
+def test_deepl_batches_respect_request_size():
+    translator = DeepL("some-api-key", max_request_size=10)
+
+    batches = list(translator.batches(["12345", "12345", "1", "123456789012"]))
+
+    assert batches == [["12345", "12345"], ["1"], ["123456789012"]]
+
+
+def test_nop_translator_translate_many():
+    assert NopTranslator().translate_many(["a", "b"]) == ["a", "b"]
+
+
+def test_caching_translator(deepl_server, tmp_path):
+    """
+    CachingTranslator should only call the wrapped translator for texts it
+    has not translated before, also across instances (i.e., runs).
+    """
+    deepl = DeepL("some-api-key", url=deepl_server.url)
+
+    translator = CachingTranslator(deepl, tmp_path / "cache.db")
+    assert translator.translate_many(["hello", "world"]) == ["HELLO", "WORLD"]
+    translator.close()
+
+    translator = CachingTranslator(deepl, tmp_path / "cache.db")
+    assert translator.translate_many([" hello ", "again"]) == ["HELLO", "AGAIN"]
+
+    assert (translator.hits, translator.misses) == (1, 1)
+    assert [r['form']['text'] for r in deepl_server.requests] == [
+        ["hello", "world"], ["again"]
+    ]
+
+
+def test_caching_translator_evicts_least_recently_used(tmp_path):
+    translator = CachingTranslator(NopTranslator(), tmp_path / "cache.db",
+                                   max_entries=2)
+
+    translator.translate("first")
+    translator.translate("second")
+    translator.translate("first")
+    translator.translate("third")
+
+    # "second" has been evicted, "first" is still cached.
+    translator.translate("first")
+    translator.translate("second")
+
+    assert (translator.hits, translator.misses) == (2, 4)
+
+
+class SlowTranslator:
+    """
+    Translator that takes longer for shorter texts, so that requests finish
+    out of order. Keeps track of the number of concurrent requests.
+
+    Note: Has no batch API (translate_many) on purpose.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def translate(self, text, target_lang='DE'):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.01 / len(text))
+
+        with self.lock:
+            self.in_flight -= 1
+
+        return text.upper()
+
+
+def test_translate_concurrently():
+    """
+    translate_concurrently() should translate in parallel, but never exceed
+    the in-flight limit and return the translations in order.
+    """
+    translator = SlowTranslator()
+    texts = ["a" * (i % 5 + 1) for i in range(40)]
+
+    translations = translate_concurrently(translator, iter(texts), max_in_flight=3)
+
+    assert list(translations) == [text.upper() for text in texts]
+    assert 1 < translator.max_in_flight <= 3
@@ -0,0 +1,85 @@
+"""
+Tests the helpers in dnt.utils.
+"""
+import importlib.util
+import os
+from importlib import metadata
+from types import SimpleNamespace
+
+import pytest
+
+from dnt import utils
+from dnt.utils import LineIndex, detect_runtime, lines
+
+
+@pytest.fixture
+def deepspeech_package(tmp_path, monkeypatch):
+    """
+    Fixture pretending deepspeech is installed at a temporary location.
+    """
+    origin = tmp_path / "deepspeech" / "__init__.py"
+    origin.parent.mkdir()
+    origin.touch()
+
+    monkeypatch.setattr(importlib.util, "find_spec",
+                        lambda name: SimpleNamespace(origin=str(origin)))
+
+    return origin
+
+
+def installed(*packages):
+    def distribution(name):
+        if name not in packages:
+            raise metadata.PackageNotFoundError(name)
+    return distribution
+
+
+def test_detect_runtime_from_metadata(deepspeech_package, tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata, "distribution", installed("deepspeech-tflite"))
+
+    assert detect_runtime(tmp_path) == 'tflite'
+
+
+def test_detect_runtime_caches_probe(deepspeech_package, tmp_path, monkeypatch):
+    """
+    If the metadata is ambiguous, the (slow) probe should only run once per
+    deepspeech installation.
+    """
+    monkeypatch.setattr(metadata, "distribution",
+                        installed("deepspeech", "deepspeech-tflite"))
+    probes = []
+    monkeypatch.setattr(utils, "probe_runtime",
+                        lambda models_dir: probes.append(models_dir) or 'pbmm')
+
+    assert detect_runtime(tmp_path) == 'pbmm'
+    assert detect_runtime(tmp_path) == 'pbmm'
+    assert len(probes) == 1
+
+    # Re-installing deepspeech invalidates the cache.
+    os.utime(deepspeech_package, ns=(0, 0))
+    detect_runtime(tmp_path)
+    assert len(probes) == 2
+
+
+@pytest.mark.parametrize('content', [
+    "",
+    "single line without newline",
+    "Frau Präsidentin!\nzweite Zeile\n",
+    "windows\r\nline endings\r\n\r\nlast",
+])
+def test_line_index(tmp_path, content):
+    path = tmp_path / "segments.de"
+    path.write_bytes(content.encode("utf-8"))
+
+    index = LineIndex(path)
+
+    assert list(index) == lines(path)
+    assert len(index) == len(lines(path))
+
+    if len(index):
+        assert index[-1] == lines(path)[-1]
+
+    with pytest.raises(IndexError):
+        index[len(index)]
+
+    index.close()